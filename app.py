@@ -6,16 +6,33 @@ Beautiful web interface for generating minimalist city map posters
 
 from flask import Flask, render_template, request, jsonify, send_file, session
 from werkzeug.utils import secure_filename
+import gzip
 import json
 import os
 import uuid
-from pathlib import Path
 import threading
+from pathlib import Path
 import time
 
 from create_map_poster import (
-    get_coordinates, create_poster, load_theme,
-    get_available_themes, THEMES_DIR, POSTERS_DIR
+    get_coordinates, cached_coordinates, load_theme, derivative_path, save_derivatives,
+    save_tile_pyramid, tile_pyramid_paths, single_flight, timed_stage, count,
+    DERIVATIVE_SIZES, PAPER_SIZES, THEMES_DIR, POSTERS_DIR
+)
+from poster_geometry import preview_geometry
+from poster_metrics import MetricsRegistry
+from poster_preview import MAX_PREVIEW_SIZE, PreviewEngine
+from poster_jobs import poster_key, run_job
+from poster_queue import open_queue, LEASE_SECONDS
+from poster_series import MAX_SERIES_DISTANCES, MAX_SERIES_FORMATS, parse_distances, parse_formats
+from poster_cache import CacheManager, parse_age, parse_size
+from poster_cost import CostModel, admit
+from poster_store import PosterStore, move_poster_files
+from theme_registry import ThemeRegistry, validate_theme
+from job_scheduler import JobScheduler, PRIORITY_PREVIEW, PRIORITY_RENDER, PRIORITY_BATCH
+from poster_batch import (
+    normalize_batch_row, batch_output_name, failed_result, resolve_coordinates,
+    group_batch_rows, run_group
 )
 
 app = Flask(__name__)
@@ -24,6 +41,73 @@ app.secret_key = os.urandom(24)
 # Store generation status
 generation_status = {}
 
+# Store batch status
+batch_status = {}
+batch_lock = threading.Lock()
+
+MAX_BATCH_ROWS = 1000
+
+# Parsed themes, shared by every request
+theme_registry = ThemeRegistry(THEMES_DIR)
+
+# Theme previews over the bundled sample extract, cached by theme colours
+preview_engine = PreviewEngine()
+
+# Memory the worker pool may use at once (e.g. 4G); unset disables admission control
+WORKER_MEMORY_BUDGET = parse_size(os.environ['WORKER_MEMORY_BUDGET']) if os.environ.get('WORKER_MEMORY_BUDGET') else None
+
+# Worker pool shared by all clients
+scheduler = JobScheduler(workers=int(os.environ.get('POSTER_WORKERS', 2)),
+                         memory_budget=WORKER_MEMORY_BUDGET)
+
+# Job cost estimates, calibrated by finished jobs; COST_OVERPASS=1 refines
+# uncached street networks with an Overpass count query
+cost_model = CostModel(overpass=os.environ.get('COST_OVERPASS') == '1')
+job_estimates = {}
+
+# POSTER_QUEUE (sqlite:///path or redis://host) hands /api/generate jobs to
+# `create_map_poster.py worker` processes, on this machine or others; unset
+# runs them on the in-process worker pool
+job_queue = open_queue(os.environ['POSTER_QUEUE']) if os.environ.get('POSTER_QUEUE') else None
+
+# Stage timings and counters from every render in this process
+metrics = MetricsRegistry().install()
+metrics.gauge('queue_depth', 'Jobs waiting for a worker',
+              job_queue.queue_depth if job_queue else scheduler.queue_depth)
+metrics.gauge('active_workers', 'Workers currently running a job', scheduler.active_count)
+metrics.gauge('reserved_memory_bytes', 'Estimated memory of the running jobs', scheduler.memory_in_use)
+
+# Keep cache/ within CACHE_MAX_SIZE (e.g. 5G) and CACHE_MAX_AGE (e.g. 30d)
+cache_manager = CacheManager(
+    max_bytes=parse_size(os.environ['CACHE_MAX_SIZE']) if os.environ.get('CACHE_MAX_SIZE') else None,
+    max_age=parse_age(os.environ['CACHE_MAX_AGE']) if os.environ.get('CACHE_MAX_AGE') else None
+)
+if cache_manager.max_bytes is not None or cache_manager.max_age is not None:
+    cache_manager.start_pruner(interval=int(os.environ.get('CACHE_PRUNE_INTERVAL', 600)))
+metrics.gauge('cache_bytes', 'Bytes stored in the cache directory', cache_manager.total_bytes)
+
+# Posters are stored once per distinct set of render inputs; budget via
+# POSTER_STORE_MAX_SIZE (e.g. 20G) and POSTER_STORE_MAX_AGE (e.g. 90d)
+poster_store = PosterStore(
+    POSTERS_DIR,
+    max_bytes=parse_size(os.environ['POSTER_STORE_MAX_SIZE']) if os.environ.get('POSTER_STORE_MAX_SIZE') else None,
+    max_age=parse_age(os.environ['POSTER_STORE_MAX_AGE']) if os.environ.get('POSTER_STORE_MAX_AGE') else None
+)
+poster_store.import_existing()
+
+PREVIEW_DPI = 100
+
+# Live preview geometry runs on the worker pool; the request waits this long
+MAX_GEOMETRY_DISTANCE = 30000
+GEOMETRY_TIMEOUT_SECONDS = 120
+
+POSTER_CACHE_SECONDS = 365 * 24 * 3600
+
+
+def _client_id():
+    """Identify the submitting client for fair scheduling"""
+    return request.headers.get('X-Client-Id') or request.remote_addr or 'anonymous'
+
 def _safe_resolve(base_dir, filename):
     base_path = Path(base_dir).resolve()
     target_path = (base_path / filename).resolve()
@@ -32,6 +116,35 @@ def _safe_resolve(base_dir, filename):
     return target_path
 
 
+def _send_immutable(path, mimetype):
+    """Serve a poster file that never changes under its name (names are content addressed)."""
+    response = send_file(path, mimetype=mimetype, conditional=True, etag=True,
+                         max_age=POSTER_CACHE_SECONDS)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+def _estimate_job(city, country, distance, options, coordinates=None, formats=None):
+    """Admission decision, admitted options and cost estimate for a job"""
+    point = (coordinates['lat'], coordinates['lon']) if coordinates else cached_coordinates(city, country)
+    estimate_options = options
+    if formats:
+        # The largest page needs the most memory
+        paper, orientation = max(formats, key=lambda f: PAPER_SIZES[f[0]][0] * PAPER_SIZES[f[0]][1])
+        estimate_options = {**options, 'paper_size': paper, 'orientation': orientation}
+    decision, admitted, estimate = admit(cost_model, point, distance, estimate_options, WORKER_MEMORY_BUDGET)
+    if decision == 'downgrade':
+        options = {**options, 'lod': True, 'lod_scale': admitted['lod_scale']}
+    return decision, options, estimate
+
+
+def _rejection_message(estimate):
+    return (f"This poster would need about {estimate['memory_bytes'] / 1024 ** 3:.1f} GB of memory, "
+            f"more than the {WORKER_MEMORY_BUDGET / 1024 ** 3:.1f} GB worker budget. "
+            "Try a smaller distance or fewer layers.")
+
+
 def _coerce_float(value, default):
     try:
         return float(value)
@@ -95,7 +208,13 @@ def _normalize_options(options):
         "railway_color": options.get("railway_color"),
         "railway_width": _coerce_float(options.get("railway_width"), 0.6),
         "custom_layers": normalized_layers,
-        "typography_positions": normalized_typography
+        "typography_positions": normalized_typography,
+        "paper_size": options.get("paper_size") if options.get("paper_size") in PAPER_SIZES else None,
+        "orientation": "landscape" if options.get("orientation") == "landscape" else "portrait",
+        # Thumbnails and previews are written while the render is in memory
+        "derivatives": True,
+        # Text-only edits are composited over the cached map body
+        "map_layer_cache": True
     }
 
 @app.route('/')
@@ -113,48 +232,67 @@ def theme_creator():
 @app.route('/api/themes', methods=['GET'])
 def get_themes():
     """Get list of available themes with their data"""
-    themes = get_available_themes()
-    theme_data = []
-
-    for theme_name in themes:
-        try:
-            theme = load_theme(theme_name)
-            theme_data.append({
-                'id': theme_name,
-                'name': theme.get('name', theme_name),
-                'description': theme.get('description', ''),
-                'colors': {
-                    'bg': theme.get('bg'),
-                    'text': theme.get('text'),
-                    'water': theme.get('water'),
-                    'parks': theme.get('parks'),
-                    'road_motorway': theme.get('road_motorway'),
-                    'road_primary': theme.get('road_primary'),
-                    'road_residential': theme.get('road_residential'),
-                }
-            })
-        except Exception as e:
-            print(f"Error loading theme {theme_name}: {e}")
-            continue
-
-    return jsonify(theme_data)
+    version, summaries = theme_registry.list()
+    response = jsonify([{**summary, 'preview_url': f"/api/theme/{summary['id']}/preview.png"}
+                        for summary in summaries])
+    response.set_etag(version)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
 
 
 @app.route('/api/theme/<theme_id>', methods=['GET'])
 def get_theme(theme_id):
     """Get detailed theme data"""
+    safe_theme_id = secure_filename(theme_id)
+    entry = theme_registry.entry(safe_theme_id) if safe_theme_id else None
+    if entry is None:
+        return jsonify({'error': 'Theme not found'}), 404
+
+    response = jsonify(entry.data)
+    response.set_etag(entry.etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+
+def _preview_size():
+    width = min(max(int(request.args.get('w', 200)), 16), MAX_PREVIEW_SIZE[0])
+    height = min(max(int(request.args.get('h', 100)), 16), MAX_PREVIEW_SIZE[1])
+    return width, height
+
+
+@app.route('/api/theme/<theme_id>/preview.png', methods=['GET'])
+def get_theme_preview(theme_id):
+    """Map preview of a theme (?w=200&h=100 by default)"""
+    safe_theme_id = secure_filename(theme_id)
+    entry = theme_registry.entry(safe_theme_id) if safe_theme_id else None
+    if entry is None:
+        return jsonify({'error': 'Theme not found'}), 404
     try:
-        safe_theme_id = secure_filename(theme_id)
-        if not safe_theme_id:
-            return jsonify({'error': 'Theme not found'}), 404
+        size = _preview_size()
+    except ValueError:
+        return jsonify({'error': 'w and h must be integers'}), 400
 
-        if safe_theme_id not in get_available_themes():
-            return jsonify({'error': 'Theme not found'}), 404
+    key, png = preview_engine.png(entry.data, size, rgb=entry.rgb)
+    response = app.response_class(png, mimetype='image/png')
+    response.set_etag(key)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
 
-        theme = load_theme(safe_theme_id)
-        return jsonify(theme)
-    except Exception as e:
-        return jsonify({'error': str(e)}), 404
+
+@app.route('/api/theme/preview', methods=['POST'])
+def preview_theme():
+    """Map preview of an unsaved theme, for the theme creator"""
+    if not request.is_json:
+        return jsonify({'error': 'JSON body is required'}), 400
+    theme = request.json or {}
+    try:
+        rgb = validate_theme(theme)
+        size = _preview_size()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    _, png = preview_engine.png(theme, size, rgb=rgb)
+    return app.response_class(png, mimetype='image/png')
 
 
 @app.route('/api/theme/create', methods=['POST'])
@@ -180,9 +318,15 @@ def create_theme():
         except ValueError:
             return jsonify({'error': 'Theme name is invalid'}), 400
 
+        try:
+            validate_theme(theme_data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
         # Save theme
         with open(theme_path, 'w') as f:
             json.dump(theme_data, f, indent=2)
+        theme_registry.invalidate(theme_filename)
 
         return jsonify({
             'success': True,
@@ -262,207 +406,502 @@ def generate():
         distance = int(data.get('distance', 10000))
         coordinates = data.get('coordinates')
         add_house_marker = data.get('add_house_marker', False)
+        preview = bool(data.get('preview', False))
         options = _normalize_options(data.get('options', {}))
+        if preview:
+            options['dpi'] = PREVIEW_DPI
+        else:
+            # Full renders get a zoomable tile pyramid from the same buffer
+            options['tiles'] = True
 
         # Validate inputs
         if not city or not country:
             return jsonify({'error': 'City and country are required'}), 400
 
+        # A series renders every distance and paper size from one fetch
+        distances = data.get('distances')
+        formats = data.get('formats')
+        if distances or formats:
+            try:
+                distances = parse_distances(distances or [distance])
+                formats = parse_formats(formats) if formats else None
+            except (TypeError, ValueError) as e:
+                return jsonify({'error': f'Invalid series: {e}'}), 400
+            if len(distances) > MAX_SERIES_DISTANCES:
+                return jsonify({'error': f'At most {MAX_SERIES_DISTANCES} distances per series'}), 400
+            if formats and len(formats) > MAX_SERIES_FORMATS:
+                return jsonify({'error': f'At most {MAX_SERIES_FORMATS} formats per series'}), 400
+            if add_house_marker:
+                return jsonify({'error': 'add_house_marker is not supported with distances or formats'}), 400
+            distance = distances[-1]
+
+        # Reject or simplify jobs that would not fit the worker memory budget
+        decision, options, estimate = _estimate_job(city, country, distance, options, coordinates, formats)
+        if decision == 'reject':
+            return jsonify({'error': _rejection_message(estimate), 'estimate': estimate}), 413
+        if distances:
+            estimate['seconds'] = round(estimate['seconds'] * len(distances) * len(formats or [None]), 1)
+
         # Generate unique job ID
         job_id = str(uuid.uuid4())
 
-        # Initialize status
-        generation_status[job_id] = {
-            'status': 'starting',
-            'progress': 0,
-            'message': 'Initializing...',
-            'output_file': None,
-            'error': None
+        # Everything a worker needs, including the theme itself, so queue
+        # workers elsewhere do not need this server's custom themes
+        job = {
+            'city': city,
+            'country': country,
+            'theme_id': theme_id,
+            'theme': theme_registry.get(theme_id) or load_theme(theme_id),
+            'distance': distance,
+            'distances': distances,
+            'formats': formats,
+            'coordinates': coordinates,
+            'add_house_marker': add_house_marker,
+            'options': options,
+            'estimate': {**estimate, 'decision': decision}
         }
+        priority = PRIORITY_PREVIEW if preview else PRIORITY_RENDER
 
-        # Start generation in background thread
-        thread = threading.Thread(
-            target=generate_poster_background,
-            args=(job_id, city, country, theme_id, distance, coordinates, add_house_marker, options)
-        )
-        thread.daemon = True
-        thread.start()
+        if job_queue is not None:
+            job_queue.enqueue(job_id, job, priority=priority)
+        else:
+            # Initialize status
+            generation_status[job_id] = {
+                'status': 'queued',
+                'progress': 0,
+                'message': 'Waiting for a free worker...',
+                'output_file': None,
+                'error': None
+            }
+            job_estimates[job_id] = job['estimate']
+
+            # Queue generation on the shared worker pool
+            scheduler.submit(
+                job_id,
+                lambda should_cancel: generate_background(job_id, job, should_cancel),
+                client_id=_client_id(),
+                priority=priority,
+                distance=distance,
+                memory=estimate['memory_bytes'],
+                seconds=estimate['seconds']
+            )
 
         return jsonify({
             'success': True,
-            'job_id': job_id
+            'job_id': job_id,
+            'decision': decision,
+            'estimate': estimate
         })
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
-def generate_poster_background(job_id, city, country, theme_id, distance, coordinates=None, add_house_marker=False, options=None):
+def generate_background(job_id, job, should_cancel=None):
     """Background task for poster generation"""
-    try:
-        # Update status
-        generation_status[job_id] = {
-            'status': 'geocoding',
-            'progress': 10,
-            'message': 'Looking up coordinates...',
-            'output_file': None,
-            'error': None
-        }
-
-        # Load theme
-        import create_map_poster
-        theme_data = load_theme(theme_id)
-        create_map_poster.THEME = theme_data
-
-        # Get coordinates (use provided coordinates or look them up)
-        if coordinates:
-            coords = (coordinates['lat'], coordinates['lon'])
-        else:
-            coords = get_coordinates(city, country)
-
-        generation_status[job_id] = {
-            'status': 'downloading',
-            'progress': 30,
-            'message': 'Downloading map data...',
-            'output_file': None,
-            'error': None
-        }
+    def on_status(status):
+        generation_status[job_id] = status
 
-        # Generate output filename
-        from create_map_poster import generate_output_filename
-        output_file = generate_output_filename(city, theme_id)
+    generation_status[job_id] = run_job(job_id, job, poster_store, should_cancel=should_cancel,
+                                        on_status=on_status, cost_model=cost_model)
 
-        # Create poster with house marker if requested
-        create_poster_with_marker(city, country, coords, distance, output_file, add_house_marker, options)
 
-        # Success
-        generation_status[job_id] = {
-            'status': 'complete',
-            'progress': 100,
-            'message': 'Poster generated successfully!',
-            'output_file': output_file,
-            'error': None
-        }
+@app.route('/api/batch', methods=['POST'])
+def start_batch():
+    """Start a batch of poster generations that share fetched map data"""
+    try:
+        if not request.is_json:
+            return jsonify({'error': 'JSON body is required'}), 400
 
-    except Exception as e:
-        generation_status[job_id] = {
-            'status': 'error',
-            'progress': 0,
-            'message': 'Generation failed',
-            'output_file': None,
-            'error': str(e)
+        data = request.json or {}
+        jobs = data.get('jobs')
+        if not isinstance(jobs, list) or not jobs:
+            return jsonify({'error': 'A non-empty jobs list is required'}), 400
+        if len(jobs) > MAX_BATCH_ROWS:
+            return jsonify({'error': f'At most {MAX_BATCH_ROWS} jobs per batch'}), 400
+
+        rows = []
+        for index, job in enumerate(jobs):
+            if not isinstance(job, dict):
+                return jsonify({'error': f'Job {index} must be an object'}), 400
+            job = dict(job)
+            job['options'] = _normalize_options(job.get('options', {}))
+            job.pop('output', None)
+            theme_id = secure_filename(str(job.get('theme') or 'feature_based'))
+            if theme_registry.entry(theme_id) is None:
+                return jsonify({'error': f'Job {index}: theme not found'}), 400
+            job['theme'] = theme_id
+            try:
+                rows.append(normalize_batch_row(job, index))
+            except (TypeError, ValueError) as e:
+                return jsonify({'error': str(e)}), 400
+
+        batch_id = str(uuid.uuid4())
+        for row in rows:
+            # Keep outputs flat in POSTERS_DIR so /api/poster can serve them
+            try:
+                row['output'] = str(_safe_resolve(POSTERS_DIR, f"{batch_id[:8]}_{batch_output_name(row)}"))
+            except ValueError:
+                return jsonify({'error': f"Job {row['row_id'][:5]}: invalid output name"}), 400
+        batch_status[batch_id] = {
+            'status': 'queued',
+            'total': len(rows),
+            'completed': 0,
+            'failed': 0,
+            'results': [],
+            'manifest': None
         }
 
+        client_id = _client_id()
+        scheduler.submit(
+            f"{batch_id}-plan",
+            lambda should_cancel: plan_batch_background(batch_id, rows, client_id),
+            client_id=client_id,
+            priority=PRIORITY_BATCH
+        )
 
-def create_poster_with_marker(city, country, coords, distance, output_file, add_house_marker, options=None):
-    """Create poster and optionally add a house marker"""
-    import matplotlib.pyplot as plt
-    from matplotlib.font_manager import FontProperties
-    import create_map_poster
-
-    # Create the base poster
-    create_poster(city, country, coords, distance, output_file, options=options)
-
-    # Add house marker if requested
-    if add_house_marker:
-        # Reopen the image and add the marker
-        from PIL import Image, ImageDraw, ImageFont
-
-        img = Image.open(output_file)
-        draw = ImageDraw.Draw(img)
-
-        # Calculate marker position (center of image)
-        width, height = img.size
-        marker_x = width // 2
-        marker_y = height // 2
-
-        # Draw house emoji/symbol
-        # For a simple house marker, draw a house shape
-        marker_size = 40
-        half_size = marker_size // 2
+        return jsonify({
+            'success': True,
+            'batch_id': batch_id
+        })
 
-        # House shape (triangle roof + square base)
-        # Triangle (roof)
-        roof_points = [
-            (marker_x, marker_y - half_size),  # Top
-            (marker_x - half_size, marker_y),  # Bottom left
-            (marker_x + half_size, marker_y)   # Bottom right
-        ]
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-        # Square (base)
-        base_box = [
-            marker_x - half_size * 0.7,
-            marker_y,
-            marker_x + half_size * 0.7,
-            marker_y + half_size
-        ]
 
-        # Get theme for colors
-        theme = create_map_poster.THEME
-        marker_color = theme.get('text', '#FF0000')
-        outline_color = theme.get('bg', '#FFFFFF')
+def plan_batch_background(batch_id, rows, client_id):
+    """Geocode batch rows, then queue one job per shared map extent"""
+    # Rows that cannot be geocoded fail on their own; the rest still run
+    rows, failed = resolve_coordinates(rows)
+
+    groups = group_batch_rows(rows)
+    with batch_lock:
+        status = batch_status[batch_id]
+        status['results'].extend(failed)
+        status['failed'] += len(failed)
+        status['status'] = 'running'
+        status['pending_groups'] = len(groups)
+        if not groups:
+            _finish_batch(batch_id, status)
+
+    for index, group in enumerate(groups):
+        scheduler.submit(
+            f"{batch_id}-{index}",
+            lambda should_cancel, group=group: run_batch_group_background(
+                batch_id, group, should_cancel
+            ),
+            client_id=client_id,
+            priority=PRIORITY_BATCH,
+            distance=group[0]['distance']
+        )
 
-        # Draw with outline for visibility
-        draw.polygon(roof_points, fill=marker_color, outline=outline_color, width=3)
-        draw.rectangle(base_box, fill=marker_color, outline=outline_color, width=3)
 
-        # Save the modified image
-        img.save(output_file)
+def run_batch_group_background(batch_id, group, should_cancel=None):
+    """Background task rendering one group of a batch"""
+    try:
+        results = run_group(group, POSTERS_DIR, should_cancel=should_cancel)
+    except Exception as e:
+        results = [failed_result(row, e) for row in group]
+
+    # Index finished rows under their content address so /api/poster can serve them
+    rows_by_id = {row['row_id']: row for row in group}
+    for result in results:
+        if result['output_file'] and os.path.exists(result['output_file']):
+            row = rows_by_id[result['row_id']]
+            key = poster_key(row['city'], row['country'], row['point'], row['distance'],
+                             theme_registry.get(row['theme']), row['options'])
+            stored_file = poster_store.path_for(key, row['city'], row['theme'])
+            move_poster_files(result['output_file'], stored_file)
+            result['output_file'] = poster_store.add(
+                key, stored_file, city=row['city'], country=row['country'],
+                theme=row['theme'], distance=row['distance'], inputs={'options': row['options']}
+            )
+
+    with batch_lock:
+        status = batch_status[batch_id]
+        status['results'].extend(results)
+        status['completed'] += sum(1 for r in results if not r['error'])
+        status['failed'] += sum(1 for r in results if r['error'])
+        status['pending_groups'] -= 1
+        if status['pending_groups'] == 0:
+            _finish_batch(batch_id, status)
+
+
+def _finish_batch(batch_id, status):
+    """Mark a batch complete and write its manifest; call with batch_lock held"""
+    status['status'] = 'complete'
+    manifest_path = os.path.join(POSTERS_DIR, f"batch_{batch_id}.json")
+    with open(manifest_path, 'w') as f:
+        json.dump({'batch_id': batch_id, 'rows': status['results']}, f, indent=2)
+    status['manifest'] = manifest_path
+
+
+@app.route('/api/batch/<batch_id>', methods=['GET'])
+def get_batch_status(batch_id):
+    """Get batch generation status"""
+    if batch_id not in batch_status:
+        return jsonify({'error': 'Batch not found'}), 404
+
+    with batch_lock:
+        return jsonify(batch_status[batch_id])
 
 
 @app.route('/api/status/<job_id>', methods=['GET'])
 def get_status(job_id):
     """Get generation status"""
+    if job_queue is not None:
+        status = job_queue.status(job_id)
+        if status is None:
+            return jsonify({'error': 'Job not found'}), 404
+        started_at = status.pop('started_at', None)
+        if started_at is not None and status['estimate']:
+            status['eta_seconds'] = max(0.0, status['estimate']['seconds'] - (time.time() - started_at))
+        return jsonify(status)
+
+    if job_id not in generation_status:
+        return jsonify({'error': 'Job not found'}), 404
+
+    status = dict(generation_status[job_id])
+    if status['status'] == 'queued':
+        status['queue_position'] = scheduler.position(job_id)
+    if job_id in job_estimates:
+        status['estimate'] = job_estimates[job_id]
+        status['eta_seconds'] = scheduler.eta(job_id)
+    return jsonify(status)
+
+
+@app.route('/api/cancel/<job_id>', methods=['POST'])
+def cancel_job(job_id):
+    """Cancel a queued or running generation job"""
+    if job_queue is not None:
+        if job_queue.status(job_id) is None:
+            return jsonify({'error': 'Job not found'}), 404
+        state = job_queue.cancel(job_id)
+        if state is None:
+            return jsonify({'error': 'Job already finished'}), 409
+        return jsonify({'success': True, 'state': state})
+
     if job_id not in generation_status:
         return jsonify({'error': 'Job not found'}), 404
 
-    return jsonify(generation_status[job_id])
+    state = scheduler.cancel(job_id)
+    if state is None:
+        return jsonify({'error': 'Job already finished'}), 409
+
+    if state == 'cancelled':
+        generation_status[job_id] = {
+            'status': 'cancelled',
+            'progress': 0,
+            'message': 'Generation cancelled',
+            'output_file': None,
+            'error': None
+        }
+    else:
+        generation_status[job_id]['message'] = 'Cancelling...'
+
+    return jsonify({'success': True, 'state': state})
 
 
 @app.route('/api/poster/<path:filename>', methods=['GET'])
 def download_poster(filename):
     """Download generated poster"""
-    safe_name = secure_filename(filename)
-    if not safe_name:
-        return jsonify({'error': 'Poster not found'}), 404
-    try:
-        poster_path = _safe_resolve(POSTERS_DIR, safe_name)
-    except ValueError:
-        return jsonify({'error': 'Poster not found'}), 404
-
-    if not poster_path.exists():
+    poster_path = poster_store.resolve(secure_filename(filename))
+    if poster_path is None:
         return jsonify({'error': 'Poster not found'}), 404
 
-    return send_file(poster_path, mimetype='image/png')
+    return _send_immutable(poster_path, 'image/png')
 
 
 @app.route('/api/poster/thumbnail/<path:filename>', methods=['GET'])
 def get_thumbnail(filename):
-    """Get poster thumbnail"""
-    from PIL import Image
-    import io
+    """Get a poster thumbnail (?size=thumb, default) or web preview (?size=preview)"""
+    size = request.args.get('size', 'thumb')
+    if size not in DERIVATIVE_SIZES:
+        return jsonify({'error': f"size must be one of {', '.join(DERIVATIVE_SIZES)}"}), 400
 
-    safe_name = secure_filename(filename)
-    if not safe_name:
+    poster_path = poster_store.resolve(secure_filename(filename))
+    if poster_path is None:
         return jsonify({'error': 'Poster not found'}), 404
-    try:
-        poster_path = _safe_resolve(POSTERS_DIR, safe_name)
-    except ValueError:
+
+    thumbnail_path = derivative_path(poster_path, size)
+    if not os.path.exists(thumbnail_path):
+        # Posters rendered before derivatives were written at save time
+        from PIL import Image
+
+        with timed_stage("thumbnail"):
+            with Image.open(poster_path) as img:
+                save_derivatives(img, poster_path)
+
+    return _send_immutable(thumbnail_path, 'image/jpeg')
+
+
+def _tile_pyramid(name):
+    """Paths of the Deep Zoom pyramid for poster `name` (without .png), building it if missing."""
+    poster_path = poster_store.resolve(secure_filename(f"{name}.png"))
+    if poster_path is None:
+        return None
+    dzi_path, tiles_dir = tile_pyramid_paths(poster_path)
+    if not os.path.exists(dzi_path):
+        # Posters rendered before pyramids, or previews; one builder per poster
+        with single_flight(f"tiles:{poster_path}"):
+            if not os.path.exists(dzi_path):
+                from PIL import Image
+
+                with timed_stage("tile_pyramid"):
+                    with Image.open(poster_path) as img:
+                        save_tile_pyramid(img, poster_path)
+    return dzi_path, tiles_dir
+
+
+@app.route('/api/poster/tiles/<name>.dzi', methods=['GET'])
+def get_tile_descriptor(name):
+    """Deep Zoom descriptor of a poster; tiles are under <name>_files/"""
+    paths = _tile_pyramid(name)
+    if paths is None:
         return jsonify({'error': 'Poster not found'}), 404
+    return _send_immutable(paths[0], 'application/xml')
+
 
-    if not poster_path.exists():
+@app.route('/api/poster/tiles/<name>_files/<int:level>/<int:col>_<int:row>.jpg', methods=['GET'])
+def get_tile(name, level, col, row):
+    """One 256px Deep Zoom tile of a poster"""
+    paths = _tile_pyramid(name)
+    if paths is None:
         return jsonify({'error': 'Poster not found'}), 404
+    tile_path = os.path.join(paths[1], str(level), f"{col}_{row}.jpg")
+    if not os.path.exists(tile_path):
+        return jsonify({'error': 'Tile not found'}), 404
+    return _send_immutable(tile_path, 'image/jpeg')
+
+
+@app.route('/api/preview/geometry', methods=['POST'])
+def get_preview_geometry():
+    """Simplified, quantized map geometry for drawing a live preview in the browser"""
+    try:
+        if not request.is_json:
+            return jsonify({'error': 'JSON body is required'}), 400
+
+        data = request.json or {}
+        city = data.get('city', '').strip()
+        country = data.get('country', '').strip()
+        try:
+            distance = int(data.get('distance', 10000))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'distance must be a number'}), 400
+        coordinates = data.get('coordinates')
+        options = _normalize_options(data.get('options', {}))
+
+        if not coordinates and not (city and country):
+            return jsonify({'error': 'City and country are required'}), 400
+        if not 0 < distance <= MAX_GEOMETRY_DISTANCE:
+            return jsonify({'error': f'distance must be between 1 and {MAX_GEOMETRY_DISTANCE} metres'}), 400
+
+        # Same admission control as /api/generate
+        decision, options, estimate = _estimate_job(city, country, distance, options, coordinates)
+        if decision == 'reject':
+            return jsonify({'error': _rejection_message(estimate), 'estimate': estimate}), 413
+
+        # Fetch on the shared worker pool, ahead of full renders
+        result = {}
+        done = threading.Event()
+
+        def build_geometry(should_cancel):
+            try:
+                if coordinates:
+                    coords = (coordinates['lat'], coordinates['lon'])
+                else:
+                    coords = get_coordinates(city, country)
+                result['geometry'] = preview_geometry(coords, distance, options, should_cancel=should_cancel)
+            except Exception as e:
+                result['error'] = e
+            finally:
+                done.set()
+
+        job_id = f"geometry-{uuid.uuid4()}"
+        scheduler.submit(job_id, build_geometry, client_id=_client_id(), priority=PRIORITY_PREVIEW,
+                         distance=distance, memory=estimate['memory_bytes'], seconds=estimate['seconds'])
+        if not done.wait(GEOMETRY_TIMEOUT_SECONDS):
+            scheduler.cancel(job_id)
+            return jsonify({'error': 'Timed out waiting for map data, try again shortly'}), 504
+        if 'error' in result:
+            raise result['error']
+
+        geometry = result['geometry']
+        body = json.dumps(geometry, separators=(',', ':')).encode()
+        # Delta-encoded integers compress well; most of the payload is road coordinates
+        if 'gzip' in request.accept_encodings:
+            response = app.response_class(gzip.compress(body, 6), mimetype='application/json')
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response = app.response_class(body, mimetype='application/json')
+        response.headers['Vary'] = 'Accept-Encoding'
+        return response
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-    # Create thumbnail
-    img = Image.open(poster_path)
-    img.thumbnail((400, 533))
 
-    # Save to bytes
-    img_io = io.BytesIO()
-    img.save(img_io, 'PNG')
-    img_io.seek(0)
+@app.route('/api/estimate', methods=['POST'])
+def estimate_job():
+    """Estimated cost of a job without starting it (same body as /api/generate)"""
+    if not request.is_json:
+        return jsonify({'error': 'JSON body is required'}), 400
+
+    data = request.json or {}
+    try:
+        distance = int(data.get('distance', 10000))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'distance must be a number'}), 400
+    options = _normalize_options(data.get('options', {}))
+    if data.get('preview'):
+        options['dpi'] = PREVIEW_DPI
+    decision, options, estimate = _estimate_job(data.get('city', '').strip(), data.get('country', '').strip(),
+                                                distance, options, data.get('coordinates'))
+    return jsonify({
+        'decision': decision,
+        'estimate': estimate,
+        'memory_budget': WORKER_MEMORY_BUDGET,
+        'message': _rejection_message(estimate) if decision == 'reject' else None
+    })
+
+
+@app.route('/api/workers', methods=['GET'])
+def get_workers():
+    """Queue workers and their current jobs, or the in-process pool when no queue is configured"""
+    if job_queue is None:
+        return jsonify({
+            'mode': 'in-process',
+            'workers': [],
+            'queue_depth': scheduler.queue_depth(),
+            'running': scheduler.active_count()
+        })
 
-    return send_file(img_io, mimetype='image/png')
+    now = time.time()
+    workers = [{**worker, 'alive': now - worker['heartbeat_at'] < LEASE_SECONDS}
+               for worker in job_queue.workers()]
+    return jsonify({
+        'mode': 'queue',
+        'workers': workers,
+        'queue_depth': job_queue.queue_depth(),
+        'running': job_queue.running_count()
+    })
+
+
+@app.route('/api/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """Cache size per area plus hit/miss/eviction counters"""
+    stats = cache_manager.stats()
+    counters = {}
+    for name in ('osmnx_cache_hits', 'osmnx_cache_misses', 'layer_cache_hits', 'layer_cache_misses',
+                 'geocode_cache_hits', 'geocode_cache_misses', 'cache_evicted_files', 'cache_evicted_bytes'):
+        counters[name] = metrics.counter(name).value()
+    return jsonify({**stats, 'counters': counters})
+
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus metrics"""
+    return metrics.render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
 
 
 if __name__ == '__main__':
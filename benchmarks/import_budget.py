@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Import-time budget check for the CLI, GUI and web entry points.
+
+Each entry point is imported in a fresh interpreter. The check fails if the
+import takes longer than its budget, or if it pulls in any of the heavy
+rendering dependencies that should only load on the first render.
+
+Usage:
+  python benchmarks/import_budget.py [--runs 5] [--scale 1.0]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Median wall time in seconds, measured on top of a bare interpreter start.
+# Flask and Tk dominate app and GUI startup; create_map_poster itself should
+# cost next to nothing.
+IMPORT_BUDGETS = {
+    "create_map_poster": 0.15,
+    "poster_batch": 0.20,
+    "app": 1.0,
+    "map_poster_gui": 0.5,
+}
+
+HEAVY_MODULES = [
+    "osmnx", "networkx", "geopandas", "matplotlib",
+    "numpy", "geopy", "pandas", "shapely",
+]
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(json.dumps({{"seconds": elapsed, "heavy": heavy}}))
+"""
+
+
+def measure(module, runs):
+    """Import `module` `runs` times in fresh interpreters; return (median, heavy)."""
+    timings = []
+    heavy = []
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, "-c", _PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            cwd=REPO_ROOT, capture_output=True, text=True
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(f"import {module} failed:\n{proc.stderr.strip()}")
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        timings.append(result["seconds"])
+        heavy = result["heavy"]
+    timings.sort()
+    return timings[len(timings) // 2], heavy
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check entry point import-time budgets")
+    parser.add_argument('--runs', type=int, default=5, help='Imports per entry point (default: 5)')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='Multiply every budget, e.g. 2.0 on slow CI machines')
+    args = parser.parse_args()
+
+    failures = []
+    for module, budget in IMPORT_BUDGETS.items():
+        budget *= args.scale
+        try:
+            seconds, heavy = measure(module, args.runs)
+        except RuntimeError as e:
+            # Optional front ends (Flask, Tk) may be missing on this machine
+            print(f"  {module:<20} skipped: {str(e).splitlines()[-1]}")
+            continue
+
+        status = "ok"
+        if seconds > budget:
+            status = "OVER BUDGET"
+            failures.append(module)
+        if heavy:
+            status = f"loads {', '.join(heavy)}"
+            failures.append(module)
+        print(f"  {module:<20} {seconds * 1000:7.1f} ms  (budget {budget * 1000:.0f} ms)  {status}")
+
+    if failures:
+        print(f"\n✗ Import budget exceeded: {', '.join(sorted(set(failures)))}")
+        sys.exit(1)
+    print("\n✓ All entry points within import budget")
+
+
+if __name__ == "__main__":
+    main()
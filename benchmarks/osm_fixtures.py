@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+OSM fixtures for offline benchmarks.
+
+Recorded Overpass and Nominatim responses live in benchmarks/fixtures/,
+keyed by a hash of the request. When no recording exists, a deterministic
+synthetic city is generated for the query's bounding box so the suite can
+run without network access. Node and way ids are derived from lattice
+positions, so overlapping queries return identical elements for the same
+streets and features.
+"""
+
+import hashlib
+import json
+import math
+import os
+import re
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+METERS_PER_DEG_LAT = 111320.0
+
+# Representative city shapes. `spacing` is the street spacing in metres.
+CITY_PROFILES = {
+    "grid": {
+        "name": "Manhattan", "country": "USA",
+        "center": (40.7580, -73.9855), "spacing": 110.0,
+        "jitter": 0.0, "drop": 0.0, "coast": False, "river": False, "motorways": False,
+    },
+    "organic": {
+        "name": "Marrakech", "country": "Morocco",
+        "center": (31.6295, -7.9811), "spacing": 70.0,
+        "jitter": 0.35, "drop": 0.2, "coast": False, "river": False, "motorways": False,
+    },
+    "coastal": {
+        "name": "San Francisco", "country": "USA",
+        "center": (37.7749, -122.4194), "spacing": 120.0,
+        "jitter": 0.05, "drop": 0.05, "coast": True, "river": False, "motorways": True,
+    },
+    "metro": {
+        "name": "London", "country": "UK",
+        "center": (51.5074, -0.1278), "spacing": 90.0,
+        "jitter": 0.2, "drop": 0.1, "coast": False, "river": True, "motorways": True,
+    },
+}
+
+WAY_CHUNK = 10
+# Synthetic features never extend beyond this distance from the centre
+MAX_EXTENT_M = 35000.0
+
+_POLY_RE = re.compile(r'poly:"([^"]+)"')
+_BBOX_RE = re.compile(r'\((-?\d+\.?\d*),(-?\d+\.?\d*),(-?\d+\.?\d*),(-?\d+\.?\d*)\)')
+_TAG_RE = re.compile(r'way\["([^"]+)"(?:="([^"]*)")?\]')
+_HIGHWAY_FILTER_RE = re.compile(r'\["highway"~"\^?\(?([a-z_|]+)\)?\$?"\]')
+
+
+def fixture_key(path, params):
+    """Stable key for a request, used to name recorded fixture files."""
+    canonical = json.dumps({"path": path, "params": sorted(params.items())}, sort_keys=True)
+    return hashlib.sha1(canonical.encode()).hexdigest()
+
+
+def load_recorded(key):
+    path = os.path.join(FIXTURES_DIR, f"{key}.json")
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def save_recorded(key, body):
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    tmp_path = os.path.join(FIXTURES_DIR, f"{key}.json.tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(body)
+    os.replace(tmp_path, os.path.join(FIXTURES_DIR, f"{key}.json"))
+
+
+def _noise(*values):
+    """Deterministic pseudo-random number in [0, 1) from integers."""
+    digest = hashlib.blake2b(repr(values).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') / 2 ** 64
+
+
+class SyntheticCity:
+    """Street lattice and features for one city profile"""
+    def __init__(self, profile_id):
+        self.profile_id = profile_id
+        self.profile = CITY_PROFILES[profile_id]
+        self.lat0, self.lon0 = self.profile["center"]
+        self.spacing = self.profile["spacing"]
+        self.meters_per_deg_lon = METERS_PER_DEG_LAT * math.cos(math.radians(self.lat0))
+        self.id_base = (list(CITY_PROFILES).index(profile_id) + 1) * 10 ** 11
+        self.half = int(MAX_EXTENT_M / self.spacing)
+
+    # --- coordinates -----------------------------------------------------
+    def to_xy(self, lat, lon):
+        return ((lon - self.lon0) * self.meters_per_deg_lon,
+                (lat - self.lat0) * METERS_PER_DEG_LAT)
+
+    def to_latlon(self, x, y):
+        return (self.lat0 + y / METERS_PER_DEG_LAT,
+                self.lon0 + x / self.meters_per_deg_lon)
+
+    def node_xy(self, i, j):
+        jitter = self.profile["jitter"] * self.spacing
+        dx = (_noise(self.profile_id, 'x', i, j) - 0.5) * 2 * jitter if jitter else 0.0
+        dy = (_noise(self.profile_id, 'y', i, j) - 0.5) * 2 * jitter if jitter else 0.0
+        return i * self.spacing + dx, j * self.spacing + dy
+
+    def node_id(self, i, j):
+        return self.id_base + (i + self.half) * (2 * self.half + 1) + (j + self.half)
+
+    def coast_x(self, y):
+        return -0.15 * MAX_EXTENT_M / 3 + 1500.0 * math.sin(y / 2500.0)
+
+    def on_land(self, x, y):
+        return not self.profile["coast"] or x > self.coast_x(y)
+
+    # --- streets ---------------------------------------------------------
+    def highway_class(self, line):
+        if self.profile["motorways"] and line % 40 == 0:
+            return "motorway"
+        if line % 20 == 0:
+            return "primary"
+        if line % 10 == 0:
+            return "secondary"
+        if line % 5 == 0:
+            return "tertiary"
+        if line % 4 == 1:
+            return "footway"
+        if line % 4 == 3:
+            return "service"
+        return "residential"
+
+    def street_elements(self, bbox, classes=None):
+        """Yield (node dicts, way dicts) for streets touching bbox (x0, y0, x1, y1)."""
+        x0, y0, x1, y1 = bbox
+        i0 = max(-self.half, int(math.floor(x0 / self.spacing)) - 1)
+        i1 = min(self.half, int(math.ceil(x1 / self.spacing)) + 1)
+        j0 = max(-self.half, int(math.floor(y0 / self.spacing)) - 1)
+        j1 = min(self.half, int(math.ceil(y1 / self.spacing)) + 1)
+
+        nodes = {}
+        ways = []
+        for direction in ('h', 'v'):
+            lines = range(j0, j1 + 1) if direction == 'h' else range(i0, i1 + 1)
+            along0, along1 = (i0, i1) if direction == 'h' else (j0, j1)
+            for line in lines:
+                highway = self.highway_class(line)
+                if classes is not None and highway not in classes:
+                    continue
+                for chunk in range(along0 // WAY_CHUNK, along1 // WAY_CHUNK + 1):
+                    if _noise(self.profile_id, direction, line, chunk) < self.profile["drop"] \
+                            and highway in ("residential", "footway", "service"):
+                        continue
+                    start = max(chunk * WAY_CHUNK, -self.half)
+                    end = min(chunk * WAY_CHUNK + WAY_CHUNK, self.half)
+                    run = []
+                    run_index = 0
+                    for k in range(start, end + 1):
+                        i, j = (k, line) if direction == 'h' else (line, k)
+                        x, y = self.node_xy(i, j)
+                        if self.on_land(x, y):
+                            run.append((i, j, x, y))
+                            continue
+                        if len(run) > 1:
+                            ways.append(self._street_way(direction, line, chunk, run_index, run, highway, nodes))
+                            run_index += 1
+                        run = []
+                    if len(run) > 1:
+                        ways.append(self._street_way(direction, line, chunk, run_index, run, highway, nodes))
+        return nodes, ways
+
+    def _street_way(self, direction, line, chunk, run_index, run, highway, nodes):
+        ids = []
+        for i, j, x, y in run:
+            node_id = self.node_id(i, j)
+            if node_id not in nodes:
+                lat, lon = self.to_latlon(x, y)
+                nodes[node_id] = {"type": "node", "id": node_id, "lat": round(lat, 7), "lon": round(lon, 7)}
+            ids.append(node_id)
+        way_id = self.id_base + int(_noise(self.profile_id, 'way', direction, line, chunk, run_index) * 10 ** 10)
+        tags = {"highway": highway, "name": f"{direction}{line}"}
+        if highway in ("footway", "service") or line % 3 == 0:
+            tags["oneway"] = "no"
+        return {"type": "way", "id": way_id, "nodes": ids, "tags": tags}
+
+    # --- features --------------------------------------------------------
+    def _polygon_way(self, key, ring_xy, tags, nodes):
+        ids = []
+        for n, (x, y) in enumerate(ring_xy):
+            node_id = self.id_base + 9 * 10 ** 10 + int(_noise(self.profile_id, key, n) * 10 ** 10)
+            lat, lon = self.to_latlon(x, y)
+            nodes[node_id] = {"type": "node", "id": node_id, "lat": round(lat, 7), "lon": round(lon, 7)}
+            ids.append(node_id)
+        ids.append(ids[0])
+        way_id = self.id_base + 8 * 10 ** 10 + int(_noise(self.profile_id, key, 'way') * 10 ** 10)
+        return {"type": "way", "id": way_id, "nodes": ids, "tags": tags}
+
+    def feature_elements(self, bbox, tags):
+        """Return (nodes, ways) for features matching any of `tags` in bbox."""
+        x0, y0, x1, y1 = bbox
+        nodes = {}
+        ways = []
+        wanted = {(key, value) for key, value in tags}
+
+        def wants(key, value):
+            return (key, value) in wanted or (key, None) in wanted
+
+        if wants("natural", "water"):
+            if self.profile["coast"]:
+                ys = [y0 - 500 + n * 250 for n in range(int((y1 - y0 + 1000) / 250) + 1)]
+                ring = [(-MAX_EXTENT_M, ys[0])] + [(self.coast_x(y), y) for y in ys] + [(-MAX_EXTENT_M, ys[-1])]
+                ways.append(self._polygon_way(('coast', round(y0), round(y1)), ring,
+                                              {"natural": "water", "water": "sea"}, nodes))
+            if self.profile["river"]:
+                xs = [x0 - 500 + n * 200 for n in range(int((x1 - x0 + 1000) / 200) + 1)]
+                north = [(x, 900 * math.sin(x / 3000.0) + 150) for x in xs]
+                south = [(x, 900 * math.sin(x / 3000.0) - 150) for x in reversed(xs)]
+                ways.append(self._polygon_way(('river', round(x0), round(x1)), north + south,
+                                              {"natural": "water", "water": "river"}, nodes))
+
+        block = self.spacing * WAY_CHUNK
+        bi0, bi1 = int(math.floor(x0 / block)), int(math.ceil(x1 / block))
+        bj0, bj1 = int(math.floor(y0 / block)), int(math.ceil(y1 / block))
+        for bi in range(bi0, bi1 + 1):
+            for bj in range(bj0, bj1 + 1):
+                if wants("leisure", "park") and _noise(self.profile_id, 'park', bi, bj) < 0.3:
+                    size = self.spacing * (2 + int(_noise(self.profile_id, 'psize', bi, bj) * 4))
+                    px, py = bi * block + self.spacing * 0.5, bj * block + self.spacing * 0.5
+                    if self.on_land(px, py):
+                        ring = [(px, py), (px + size, py), (px + size, py + size), (px, py + size)]
+                        ways.append(self._polygon_way(('park', bi, bj), ring, {"leisure": "park"}, nodes))
+                if wants("landuse", "grass") and _noise(self.profile_id, 'grass', bi, bj) < 0.15:
+                    px, py = bi * block + self.spacing * 5.2, bj * block + self.spacing * 5.2
+                    if self.on_land(px, py):
+                        ring = [(px, py), (px + 60, py), (px + 60, py + 40), (px, py + 40)]
+                        ways.append(self._polygon_way(('grass', bi, bj), ring, {"landuse": "grass"}, nodes))
+
+        if wants("railway", "rail"):
+            for bj in range(bj0, bj1 + 1):
+                if bj % 7 != 0:
+                    continue
+                y = bj * block + self.spacing * 0.5
+                xs = [x0 - 500 + n * 300 for n in range(int((x1 - x0 + 1000) / 300) + 1)]
+                line = [(x, y + 200 * math.sin(x / 1700.0)) for x in xs if self.on_land(x, y)]
+                if len(line) > 1:
+                    way = self._polygon_way(('rail', bj, round(x0), round(x1)), line, {"railway": "rail"}, nodes)
+                    way["nodes"] = way["nodes"][:-1]
+                    ways.append(way)
+
+        if wants("building", None) or wants("building", "yes"):
+            i0, i1 = int(math.floor(x0 / self.spacing)), int(math.ceil(x1 / self.spacing))
+            j0, j1 = int(math.floor(y0 / self.spacing)), int(math.ceil(y1 / self.spacing))
+            for i in range(i0, i1):
+                for j in range(j0, j1):
+                    x, y = i * self.spacing, j * self.spacing
+                    if not self.on_land(x, y):
+                        continue
+                    for b in range(2):
+                        bx = x + self.spacing * (0.15 + 0.45 * b)
+                        by = y + self.spacing * 0.2
+                        w = self.spacing * 0.3
+                        ring = [(bx, by), (bx + w, by), (bx + w, by + w * 1.5), (bx, by + w * 1.5)]
+                        ways.append(self._polygon_way(('bldg', i, j, b), ring,
+                                                      {"building": "yes", "addr:housenumber": str(b + 1)}, nodes))
+        return nodes, ways
+
+
+def _query_bbox_latlon(query):
+    match = _POLY_RE.search(query)
+    if match:
+        values = [float(v) for v in match.group(1).split()]
+        lats, lons = values[0::2], values[1::2]
+        return min(lats), min(lons), max(lats), max(lons)
+    match = _BBOX_RE.search(query)
+    if match:
+        south, west, north, east = (float(v) for v in match.groups())
+        return south, west, north, east
+    raise ValueError("No polygon or bbox in Overpass query")
+
+
+def profile_for_point(lat, lon):
+    """Pick the synthetic profile whose centre is closest to (lat, lon)."""
+    return min(CITY_PROFILES, key=lambda pid: (CITY_PROFILES[pid]["center"][0] - lat) ** 2
+               + (CITY_PROFILES[pid]["center"][1] - lon) ** 2)
+
+
+def synthesize_overpass(query):
+    """Return an Overpass JSON response body (bytes) for an osmnx query."""
+    south, west, north, east = _query_bbox_latlon(query)
+    city = SyntheticCity(profile_for_point((south + north) / 2, (west + east) / 2))
+    x0, y0 = city.to_xy(south, west)
+    x1, y1 = city.to_xy(north, east)
+    bbox = (x0, y0, x1, y1)
+
+    if 'way["highway"' in query:
+        classes = None
+        match = _HIGHWAY_FILTER_RE.search(query)
+        if match:
+            classes = set(match.group(1).split('|'))
+        nodes, ways = city.street_elements(bbox, classes)
+    else:
+        tags = [(key, value if value else None) for key, value in _TAG_RE.findall(query)]
+        nodes, ways = city.feature_elements(bbox, tags)
+
+    body = {
+        "version": 0.6,
+        "generator": "maptoposter synthetic fixture",
+        "osm3s": {"copyright": "Synthetic data for benchmarks"},
+        "elements": list(nodes.values()) + ways
+    }
+    return json.dumps(body, separators=(',', ':')).encode()
+
+
+def synthesize_nominatim(query):
+    """Return a Nominatim /search JSON body (bytes) for a free-text query."""
+    text = query.lower()
+    for profile in CITY_PROFILES.values():
+        if profile["name"].lower() in text:
+            lat, lon = profile["center"]
+            return json.dumps([{
+                "lat": str(lat), "lon": str(lon),
+                "display_name": f"{profile['name']}, {profile['country']}",
+                "boundingbox": [str(lat - 0.1), str(lat + 0.1), str(lon - 0.1), str(lon + 0.1)],
+                "importance": 0.9
+            }]).encode()
+    return b"[]"
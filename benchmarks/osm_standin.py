@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Overpass and Nominatim APIs.
+
+Replays responses recorded in benchmarks/fixtures/, falling back to
+synthetic city data (see osm_fixtures.py) for queries that were never
+recorded. With --record, requests are forwarded to the real services and
+their responses saved as fixtures for later offline runs.
+
+Usage:
+  python benchmarks/osm_standin.py [--port 8765] [--record] [--latency 50]
+
+Then point the generator at it:
+  NOMINATIM_DOMAIN=127.0.0.1:8765 NOMINATIM_SCHEME=http ...
+  ox.settings.overpass_url = "http://127.0.0.1:8765/api"
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import osm_fixtures
+
+OVERPASS_UPSTREAM = "https://overpass-api.de/api"
+NOMINATIM_UPSTREAM = "https://nominatim.openstreetmap.org"
+
+STATUS_BODY = b"Connected as: 0\nRate limit: 0\n2 slots available now.\n"
+
+
+class StandinStats:
+    """Request counters shared by all handler threads"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.bytes_sent = 0
+        self.recorded_hits = 0
+        self.synthetic = 0
+        self.concurrent = 0
+        self.max_concurrent = 0
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'requests': self.requests,
+                'bytes_sent': self.bytes_sent,
+                'recorded_hits': self.recorded_hits,
+                'synthetic': self.synthetic,
+                'max_concurrent': self.max_concurrent
+            }
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    server_version = "MapToPosterStandin/1.0"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        parsed = urllib.parse.urlsplit(self.path)
+        params = dict(urllib.parse.parse_qsl(parsed.query))
+        self._dispatch(parsed.path, params)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length).decode()
+        params = dict(urllib.parse.parse_qsl(body))
+        self._dispatch(urllib.parse.urlsplit(self.path).path, params)
+
+    def _dispatch(self, path, params):
+        stats = self.server.stats
+        with stats.lock:
+            stats.concurrent += 1
+            stats.max_concurrent = max(stats.max_concurrent, stats.concurrent)
+        try:
+            if self.server.latency:
+                time.sleep(self.server.latency)
+            if path.endswith('/status'):
+                self._send(200, STATUS_BODY, 'text/plain')
+            elif path.endswith('/interpreter'):
+                self._respond(path, params, 'overpass', params.get('data', ''))
+            elif path.endswith('/search'):
+                self._respond(path, params, 'nominatim', params.get('q', ''))
+            else:
+                self._send(404, b'{"error": "unknown endpoint"}', 'application/json')
+        finally:
+            with stats.lock:
+                stats.concurrent -= 1
+
+    def _respond(self, path, params, service, query):
+        # Volatile parameters must not change the fixture key
+        key_params = {k: v for k, v in params.items() if k not in ('format', 'limit', 'addressdetails')}
+        key = osm_fixtures.fixture_key(path, key_params)
+
+        if self.server.record:
+            upstream = OVERPASS_UPSTREAM if service == 'overpass' else NOMINATIM_UPSTREAM
+            body = self._forward(upstream, path, params, service)
+            osm_fixtures.save_recorded(key, body)
+            self._send(200, body, 'application/json')
+            return
+
+        body = osm_fixtures.load_recorded(key)
+        if body is not None:
+            with self.server.stats.lock:
+                self.server.stats.recorded_hits += 1
+        elif self.server.synthetic:
+            try:
+                if service == 'overpass':
+                    body = osm_fixtures.synthesize_overpass(query)
+                else:
+                    body = osm_fixtures.synthesize_nominatim(query)
+            except ValueError as e:
+                self._send(400, str(e).encode(), 'text/plain')
+                return
+            with self.server.stats.lock:
+                self.server.stats.synthetic += 1
+        else:
+            self._send(404, f'{{"error": "no fixture {key}"}}'.encode(), 'application/json')
+            return
+        self._send(200, body, 'application/json')
+
+    def _forward(self, upstream, path, params, service):
+        endpoint = path.rsplit('/', 1)[-1]
+        url = f"{upstream}/{endpoint}"
+        headers = {'User-Agent': 'city_map_poster benchmark recorder'}
+        if service == 'overpass':
+            request = urllib.request.Request(url, data=urllib.parse.urlencode(params).encode(), headers=headers)
+        else:
+            request = urllib.request.Request(f"{url}?{urllib.parse.urlencode(params)}", headers=headers)
+        with urllib.request.urlopen(request, timeout=300) as response:
+            return response.read()
+
+    def _send(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        with self.server.stats.lock:
+            self.server.stats.requests += 1
+            self.server.stats.bytes_sent += len(body)
+
+
+def start_server(port=0, record=False, synthetic=True, latency_ms=0, verbose=False):
+    """
+    Start the stand-in server on a background thread.
+    Returns (server, base_url); call server.shutdown() when finished.
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', port), StandinHandler)
+    server.daemon_threads = True
+    server.record = record
+    server.synthetic = synthetic
+    server.latency = latency_ms / 1000.0
+    server.verbose = verbose
+    server.stats = StandinStats()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve recorded or synthetic Overpass/Nominatim responses")
+    parser.add_argument('--port', type=int, default=8765, help='Port to listen on (default: 8765)')
+    parser.add_argument('--record', action='store_true',
+                        help='Forward requests to the real services and save the responses')
+    parser.add_argument('--no-synthetic', action='store_true',
+                        help='Return 404 for queries without a recorded fixture')
+    parser.add_argument('--latency', type=int, default=0, help='Added delay per request in ms')
+    parser.add_argument('--verbose', action='store_true', help='Log every request')
+    args = parser.parse_args()
+
+    server, base_url = start_server(args.port, args.record, not args.no_synthetic, args.latency, args.verbose)
+    mode = "recording" if args.record else "replaying"
+    print(f"✓ Stand-in server {mode} on {base_url} (Ctrl+C to stop)")
+    print(f"  Overpass:  {base_url}/api")
+    print(f"  Nominatim: NOMINATIM_DOMAIN={base_url.split('://')[1]} NOMINATIM_SCHEME=http")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(f"\n{server.stats.snapshot()}")
+
+
+if __name__ == "__main__":
+    main()
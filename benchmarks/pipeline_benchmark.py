@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Offline end-to-end benchmark of the poster pipeline.
+
+Runs geocoding and create_poster() for a set of representative cities
+(grid-like, dense organic, coastal, large metro) at several distances,
+against the local Overpass/Nominatim stand-in server, and writes per-stage
+timings (and optionally memory peaks) as JSON.
+
+The first run of every case starts with an empty cache (cold); further
+runs reuse it (warm).
+
+Usage:
+  python benchmarks/pipeline_benchmark.py [--cities grid,coastal] [--distances 4000,12000]
+      [--repeat 3] [--memory] [--output results.json] [--compare baseline.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+import create_map_poster
+import osm_fixtures
+import osm_standin
+from poster_profile import StageProfiler, _stage_label
+
+DEFAULT_DISTANCES = [4000, 12000, 29000]
+
+
+class StageTimer:
+    """Instrumentation listener that sums wall time per stage label"""
+    def __init__(self):
+        self.stages = {}
+
+    def on_event(self, kind, name, value, labels):
+        if kind == "end":
+            label = _stage_label(name, labels)
+            self.stages[label] = self.stages.get(label, 0.0) + value
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def _use_cache_dir(cache_dir):
+    create_map_poster.CACHE_DIR = cache_dir
+    create_map_poster.GEOCODE_CACHE_FILE = os.path.join(cache_dir, "geocode_cache.json")
+    create_map_poster._geocode_cache = None
+
+
+def run_case(profile_id, distance, theme_name, repeat, memory, work_dir, options):
+    profile = osm_fixtures.CITY_PROFILES[profile_id]
+    city, country = profile["name"], profile["country"]
+    theme = create_map_poster.load_theme(theme_name)
+    cache_dir = os.path.join(work_dir, f"cache_{profile_id}_{distance}")
+    _use_cache_dir(cache_dir)
+
+    runs = []
+    for run_index in range(repeat):
+        output_file = os.path.join(work_dir, f"{profile_id}_{distance}_{run_index}.png")
+        timer = StageTimer()
+        create_map_poster.add_listener(timer.on_event)
+        start = time.perf_counter()
+        try:
+            point = create_map_poster.get_coordinates(city, country)
+            create_map_poster.create_poster(city, country, point, distance, output_file,
+                                            options=options, theme=theme)
+        finally:
+            create_map_poster.remove_listener(timer.on_event)
+        runs.append({
+            'cache': 'cold' if run_index == 0 else 'warm',
+            'total_seconds': time.perf_counter() - start,
+            'stages': timer.stages,
+            'output_bytes': os.path.getsize(output_file)
+        })
+        os.remove(output_file)
+
+    result = {'profile': profile_id, 'city': city, 'distance': distance, 'runs': runs}
+
+    if memory:
+        output_file = os.path.join(work_dir, f"{profile_id}_{distance}_memory.png")
+        with StageProfiler() as profiler:
+            point = create_map_poster.get_coordinates(city, country)
+            create_map_poster.create_poster(city, country, point, distance, output_file,
+                                            options=options, theme=theme)
+        os.remove(output_file)
+        result['memory'] = {
+            'total_peak_bytes': profiler.total_peak_bytes,
+            'stages': {stage['stage']: {
+                'peak_bytes': stage['peak_bytes'],
+                'peak_delta_bytes': stage['peak_delta_bytes'],
+                'retained_bytes': stage['retained_bytes']
+            } for stage in profiler.stages}
+        }
+    return result
+
+
+def summarize(case):
+    """Median total and per-stage seconds over the warm runs (or the cold run)."""
+    runs = [run for run in case['runs'] if run['cache'] == 'warm'] or case['runs']
+    stages = {}
+    for run in runs:
+        for label, seconds in run['stages'].items():
+            stages.setdefault(label, []).append(seconds)
+    return (statistics.median(run['total_seconds'] for run in runs),
+            {label: statistics.median(values) for label, values in stages.items()})
+
+
+def compare(results, baseline, tolerance, min_seconds=0.05):
+    """Return a list of regression descriptions against a baseline results file."""
+    baseline_cases = {(c['profile'], c['distance']): c for c in baseline['cases']}
+    regressions = []
+    for case in results['cases']:
+        base = baseline_cases.get((case['profile'], case['distance']))
+        if base is None:
+            continue
+        total, stages = summarize(case)
+        base_total, base_stages = summarize(base)
+        checks = [('total', total, base_total)]
+        checks += [(label, seconds, base_stages[label]) for label, seconds in stages.items()
+                   if label in base_stages]
+        for label, seconds, base_seconds in checks:
+            if seconds > base_seconds * (1 + tolerance) and seconds - base_seconds > min_seconds:
+                regressions.append(f"{case['profile']}@{case['distance']}m {label}: "
+                                   f"{base_seconds:.3f}s -> {seconds:.3f}s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of the poster pipeline")
+    parser.add_argument('--cities', default=','.join(osm_fixtures.CITY_PROFILES),
+                        help=f"Comma-separated profiles ({', '.join(osm_fixtures.CITY_PROFILES)})")
+    parser.add_argument('--distances', default=','.join(str(d) for d in DEFAULT_DISTANCES),
+                        help='Comma-separated distances in metres (default: 4000,12000,29000)')
+    parser.add_argument('--theme', default='feature_based', help='Theme to render with')
+    parser.add_argument('--repeat', type=int, default=2, help='Runs per case; the first is cold (default: 2)')
+    parser.add_argument('--memory', action='store_true', help='Add a tracemalloc run per case')
+    parser.add_argument('--latency', type=int, default=0, help='Stand-in server delay per request in ms')
+    parser.add_argument('--options', default='{}', help='JSON poster options, e.g. \'{"show_buildings": true}\'')
+    parser.add_argument('--output', default=None, help='Write results JSON here (default: stdout)')
+    parser.add_argument('--compare', default=None, help='Baseline results JSON to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Allowed slowdown against the baseline (default: 0.2 = 20%%)')
+    args = parser.parse_args()
+
+    profiles = [p.strip() for p in args.cities.split(',') if p.strip()]
+    unknown = [p for p in profiles if p not in osm_fixtures.CITY_PROFILES]
+    if unknown:
+        parser.error(f"Unknown city profile(s): {', '.join(unknown)}")
+    distances = [int(d) for d in args.distances.split(',') if d.strip()]
+    options = json.loads(args.options)
+
+    server, base_url = osm_standin.start_server(latency_ms=args.latency)
+    create_map_poster.NOMINATIM_DOMAIN = base_url.split('://')[1]
+    create_map_poster.NOMINATIM_SCHEME = "http"
+    ox = create_map_poster._osmnx()
+    ox.settings.overpass_url = f"{base_url}/api"
+    ox.settings.overpass_rate_limit = False
+    ox.settings.log_console = False
+
+    work_dir = tempfile.mkdtemp(prefix="maptoposter_bench_")
+    results = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'git_commit': _git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'theme': args.theme,
+        'options': options,
+        'cases': []
+    }
+    try:
+        for profile_id in profiles:
+            for distance in distances:
+                print(f"Benchmarking {profile_id} at {distance}m...", file=sys.stderr)
+                before = server.stats.snapshot()
+                case = run_case(profile_id, distance, args.theme, args.repeat,
+                                args.memory, work_dir, options)
+                after = server.stats.snapshot()
+                case['standin'] = {key: after[key] - before[key]
+                                   for key in ('requests', 'bytes_sent', 'recorded_hits', 'synthetic')}
+                results['cases'].append(case)
+                total, _ = summarize(case)
+                print(f"  ✓ {total:.2f}s", file=sys.stderr)
+    finally:
+        server.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+        print(f"✓ Results written to {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("\n✗ Regressions against baseline:", file=sys.stderr)
+            for line in regressions:
+                print(f"  {line}", file=sys.stderr)
+            sys.exit(1)
+        print("✓ No regressions against baseline", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
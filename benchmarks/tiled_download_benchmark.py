@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Serial vs tiled download benchmark against the local Overpass stand-in.
+
+Fetches the same extent once with a single query per layer and once per
+--workers value as concurrent tiles, and reports wall time, peak request
+concurrency and merged element counts (which should match the serial run
+apart from the seams).
+
+Usage:
+  python benchmarks/tiled_download_benchmark.py [--city metro] [--distance 29000]
+      [--workers 2,4,8] [--latency 400] [--output tiled.json]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import create_map_poster
+import osm_fixtures
+import osm_standin
+
+
+def fetch(point, distance, options, server):
+    before = server.stats.snapshot()
+    server.stats.max_concurrent = 0
+    start = time.perf_counter()
+    data = create_map_poster.fetch_map_data(point, distance, options)
+    seconds = time.perf_counter() - start
+    after = server.stats.snapshot()
+    G = data["graph"]
+    return {
+        'seconds': seconds,
+        'requests': after['requests'] - before['requests'],
+        'max_concurrent': after['max_concurrent'],
+        'nodes': len(G) if G is not None else 0,
+        'edges': G.number_of_edges() if G is not None else 0,
+        'features': {layer: (0 if data[layer] is None else len(data[layer]))
+                     for layer in ("water", "parks", "buildings", "railways")}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare serial and tiled downloads")
+    parser.add_argument('--city', default='metro', choices=list(osm_fixtures.CITY_PROFILES))
+    parser.add_argument('--distance', type=int, default=29000)
+    parser.add_argument('--workers', default='2,4,8', help='Comma-separated tile worker counts')
+    parser.add_argument('--tile', type=int, default=10000, help='Tile size in metres (default: 10000)')
+    parser.add_argument('--rate', type=float, default=0, help='Max new requests per second (default: unlimited)')
+    parser.add_argument('--latency', type=int, default=400,
+                        help='Stand-in delay per request in ms, to mimic Overpass (default: 400)')
+    parser.add_argument('--output', default=None, help='Write results JSON here (default: stdout)')
+    args = parser.parse_args()
+
+    server, base_url = osm_standin.start_server(latency_ms=args.latency)
+    ox = create_map_poster._osmnx()
+    ox.settings.overpass_url = f"{base_url}/api"
+    ox.settings.overpass_rate_limit = False
+    ox.settings.log_console = False
+
+    work_dir = tempfile.mkdtemp(prefix="maptoposter_tiles_")
+    create_map_poster.CACHE_DIR = work_dir
+    point = osm_fixtures.CITY_PROFILES[args.city]["center"]
+    base_options = {"use_cache": False, "show_railways": True, "download_tile_m": args.tile,
+                    "download_rate": args.rate}
+
+    results = {'city': args.city, 'distance': args.distance, 'latency_ms': args.latency,
+               'tile_m': args.tile, 'runs': []}
+    try:
+        print("Serial...", file=sys.stderr)
+        serial = fetch(point, args.distance, {**base_options, "download_workers": 1}, server)
+        results['runs'].append({'workers': 1, **serial})
+        for workers in [int(w) for w in args.workers.split(',') if w.strip()]:
+            print(f"Tiled, {workers} workers...", file=sys.stderr)
+            run = fetch(point, args.distance, {**base_options, "download_workers": workers}, server)
+            run['speedup'] = serial['seconds'] / run['seconds']
+            results['runs'].append({'workers': workers, **run})
+    finally:
+        server.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    for run in results['runs']:
+        print(f"  workers={run['workers']:<3} {run['seconds']:7.2f}s  requests={run['requests']:<4} "
+              f"edges={run['edges']:<8} speedup={run.get('speedup', 1.0):.2f}x", file=sys.stderr)
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
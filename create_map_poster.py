@@ -1,22 +1,63 @@
-import osmnx as ox
-import networkx as nx
-import matplotlib
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
-from matplotlib.font_manager import FontProperties
-import matplotlib.colors as mcolors
-import numpy as np
-from geopy.geocoders import Nominatim
-from tqdm import tqdm
+# Heavy dependencies (osmnx, networkx, matplotlib, numpy, geopy) are
+# imported inside the functions that use them, so listing themes, printing
+# help and starting the GUI or web app stay fast.
 import time
 import json
+import hashlib
+import math
 import os
+import shutil
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 import argparse
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# When run as a script, later `import create_map_poster` calls (profiler,
+# series, workers) must get this module rather than a second copy with its
+# own listeners and THEME
+if __name__ == "__main__":
+    os.sys.modules.setdefault("create_map_poster", os.sys.modules[__name__])
+
 THEMES_DIR = "themes"
 FONTS_DIR = "fonts"
 POSTERS_DIR = "posters"
+CACHE_DIR = "cache"
+GEOCODE_CACHE_FILE = os.path.join(CACHE_DIR, "geocode_cache.json")
+# Bump when the pruned layer format in cache/layers/ or cache/graphs/ changes
+LAYER_CACHE_VERSION = 1
+
+# Bump when anything drawn below the typography changes
+MAP_LAYER_VERSION = 1
+
+# Options that only affect text or output files, not the map body
+MAP_LAYER_IGNORED_OPTIONS = {"typography_positions", "derivatives", "tiles", "map_layer_cache", "use_cache"}
+
+# Theme keys that only affect text
+MAP_LAYER_IGNORED_THEME_KEYS = {"text", "name", "description"}
+
+# Downscaled JPEG copies written next to a poster when options["derivatives"]
+# is set, as {name: max width in pixels}
+DERIVATIVE_SIZES = {"thumb": 400, "preview": 1200}
+
+# Edge length of Deep Zoom tiles written when options["tiles"] is set
+TILE_SIZE = 256
+
+# OSM tags each built-in feature layer is downloaded by
+FEATURE_LAYER_TAGS = {
+    "water": {'natural': 'water', 'waterway': 'riverbank'},
+    "parks": {'leisure': 'park', 'landuse': 'grass'},
+    "buildings": {'building': True},
+    "railways": {'railway': 'rail'},
+}
+# Point geocoding at a mirror or the offline benchmark stand-in server
+NOMINATIM_DOMAIN = os.environ.get("NOMINATIM_DOMAIN", "nominatim.openstreetmap.org")
+NOMINATIM_SCHEME = os.environ.get("NOMINATIM_SCHEME", "https")
 
 def load_fonts():
     """
@@ -37,7 +78,52 @@ def load_fonts():
     
     return fonts
 
-FONTS = load_fonts()
+FONTS = None
+_FONTS_LOADED = False
+
+
+def get_fonts():
+    """Return the font paths from `load_fonts()`, checking the disk only once."""
+    global FONTS, _FONTS_LOADED
+    if not _FONTS_LOADED:
+        FONTS = load_fonts()
+        _FONTS_LOADED = True
+    return FONTS
+
+
+def _osmnx():
+    """Import osmnx on first use, selecting the Agg backend before pyplot loads."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import osmnx as ox
+    _instrument_osmnx_cache(ox)
+    return ox
+
+
+def _instrument_osmnx_cache(ox):
+    """Count osmnx HTTP cache hits and misses via its cache lookup function."""
+    http = getattr(ox, "_http", None)
+    original = getattr(http, "_retrieve_from_cache", None)
+    if original is None or getattr(original, "_poster_instrumented", False):
+        return
+
+    def retrieve_from_cache(url, *args, **kwargs):
+        try:
+            response = original(url, *args, **kwargs)
+        except (OSError, ValueError):
+            # Evicted by the cache manager between osmnx's check and read,
+            # or a partially written response from an older writer
+            response = None
+        count("osmnx_cache_hits" if response is not None else "osmnx_cache_misses")
+        if response is not None:
+            # Mark as recently used for LRU eviction
+            path = http._url_in_cache(url) if hasattr(http, "_url_in_cache") else None
+            if path is not None:
+                _touch(path)
+        return response
+
+    retrieve_from_cache._poster_instrumented = True
+    http._retrieve_from_cache = retrieve_from_cache
 
 def generate_output_filename(city, theme_name):
     """
@@ -100,10 +186,63 @@ def load_theme(theme_name="feature_based"):
 # Load theme (can be changed via command line or input)
 THEME = None  # Will be loaded later
 
+
+class PosterCancelled(Exception):
+    """Raised when a caller cancels poster generation between stages."""
+
+
+def _check_cancelled(should_cancel):
+    if should_cancel is not None and should_cancel():
+        raise PosterCancelled("Poster generation cancelled")
+
+
+# Instrumentation hooks shared by the CLI, GUI and web app. Listeners are
+# called as listener(kind, name, value, labels): kind is "start" or "end"
+# for pipeline stages (value is the elapsed seconds on "end") and "count"
+# for counters.
+_listeners = []
+
+
+def add_listener(listener):
+    if listener not in _listeners:
+        _listeners.append(listener)
+
+
+def remove_listener(listener):
+    if listener in _listeners:
+        _listeners.remove(listener)
+
+
+def _emit(kind, name, value=None, labels=None):
+    for listener in list(_listeners):
+        try:
+            listener(kind, name, value, labels or {})
+        except Exception as e:
+            print(f"⚠ Instrumentation listener failed: {e}")
+
+
+def count(name, value=1, **labels):
+    """Report a counter increment to every listener."""
+    _emit("count", name, value, labels)
+
+
+@contextmanager
+def timed_stage(name, **labels):
+    """Time a pipeline stage and report it to every listener."""
+    _emit("start", name, None, labels)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _emit("end", name, time.perf_counter() - start, labels)
+
 def create_gradient_fade(ax, color, location='bottom', zorder=10):
     """
     Creates a fade effect at the top or bottom of the map.
     """
+    import numpy as np
+    import matplotlib.colors as mcolors
+
     vals = np.linspace(0, 1, 256).reshape(-1, 1)
     gradient = np.hstack((vals, vals))
     
@@ -134,11 +273,12 @@ def create_gradient_fade(ax, color, location='bottom', zorder=10):
     ax.imshow(gradient, extent=[xlim[0], xlim[1], y_bottom, y_top], 
               aspect='auto', cmap=custom_cmap, zorder=zorder, origin='lower')
 
-def get_edge_colors_by_type(G):
+def get_edge_colors_by_type(G, theme=None):
     """
     Assigns colors to edges based on road type hierarchy.
     Returns a list of colors corresponding to each edge in the graph.
     """
+    theme = theme or THEME
     edge_colors = []
     
     for u, v, data in G.edges(data=True):
@@ -151,17 +291,17 @@ def get_edge_colors_by_type(G):
         
         # Assign color based on road type
         if highway in ['motorway', 'motorway_link']:
-            color = THEME['road_motorway']
+            color = theme['road_motorway']
         elif highway in ['trunk', 'trunk_link', 'primary', 'primary_link']:
-            color = THEME['road_primary']
+            color = theme['road_primary']
         elif highway in ['secondary', 'secondary_link']:
-            color = THEME['road_secondary']
+            color = theme['road_secondary']
         elif highway in ['tertiary', 'tertiary_link']:
-            color = THEME['road_tertiary']
+            color = theme['road_tertiary']
         elif highway in ['residential', 'living_street', 'unclassified']:
-            color = THEME['road_residential']
+            color = theme['road_residential']
         else:
-            color = THEME['road_default']
+            color = theme['road_default']
         
         edge_colors.append(color)
     
@@ -196,25 +336,136 @@ def get_edge_widths_by_type(G):
     
     return edge_widths
 
+# Road classes from most to least important; unknown types rank lowest
+ROAD_CLASS_ORDER = [
+    ['motorway', 'motorway_link'],
+    ['trunk', 'trunk_link', 'primary', 'primary_link'],
+    ['secondary', 'secondary_link'],
+    ['tertiary', 'tertiary_link'],
+    ['residential', 'living_street', 'unclassified'],
+]
+_ROAD_CLASS_RANK = {highway: rank for rank, group in enumerate(ROAD_CLASS_ORDER) for highway in group}
+
+
+def _road_rank(data):
+    highway = data.get('highway', 'unclassified')
+    if isinstance(highway, list):
+        return min((_ROAD_CLASS_RANK.get(h, len(ROAD_CLASS_ORDER)) for h in highway),
+                   default=len(ROAD_CLASS_ORDER))
+    return _ROAD_CLASS_RANK.get(highway, len(ROAD_CLASS_ORDER))
+
+
+def collapse_reverse_edges(G):
+    """
+    Return a copy of G with each two-way street drawn once.
+
+    osmnx stores a two-way street as u->v and v->u with the same geometry.
+    Edges are matched on their unordered endpoints and length, so distinct
+    parallel roads between the same intersections are kept. When the pair
+    disagrees on road class, the more important one wins.
+    """
+    kept = {}
+    for u, v, key, data in G.edges(keys=True, data=True):
+        pair = (u, v) if u <= v else (v, u)
+        match = (pair, round(data.get('length', 0.0), 1))
+        existing = kept.get(match)
+        if existing is not None and _road_rank(data) >= _road_rank(existing[3]):
+            continue
+        kept[match] = (u, v, key, data)
+
+    H = G.__class__()
+    H.graph.update(G.graph)
+    H.add_nodes_from(G.nodes(data=True))
+    H.add_edges_from(kept.values())
+    count("edges_collapsed", G.number_of_edges() - H.number_of_edges())
+    return H
+
+_geocode_cache = None
+_geocode_lock = threading.Lock()
+
+
+def _read_geocode_file():
+    try:
+        with open(GEOCODE_CACHE_FILE, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _load_geocode_cache():
+    global _geocode_cache
+    if _geocode_cache is None:
+        _geocode_cache = _read_geocode_file()
+    return _geocode_cache
+
+
+def _save_geocode_cache(cache):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = f"{GEOCODE_CACHE_FILE}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(cache, f)
+    os.replace(tmp_path, GEOCODE_CACHE_FILE)
+
+
 def get_coordinates(city, country):
     """
     Fetches coordinates for a given city and country using geopy.
     Includes rate limiting to be respectful to the geocoding service.
+    Results are cached in cache/geocode_cache.json.
     """
-    print("Looking up coordinates...")
-    geolocator = Nominatim(user_agent="city_map_poster")
-    
-    # Add a small delay to respect Nominatim's usage policy
-    time.sleep(1)
-    
-    location = geolocator.geocode(f"{city}, {country}")
-    
-    if location:
-        print(f"✓ Found: {location.address}")
-        print(f"✓ Coordinates: {location.latitude}, {location.longitude}")
-        return (location.latitude, location.longitude)
-    else:
-        raise ValueError(f"Could not find coordinates for {city}, {country}")
+    query = f"{city}, {country}"
+    key = query.strip().lower()
+    with _geocode_lock:
+        cached = _load_geocode_cache().get(key)
+    if cached:
+        count("geocode_cache_hits")
+        print(f"✓ Coordinates (cached): {cached[0]}, {cached[1]}")
+        return tuple(cached)
+    count("geocode_cache_misses")
+
+    from geopy.geocoders import Nominatim
+
+    with single_flight(f"geocode:{key}"):
+        # Another process may have looked it up while we waited
+        cached = _read_geocode_file().get(key)
+        if cached:
+            with _geocode_lock:
+                _load_geocode_cache()[key] = cached
+            print(f"✓ Coordinates (cached): {cached[0]}, {cached[1]}")
+            return tuple(cached)
+
+        print("Looking up coordinates...")
+        with timed_stage("geocode"):
+            geolocator = Nominatim(user_agent="city_map_poster",
+                                   domain=NOMINATIM_DOMAIN, scheme=NOMINATIM_SCHEME)
+
+            # Add a small delay to respect Nominatim's usage policy
+            if NOMINATIM_DOMAIN == "nominatim.openstreetmap.org":
+                time.sleep(1)
+
+            location = geolocator.geocode(query)
+
+        if location:
+            print(f"✓ Found: {location.address}")
+            print(f"✓ Coordinates: {location.latitude}, {location.longitude}")
+            coords = (location.latitude, location.longitude)
+            with _geocode_lock, single_flight(GEOCODE_CACHE_FILE):
+                # Merge entries other processes added since we loaded the file
+                cache = _load_geocode_cache()
+                cache.update(_read_geocode_file())
+                cache[key] = list(coords)
+                _save_geocode_cache(cache)
+            return coords
+        else:
+            raise ValueError(f"Could not find coordinates for {city}, {country}")
+
+
+def cached_coordinates(city, country):
+    """Coordinates from the geocode cache, or None. Never queries Nominatim."""
+    key = f"{city}, {country}".strip().lower()
+    with _geocode_lock:
+        cached = _load_geocode_cache().get(key)
+    return tuple(cached) if cached else None
 
 def _format_coordinates(lat, lon):
     lat_dir = "N" if lat >= 0 else "S"
@@ -240,6 +491,18 @@ def _merge_options(options):
         "railway_color": None,
         "railway_width": 0.6,
         "custom_layers": [],
+        "dpi": 300,
+        "lod": True,
+        "lod_scale": 1.0,
+        "paper_size": None,
+        "orientation": "portrait",
+        "derivatives": False,
+        "tiles": False,
+        "map_layer_cache": False,
+        "download_workers": 1,
+        "download_tile_m": 10000,
+        "download_rate": 2.0,
+        "min_polygon_pixels": 2.0,
         "typography_positions": {
             "city_y": 0.14,
             "line_y": 0.125,
@@ -289,24 +552,500 @@ def _plot_custom_layer(ax, layer_data, style):
         )
 
 
-def create_poster(city, country, point, dist, output_file, options=None):
-    print(f"\nGenerating map for {city}, {country}...")
-
-    options = _merge_options(options)
+def _network_types(options):
     network_types = options.get("network_types", ["all"])
     if isinstance(network_types, str):
         network_types = [network_types]
+    return network_types
 
-    cache_dir = "cache"
-    os.makedirs(cache_dir, exist_ok=True)
-    ox.settings.use_cache = bool(options.get("use_cache", True))
-    ox.settings.cache_folder = cache_dir
 
-    custom_layers = [
+def _custom_layers(options):
+    return [
         layer for layer in (options.get("custom_layers") or [])
         if isinstance(layer, dict) and layer.get("tag_key")
     ]
 
+
+# Level of detail: which highway classes are worth downloading, by the
+# ground size of one output pixel. Finer classes become sub-pixel hairlines
+# on large posters while dominating download size and draw time.
+LOD_MAJOR_ROADS = ['motorway', 'motorway_link', 'trunk', 'trunk_link',
+                   'primary', 'primary_link', 'secondary', 'secondary_link',
+                   'tertiary', 'tertiary_link']
+LOD_MINOR_ROADS = ['residential', 'living_street', 'unclassified', 'road']
+LOD_SERVICE_ROADS = ['service']
+
+# (max metres per pixel, highway classes); None keeps everything
+LOD_LEVELS = [
+    (3.0, None),
+    (8.0, LOD_MAJOR_ROADS + LOD_MINOR_ROADS + LOD_SERVICE_ROADS),
+    (20.0, LOD_MAJOR_ROADS + LOD_MINOR_ROADS),
+    (float('inf'), LOD_MAJOR_ROADS),
+]
+
+POSTER_WIDTH_IN = 12
+POSTER_HEIGHT_IN = 16
+
+# Print formats as portrait (width, height) in inches; the "orientation"
+# option swaps them for landscape
+PAPER_SIZES = {
+    "12x16": (12, 16),
+    "18x24": (18, 24),
+    "a4": (8.27, 11.69),
+    "a3": (11.69, 16.54),
+    "a2": (16.54, 23.39),
+    "square": (12, 12),
+}
+
+
+def paper_size_in(options):
+    """(width, height) in inches of the poster `options` describe."""
+    paper = options.get("paper_size")
+    if not paper:
+        return POSTER_WIDTH_IN, POSTER_HEIGHT_IN
+    if paper not in PAPER_SIZES:
+        raise ValueError(f"Unknown paper size '{paper}'. Available: {', '.join(PAPER_SIZES)}")
+    width, height = PAPER_SIZES[paper]
+    if options.get("orientation") == "landscape":
+        width, height = height, width
+    return width, height
+
+
+def map_extent(dist, options):
+    """
+    Half width and half height in metres of the ground a poster shows.
+    With a paper size, `dist` spans half the shorter side and the map is
+    cropped to fill the page; without one, the map is the 2·dist square.
+    """
+    if not options.get("paper_size"):
+        return dist, dist
+    width, height = paper_size_in(options)
+    short_side = min(width, height)
+    return dist * width / short_side, dist * height / short_side
+
+
+def fetch_radius(dist, options):
+    """Radius of the square area to download for a poster of `dist`."""
+    return max(map_extent(dist, options))
+
+
+def font_scale(options):
+    """Typography size relative to the 12in-wide poster it was designed for."""
+    if not options.get("paper_size"):
+        return 1.0
+    return min(paper_size_in(options)) / POSTER_WIDTH_IN
+
+
+def meters_per_pixel(dist, dpi, width_in=POSTER_WIDTH_IN):
+    """Ground size of one output pixel for a poster covering `dist` metres each way."""
+    return 2 * dist / (width_in * dpi)
+
+
+def poster_meters_per_pixel(dist, options):
+    """Ground size of one output pixel of the poster `options` describe."""
+    half_width, _ = map_extent(dist, options)
+    return meters_per_pixel(half_width, options["dpi"], paper_size_in(options)[0])
+
+
+def lod_highway_classes(dist, options):
+    """Highway classes to download for `dist`, or None to keep every class."""
+    if not options.get("lod", True):
+        return None
+    # lod_scale > 1 simplifies as if the poster were that many times coarser
+    mpp = poster_meters_per_pixel(dist, options) * options.get("lod_scale", 1.0)
+    for max_mpp, classes in LOD_LEVELS:
+        if mpp <= max_mpp:
+            return classes
+    return None
+
+
+def lod_custom_filter(classes):
+    """osmnx custom_filter selecting `classes`, with osmnx's usual exclusions."""
+    return (f'["highway"~"^({"|".join(classes)})$"]["area"!~"yes"]'
+            '["access"!~"private"]["service"!~"parking|parking_aisle|driveway|private"]')
+
+
+def lod_min_polygon_area(dist, options):
+    """Smallest polygon area in m² worth drawing, or 0 to keep all polygons."""
+    if not options.get("lod", True):
+        return 0.0
+    mpp = poster_meters_per_pixel(dist, options) * options.get("lod_scale", 1.0)
+    return options["min_polygon_pixels"] * mpp ** 2
+
+
+def _drop_small_polygons(gdf, point, min_area):
+    """Drop polygons smaller than `min_area` m²; lines and points are kept."""
+    if gdf is None or gdf.empty or not min_area:
+        return gdf
+    import math
+    import warnings
+
+    is_polygon = gdf.geom_type.isin(["Polygon", "MultiPolygon"])
+    # Equirectangular approximation around the poster centre is plenty here
+    scale = 111320.0 ** 2 * math.cos(math.radians(point[0]))
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)
+        area = gdf.geometry.area * scale
+    keep = ~is_polygon | (area >= min_area)
+    count("polygons_dropped", int((~keep).sum()))
+    return gdf[keep]
+
+
+def fetch_signature(point, dist, options=None):
+    """
+    Return a hashable key describing the data `fetch_map_data` would
+    download. Jobs with equal signatures can share one fetch.
+    """
+    options = _merge_options(options)
+    layers = tuple(
+        (layer.get("tag_key"), str(layer.get("tag_value") or ""))
+        for layer in _custom_layers(options)
+    )
+    return (
+        round(point[0], 6), round(point[1], 6), int(dist), round(fetch_radius(dist, options)),
+        tuple(_network_types(options)),
+        bool(options["use_cache"]),
+        bool(options["show_water"]), bool(options["show_parks"]),
+        bool(options["show_buildings"]), bool(options["show_railways"]),
+        layers,
+        tuple(lod_highway_classes(dist, options) or ()),
+        round(lod_min_polygon_area(dist, options), 1)
+    )
+
+
+def create_poster(city, country, point, dist, output_file, options=None,
+                  theme=None, should_cancel=None, on_preview=None):
+    """
+    Fetch map data around `point` and render the poster to `output_file`.
+
+    `theme` defaults to the module-level THEME. `should_cancel`, if given,
+    is polled between stages; returning True raises PosterCancelled.
+    `on_preview`, if given, is called with the finished PIL image before it
+    is encoded to disk (only when the image is decoded anyway, i.e. with
+    derivatives, tiles or map_layer_cache).
+
+    Returns how the map was made: "text_only" (cached map body),
+    "cached" (every layer from the prepared cache) or "fetched".
+    """
+    print(f"\nGenerating map for {city}, {country}...")
+    _check_cancelled(should_cancel)
+
+    if _merge_options(options)["map_layer_cache"]:
+        # Only the text differs from an earlier render: skip fetching and plotting
+        map_layer = load_map_layer(point, dist, options, theme or THEME)
+        if map_layer is not None:
+            print("✓ Map unchanged, redrawing text only")
+            body, axes_box = map_layer
+            render_text_only(city, country, point, body, axes_box, output_file, options,
+                             theme=theme, on_preview=on_preview)
+            return "text_only"
+
+    warm = _merge_options(options)["use_cache"] and all(
+        os.path.exists(path) for path in prepared_cache_paths(point, dist, options).values())
+    data = fetch_map_data(point, dist, options, should_cancel=should_cancel)
+    render_poster(city, country, point, data, output_file, options,
+                  theme=theme, should_cancel=should_cancel, on_preview=on_preview)
+    return "cached" if warm else "fetched"
+
+
+def _prune_features(gdf, tags):
+    """
+    Drop every column except geometry and the tag keys the layer was queried
+    by, stored as categoricals. osmnx returns hundreds of sparse tag columns
+    (names, addresses, ...) that dominate memory for large layers.
+    """
+    if gdf is None or gdf.empty:
+        return gdf
+    geometry = gdf.geometry.name
+    keep = [key for key in tags if key in gdf.columns and key != geometry]
+    pruned = gdf[keep + [geometry]].copy()
+    for key in keep:
+        pruned[key] = pruned[key].astype("category")
+    return pruned
+
+
+def _layer_cache_path(point, dist, tags):
+    key = json.dumps([LAYER_CACHE_VERSION, round(point[0], 6), round(point[1], 6), int(dist),
+                      sorted((k, str(v)) for k, v in tags.items())])
+    digest = hashlib.sha1(key.encode()).hexdigest()
+    return os.path.join(CACHE_DIR, "layers", f"{digest}.pkl")
+
+
+def _graph_cache_path(point, dist, network_type, custom_filter):
+    key = json.dumps([LAYER_CACHE_VERSION, round(point[0], 6), round(point[1], 6), int(dist),
+                      network_type, custom_filter])
+    digest = hashlib.sha1(key.encode()).hexdigest()
+    return os.path.join(CACHE_DIR, "graphs", f"{digest}.pkl")
+
+
+def _touch(path):
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def _read_prepared(cache_path, layer):
+    """Load a pickled layer or graph from the prepared cache; None on a miss."""
+    import pickle
+
+    if not os.path.exists(cache_path):
+        count("layer_cache_misses")
+        return None
+    with timed_stage("layer_cache_load", layer=layer):
+        try:
+            with open(cache_path, 'rb') as f:
+                data = pickle.load(f)
+        except Exception as e:
+            # Truncated files, and pickles from other pandas/geopandas/
+            # networkx/osmnx versions, are refetched and replaced
+            print(f"⚠ Discarding unreadable cache entry {cache_path}: {e}")
+            count("layer_cache_misses")
+            try:
+                os.remove(cache_path)
+            except OSError:
+                pass
+            return None
+    count("layer_cache_hits")
+    _touch(cache_path)
+    return data
+
+
+def _write_prepared(cache_path, data):
+    import pickle
+
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, cache_path)
+
+
+def _lock_file(f, blocking):
+    if fcntl is not None:
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            return True
+        except BlockingIOError:
+            return False
+    while True:
+        try:
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            if not blocking:
+                return False
+            time.sleep(0.1)
+
+
+def _unlock_file(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def single_flight(key):
+    """
+    Exclusive lock named `key`, shared by every thread and process using
+    the same cache directory. The OS releases it if the holder dies, so a
+    crashed worker cannot leave a stale lease behind.
+    """
+    lock_dir = os.path.join(CACHE_DIR, "locks")
+    path = os.path.join(lock_dir, f"{hashlib.sha1(key.encode()).hexdigest()}.lock")
+    waited = False
+    while True:
+        os.makedirs(lock_dir, exist_ok=True)
+        f = open(path, 'a')
+        if not _lock_file(f, blocking=False):
+            if not waited:
+                count("single_flight_waits")
+                waited = True
+            with timed_stage("single_flight_wait"):
+                _lock_file(f, blocking=True)
+        # The cache pruner may have removed an idle lock file while we
+        # opened it; a lock on the removed file excludes nobody, so retry
+        try:
+            if os.path.samestat(os.fstat(f.fileno()), os.stat(path)):
+                break
+        except FileNotFoundError:
+            pass
+        _unlock_file(f)
+        f.close()
+    try:
+        # The mtime records the last use, for pruning idle lock files
+        os.utime(path)
+        yield
+    finally:
+        _unlock_file(f)
+        f.close()
+
+
+def remove_idle_lock(path):
+    """Remove a single-flight lock file unless it is held. Returns True if removed."""
+    try:
+        f = open(path, 'a')
+    except OSError:
+        return False
+    with f:
+        if not _lock_file(f, blocking=False):
+            return False
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            # Already gone, or still open elsewhere on Windows
+            return False
+        finally:
+            _unlock_file(f)
+
+
+# Cached in place of a layer the area has none of, so it is not queried again
+EMPTY_LAYER = "empty-layer"
+
+
+def _unless_empty(data):
+    return None if isinstance(data, str) and data == EMPTY_LAYER else data
+
+
+def _cached_download(cache_path, layer, use_cache, download):
+    """
+    Return the prepared cache entry at `cache_path`, or run `download()` and
+    store its result. Concurrent callers for the same entry, in any
+    process, wait for the first one and then read its result instead of
+    repeating the download. `download()` returns EMPTY_LAYER for an area
+    without the layer (cached, returned as None) and None for a failed
+    query (not cached).
+    """
+    if not use_cache:
+        return _unless_empty(download())
+    data = _read_prepared(cache_path, layer)
+    if data is not None:
+        return _unless_empty(data)
+    with single_flight(cache_path):
+        if os.path.exists(cache_path):
+            data = _read_prepared(cache_path, layer)
+            if data is not None:
+                return _unless_empty(data)
+        data = download()
+        if data is not None:
+            _write_prepared(cache_path, data)
+    return _unless_empty(data)
+
+
+def _download_graph(ox, point, dist, downloader=None, network_type='all', custom_filter=None,
+                    use_cache=True):
+    """
+    Street network around `point`, tile by tile when `downloader` is given.
+    The simplified graph is cached under cache/graphs/.
+    """
+    layer = "network_all" if custom_filter else f"network_{network_type}"
+
+    def download():
+        with timed_stage("download", layer=layer):
+            if downloader is not None:
+                return downloader.graph(network_type=network_type, custom_filter=custom_filter)
+            if custom_filter:
+                return ox.graph_from_point(point, dist=dist, dist_type='bbox', custom_filter=custom_filter)
+            return ox.graph_from_point(point, dist=dist, dist_type='bbox', network_type=network_type)
+
+    cache_path = _graph_cache_path(point, dist, network_type, custom_filter)
+    return _cached_download(cache_path, layer, use_cache, download)
+
+
+def _download_features(ox, point, tags, dist, layer, use_cache=True, downloader=None):
+    """
+    Download one feature layer, pruned to the columns it is styled by.
+    Pruned layers are cached under cache/layers/. Returns None if the query
+    fails or is empty.
+    """
+    def download():
+        from osmnx._errors import InsufficientResponseError
+
+        with timed_stage("download", layer=layer):
+            try:
+                if downloader is not None:
+                    gdf = downloader.features(tags, layer=layer)
+                else:
+                    gdf = ox.features_from_point(point, tags=tags, dist=dist)
+            except PosterCancelled:
+                raise
+            except InsufficientResponseError:
+                return EMPTY_LAYER
+            except Exception:
+                return None
+        with timed_stage("prune", layer=layer):
+            return _prune_features(gdf, tags)
+
+    cache_path = _layer_cache_path(point, dist, tags)
+    return _cached_download(cache_path, layer, use_cache, download)
+
+
+def _custom_layer_tags(layer):
+    tag_value = layer.get("tag_value")
+    return {layer.get("tag_key"): True if tag_value in (None, "", "true", "True") else tag_value}
+
+
+def _graph_requests(dist, options):
+    """(network_type, custom_filter) pairs fetch_map_data downloads."""
+    network_types = _network_types(options)
+    if "all" in network_types:
+        highway_classes = lod_highway_classes(dist, options)
+        return [("all", lod_custom_filter(highway_classes) if highway_classes else None)]
+    return [(net_type, None) for net_type in network_types]
+
+
+def prepared_cache_paths(point, dist, options=None):
+    """
+    Return {layer: path} for every prepared-cache file fetch_map_data would
+    read for these options. All paths existing means the fetch is warm.
+    """
+    options = _merge_options(options)
+    radius = fetch_radius(dist, options)
+    paths = {}
+    for network_type, custom_filter in _graph_requests(dist, options):
+        layer = "network_all" if custom_filter else f"network_{network_type}"
+        paths[layer] = _graph_cache_path(point, radius, network_type, custom_filter)
+    for layer, tags in FEATURE_LAYER_TAGS.items():
+        if options[f"show_{layer}"]:
+            paths[layer] = _layer_cache_path(point, radius, tags)
+    for layer in _custom_layers(options):
+        paths[f"custom_{layer.get('tag_key')}"] = _layer_cache_path(point, radius, _custom_layer_tags(layer))
+    return paths
+
+
+def fetch_map_data(point, dist, options=None, should_cancel=None, radius=None):
+    """
+    Download every layer `options` asks for around `point`, for a poster
+    of `dist`. `radius` overrides the download radius, for data shared by
+    several poster sizes. Returns a dict that can be passed to
+    `render_poster` any number of times.
+    """
+    import networkx as nx
+    from tqdm import tqdm
+    ox = _osmnx()
+
+    options = _merge_options(options)
+    network_types = _network_types(options)
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    use_cache = bool(options.get("use_cache", True))
+    ox.settings.use_cache = use_cache
+    ox.settings.cache_folder = CACHE_DIR
+
+    custom_layers = _custom_layers(options)
+    radius = radius or fetch_radius(dist, options)
+
+    # Large extents can be fetched as concurrent tiles instead of one query
+    downloader = None
+    download_workers = int(options.get("download_workers", 1))
+    if download_workers > 1 and 2 * radius > options["download_tile_m"]:
+        from poster_download import TiledDownloader
+        downloader = TiledDownloader(ox, point, radius, tile_m=options["download_tile_m"],
+                                     workers=download_workers, per_second=options["download_rate"],
+                                     should_cancel=should_cancel)
+
     fetch_steps = 0 if not network_types else 1
     if options["show_water"]:
         fetch_steps += 1
@@ -323,158 +1062,431 @@ def create_poster(city, country, point, dist, output_file, options=None):
         # 1. Fetch Street Network
         G = None
         if network_types:
+            # LOD only narrows the "all" network; explicit types are kept as asked
+            graph_requests = _graph_requests(dist, options)
             if "all" in network_types:
                 pbar.set_description("Downloading street network")
-                G = ox.graph_from_point(point, dist=dist, dist_type='bbox', network_type='all')
+                G = _download_graph(ox, point, radius, downloader, custom_filter=graph_requests[0][1],
+                                    use_cache=use_cache)
                 pbar.update(1)
+                _check_cancelled(should_cancel)
                 time.sleep(0.5)  # Rate limit between requests
             else:
                 graphs = []
                 for net_type in network_types:
                     pbar.set_description(f"Downloading {net_type} network")
-                    graphs.append(
-                        ox.graph_from_point(point, dist=dist, dist_type='bbox', network_type=net_type)
-                    )
+                    graphs.append(_download_graph(ox, point, radius, downloader, network_type=net_type,
+                                                  use_cache=use_cache))
                     pbar.update(1)
+                    _check_cancelled(should_cancel)
                     time.sleep(0.3)
                 if graphs:
-                    G = nx.compose_all(graphs)
+                    with timed_stage("graph_compose"):
+                        G = nx.compose_all(graphs)
 
         water = None
         if options["show_water"]:
             pbar.set_description("Downloading water features")
-            try:
-                water = ox.features_from_point(point, tags={'natural': 'water', 'waterway': 'riverbank'}, dist=dist)
-            except:
-                water = None
+            water = _download_features(ox, point, FEATURE_LAYER_TAGS["water"], radius, "water", use_cache, downloader)
             pbar.update(1)
+            _check_cancelled(should_cancel)
             time.sleep(0.3)
 
         parks = None
         if options["show_parks"]:
             pbar.set_description("Downloading parks/green spaces")
-            try:
-                parks = ox.features_from_point(point, tags={'leisure': 'park', 'landuse': 'grass'}, dist=dist)
-            except:
-                parks = None
+            parks = _download_features(ox, point, FEATURE_LAYER_TAGS["parks"], radius, "parks", use_cache, downloader)
             pbar.update(1)
+            _check_cancelled(should_cancel)
 
         buildings = None
         if options["show_buildings"]:
             pbar.set_description("Downloading buildings")
-            try:
-                buildings = ox.features_from_point(point, tags={'building': True}, dist=dist)
-            except:
-                buildings = None
+            buildings = _download_features(ox, point, FEATURE_LAYER_TAGS["buildings"], radius, "buildings", use_cache, downloader)
             pbar.update(1)
+            _check_cancelled(should_cancel)
 
         railways = None
         if options["show_railways"]:
             pbar.set_description("Downloading railways")
-            try:
-                railways = ox.features_from_point(point, tags={'railway': 'rail'}, dist=dist)
-            except:
-                railways = None
+            railways = _download_features(ox, point, FEATURE_LAYER_TAGS["railways"], radius, "railways", use_cache, downloader)
             pbar.update(1)
+            _check_cancelled(should_cancel)
 
         custom_layer_data = []
         for layer in custom_layers:
             key = layer.get("tag_key")
-            if not key:
-                continue
-            tag_value = layer.get("tag_value")
-            tags = {key: True if tag_value in (None, "", "true", "True") else tag_value}
+            tags = _custom_layer_tags(layer)
             pbar.set_description(f"Downloading {key} layer")
-            try:
-                layer_data = ox.features_from_point(point, tags=tags, dist=dist)
-            except:
-                layer_data = None
-            custom_layer_data.append((layer_data, layer))
+            # One "custom" metric label for every tag key keeps label cardinality fixed
+            custom_layer_data.append(_download_features(ox, point, tags, radius, "custom", use_cache, downloader))
             pbar.update(1)
+            _check_cancelled(should_cancel)
     
     print("✓ All data downloaded successfully!")
-    
+    _check_cancelled(should_cancel)
+
+    min_area = lod_min_polygon_area(dist, options)
+    if min_area:
+        with timed_stage("lod_polygons"):
+            water = _drop_small_polygons(water, point, min_area)
+            parks = _drop_small_polygons(parks, point, min_area)
+            buildings = _drop_small_polygons(buildings, point, min_area)
+            custom_layer_data = [_drop_small_polygons(gdf, point, min_area) for gdf in custom_layer_data]
+
+    return {
+        "dist": dist,
+        "radius": radius,
+        "graph": G,
+        "water": water,
+        "parks": parks,
+        "buildings": buildings,
+        "railways": railways,
+        "custom_layers": custom_layer_data
+    }
+
+
+def render_poster(city, country, point, data, output_file, options=None,
+                  theme=None, should_cancel=None, on_preview=None):
+    """
+    Render previously fetched map `data` to `output_file`.
+    """
+    ox = _osmnx()
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    _check_cancelled(should_cancel)
+
+    theme = theme or THEME
+    options = _merge_options(options)
+
+    G = data["graph"]
+    water = data["water"]
+    parks = data["parks"]
+    buildings = data["buildings"]
+    railways = data["railways"]
+    custom_layer_data = list(zip(data["custom_layers"], _custom_layers(options)))
+
     # 2. Setup Plot
     print("Rendering map...")
-    fig, ax = plt.subplots(figsize=(12, 16), facecolor=THEME['bg'])
-    ax.set_facecolor(THEME['bg'])
+    fig = Figure(figsize=paper_size_in(options), facecolor=theme['bg'])
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    ax.set_facecolor(theme['bg'])
     ax.set_position([0, 0, 1, 1])
     
     # 3. Plot Layers
     # Layer 1: Polygons
     if water is not None and not water.empty:
-        water.plot(ax=ax, facecolor=THEME['water'], edgecolor='none', zorder=1)
+        with timed_stage("plot", layer="water"):
+            water.plot(ax=ax, facecolor=theme['water'], edgecolor='none', zorder=1)
     if parks is not None and not parks.empty:
-        parks.plot(ax=ax, facecolor=THEME['parks'], edgecolor='none', zorder=2)
+        with timed_stage("plot", layer="parks"):
+            parks.plot(ax=ax, facecolor=theme['parks'], edgecolor='none', zorder=2)
 
     if buildings is not None and not buildings.empty:
-        building_color = options["building_color"] or THEME.get("road_residential", "#999999")
-        buildings.plot(
-            ax=ax,
-            facecolor=building_color,
-            edgecolor="none",
-            alpha=options["building_alpha"],
-            zorder=2.2
-        )
+        building_color = options["building_color"] or theme.get("road_residential", "#999999")
+        with timed_stage("plot", layer="buildings"):
+            buildings.plot(
+                ax=ax,
+                facecolor=building_color,
+                edgecolor="none",
+                alpha=options["building_alpha"],
+                zorder=2.2
+            )
 
     if railways is not None and not railways.empty:
-        railway_color = options["railway_color"] or THEME.get("road_primary", "#666666")
-        railways.plot(
-            ax=ax,
-            color=railway_color,
-            linewidth=options["railway_width"],
-            alpha=0.9,
-            zorder=2.6
-        )
+        railway_color = options["railway_color"] or theme.get("road_primary", "#666666")
+        with timed_stage("plot", layer="railways"):
+            railways.plot(
+                ax=ax,
+                color=railway_color,
+                linewidth=options["railway_width"],
+                alpha=0.9,
+                zorder=2.6
+            )
 
     for layer_data, layer_style in custom_layer_data:
-        _plot_custom_layer(ax, layer_data, {
-            "color": layer_style.get("color", "#333333"),
-            "alpha": layer_style.get("alpha", 1.0),
-            "zorder": layer_style.get("zorder", 2.5),
-            "line_width": layer_style.get("line_width", 0.5),
-            "mode": layer_style.get("mode", "line")
-        })
+        with timed_stage("plot", layer="custom"):
+            _plot_custom_layer(ax, layer_data, {
+                "color": layer_style.get("color", "#333333"),
+                "alpha": layer_style.get("alpha", 1.0),
+                "zorder": layer_style.get("zorder", 2.5),
+                "line_width": layer_style.get("line_width", 0.5),
+                "mode": layer_style.get("mode", "line")
+            })
     
     # Layer 2: Roads with hierarchy coloring
     if G is not None and len(G.edges) > 0:
+        # Kept on the data dict so repeated renders of one fetch reuse it
+        if data.get("render_graph") is None:
+            with timed_stage("edge_dedupe"):
+                data["render_graph"] = collapse_reverse_edges(G)
+        G = data["render_graph"]
         print("Applying road hierarchy colors...")
-        if options["use_road_hierarchy_colors"]:
-            edge_colors = get_edge_colors_by_type(G)
-        else:
-            road_color = options["road_color"] or THEME.get("road_default", "#333333")
-            edge_colors = [road_color] * len(G.edges)
+        with timed_stage("edge_styling"):
+            if options["use_road_hierarchy_colors"]:
+                edge_colors = get_edge_colors_by_type(G, theme)
+            else:
+                road_color = options["road_color"] or theme.get("road_default", "#333333")
+                edge_colors = [road_color] * len(G.edges)
 
-        if options["use_road_hierarchy_widths"]:
-            edge_widths = get_edge_widths_by_type(G)
-        else:
-            edge_widths = [options["road_width"]] * len(G.edges)
+            if options["use_road_hierarchy_widths"]:
+                edge_widths = get_edge_widths_by_type(G)
+            else:
+                edge_widths = [options["road_width"]] * len(G.edges)
         
-        ox.plot_graph(
-            G, ax=ax, bgcolor=THEME['bg'],
-            node_size=0,
-            edge_color=edge_colors,
-            edge_linewidth=edge_widths,
-            show=False, close=False
-        )
+        with timed_stage("plot", layer="roads"):
+            ox.plot_graph(
+                G, ax=ax, bgcolor=theme['bg'],
+                node_size=0,
+                edge_color=edge_colors,
+                edge_linewidth=edge_widths,
+                show=False, close=False
+            )
     
+    if options["paper_size"]:
+        _crop_to_page(ax, point, data["dist"], options)
+
     # Layer 3: Gradients (Top and Bottom)
     if options["show_gradients"]:
-        create_gradient_fade(ax, THEME['gradient_color'], location='bottom', zorder=10)
-        create_gradient_fade(ax, THEME['gradient_color'], location='top', zorder=10)
+        with timed_stage("gradients"):
+            create_gradient_fade(ax, theme['gradient_color'], location='bottom', zorder=10)
+            create_gradient_fade(ax, theme['gradient_color'], location='top', zorder=10)
     
+    if options["map_layer_cache"]:
+        # Keep the map body without text so text-only edits can skip all of the above
+        from PIL import Image
+
+        with timed_stage("savefig"):
+            fig.set_dpi(options["dpi"])
+            fig.canvas.draw()
+            body = Image.frombuffer("RGBA", fig.canvas.get_width_height(),
+                                    fig.canvas.buffer_rgba(), "raw", "RGBA", 0, 1).copy()
+        axes_box = tuple(ax.get_position().bounds)
+        save_map_layer(point, data["dist"], options, theme, body, axes_box)
+        render_text_only(city, country, point, body, axes_box, output_file, options,
+                         theme=theme, on_preview=on_preview)
+        return
+
     # 4. Typography using Roboto font
-    if FONTS:
-        font_main = FontProperties(fname=FONTS['bold'], size=60)
-        font_top = FontProperties(fname=FONTS['bold'], size=40)
-        font_sub = FontProperties(fname=FONTS['light'], size=22)
-        font_coords = FontProperties(fname=FONTS['regular'], size=14)
+    with timed_stage("text"):
+        _draw_typography(ax, city, country, point, theme, options)
+
+    # 5. Save
+    print(f"Saving to {output_file}...")
+    keep_image = options["derivatives"] or options["tiles"]
+    with timed_stage("savefig"):
+        if keep_image:
+            # Draw once; the poster and its downscaled copies share one buffer
+            from PIL import Image
+
+            fig.set_dpi(options["dpi"])
+            fig.canvas.draw()
+            image = Image.frombuffer("RGBA", fig.canvas.get_width_height(),
+                                     fig.canvas.buffer_rgba(), "raw", "RGBA", 0, 1)
+            if on_preview is not None:
+                on_preview(image)
+            image.save(output_file, format="PNG", dpi=(options["dpi"], options["dpi"]))
+        else:
+            fig.savefig(output_file, dpi=options["dpi"], facecolor=theme['bg'])
+    _save_extras(image if keep_image else None, output_file, options)
+
+
+def _crop_to_page(ax, point, dist, options):
+    """Set the map limits to the page's ground extent, undistorted at `point`."""
+    half_width, half_height = map_extent(dist, options)
+    lat, lon = point
+    dlat = half_height / 111320.0
+    dlon = half_width / (111320.0 * math.cos(math.radians(lat)))
+    ax.set_aspect('auto')
+    ax.set_xlim(lon - dlon, lon + dlon)
+    ax.set_ylim(lat - dlat, lat + dlat)
+
+
+def _save_extras(image, output_file, options):
+    """Write the derivative copies and tile pyramid `options` asks for from the decoded `image`."""
+    if options["derivatives"]:
+        with timed_stage("derivatives"):
+            save_derivatives(image, output_file)
+    if options["tiles"]:
+        with timed_stage("tile_pyramid"):
+            save_tile_pyramid(image, output_file)
+    count("poster_bytes_written", os.path.getsize(output_file))
+    print(f"✓ Done! Poster saved as {output_file}")
+
+
+def _map_layer_path(point, dist, options, theme):
+    options = _merge_options(options)
+    key = json.dumps([
+        MAP_LAYER_VERSION, fetch_signature(point, dist, options),
+        {k: v for k, v in options.items() if k not in MAP_LAYER_IGNORED_OPTIONS},
+        {k: v for k, v in theme.items() if k not in MAP_LAYER_IGNORED_THEME_KEYS}
+    ], sort_keys=True, default=str)
+    digest = hashlib.sha1(key.encode()).hexdigest()
+    return os.path.join(CACHE_DIR, "map_layers", f"{digest}.png")
+
+
+def save_map_layer(point, dist, options, theme, body, axes_box):
+    """
+    Cache the rendered map body (everything below the typography) with the
+    position of its axes, keyed by every input that affects it.
+    """
+    from PIL.PngImagePlugin import PngInfo
+
+    path = _map_layer_path(point, dist, options, theme)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    info = PngInfo()
+    info.add_text("axes_box", json.dumps(axes_box))
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with timed_stage("map_layer_save"):
+        # Fast compression: this is a cache entry, not a deliverable
+        body.save(tmp_path, format="PNG", pnginfo=info, compress_level=1)
+    os.replace(tmp_path, path)
+
+
+def load_map_layer(point, dist, options, theme):
+    """(body image, axes box) cached by an earlier render with the same map, or None."""
+    from PIL import Image
+
+    path = _map_layer_path(point, dist, options, theme)
+    if not os.path.exists(path):
+        count("map_layer_misses")
+        return None
+    with timed_stage("map_layer_load"):
+        try:
+            with Image.open(path) as img:
+                axes_box = tuple(json.loads(img.text["axes_box"]))
+                body = img.convert("RGBA")
+        except (OSError, KeyError, ValueError):
+            count("map_layer_misses")
+            return None
+    count("map_layer_hits")
+    _touch(path)
+    return body, axes_box
+
+
+def render_text_only(city, country, point, body, axes_box, output_file, options=None, theme=None,
+                     on_preview=None):
+    """
+    Draw the typography on a transparent figure whose axes sit at
+    `axes_box` and composite it over the cached map `body`.
+    """
+    from PIL import Image
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    theme = theme or THEME
+    options = _merge_options(options)
+    dpi = options["dpi"]
+
+    with timed_stage("text"):
+        fig = Figure(figsize=(body.width / dpi, body.height / dpi), dpi=dpi)
+        FigureCanvasAgg(fig)
+        fig.patch.set_alpha(0)
+        ax = fig.add_axes(axes_box)
+        ax.set_axis_off()
+        _draw_typography(ax, city, country, point, theme, options)
+        fig.canvas.draw()
+        text_layer = Image.frombuffer("RGBA", fig.canvas.get_width_height(),
+                                      fig.canvas.buffer_rgba(), "raw", "RGBA", 0, 1)
+        image = Image.alpha_composite(body, text_layer)
+    if on_preview is not None:
+        on_preview(image)
+
+    print(f"Saving to {output_file}...")
+    with timed_stage("savefig"):
+        image.save(output_file, format="PNG", dpi=(dpi, dpi))
+    _save_extras(image, output_file, options)
+
+
+def derivative_path(output_file, size):
+    """Path of the `size` copy (a DERIVATIVE_SIZES key) of a poster file."""
+    base, _ = os.path.splitext(output_file)
+    return f"{base}.{size}.jpg"
+
+
+def save_derivatives(image, output_file):
+    """
+    Write the DERIVATIVE_SIZES copies of a poster from its decoded PIL
+    `image`, largest first so each copy is downscaled from the previous one.
+    """
+    from PIL import Image
+
+    current = image.convert("RGB")
+    for size, width in sorted(DERIVATIVE_SIZES.items(), key=lambda item: -item[1]):
+        current = current.copy()
+        current.thumbnail((width, width * 4 // 3), Image.LANCZOS)
+        path = derivative_path(output_file, size)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        current.save(tmp_path, format="JPEG", quality=88, optimize=True)
+        os.replace(tmp_path, path)
+
+
+def tile_pyramid_paths(output_file):
+    """(descriptor, tile directory) of a poster's Deep Zoom pyramid."""
+    base, _ = os.path.splitext(output_file)
+    return f"{base}.dzi", f"{base}_files"
+
+
+def save_tile_pyramid(image, output_file):
+    """
+    Cut the decoded PIL `image` into a Deep Zoom (DZI) pyramid next to the
+    poster: `{base}_files/{level}/{col}_{row}.jpg`, where the top level is
+    full resolution and each level below halves it down to a single pixel.
+    """
+    from PIL import Image
+
+    current = image.convert("RGB")
+    width, height = current.size
+    max_level = math.ceil(math.log2(max(width, height)))
+    dzi_path, tiles_dir = tile_pyramid_paths(output_file)
+    tmp_dir = f"{tiles_dir}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+    tiles = 0
+    for level in range(max_level, -1, -1):
+        level_dir = os.path.join(tmp_dir, str(level))
+        os.makedirs(level_dir)
+        level_width, level_height = current.size
+        for col in range(math.ceil(level_width / TILE_SIZE)):
+            for row in range(math.ceil(level_height / TILE_SIZE)):
+                left, top = col * TILE_SIZE, row * TILE_SIZE
+                tile = current.crop((left, top, min(left + TILE_SIZE, level_width),
+                                     min(top + TILE_SIZE, level_height)))
+                tile.save(os.path.join(level_dir, f"{col}_{row}.jpg"), format="JPEG", quality=85)
+                tiles += 1
+        if level:
+            current = current.resize((math.ceil(level_width / 2), math.ceil(level_height / 2)),
+                                     Image.LANCZOS)
+
+    if os.path.isdir(tiles_dir):
+        shutil.rmtree(tiles_dir)
+    os.replace(tmp_dir, tiles_dir)
+    tmp_path = f"{dzi_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                f'<Image xmlns="http://schemas.microsoft.com/deepzoom/2008" Format="jpg" '
+                f'Overlap="0" TileSize="{TILE_SIZE}"><Size Width="{width}" Height="{height}"/></Image>\n')
+    os.replace(tmp_path, dzi_path)
+    count("pyramid_tiles_written", tiles)
+
+
+def _draw_typography(ax, city, country, point, theme, options):
+    from matplotlib.font_manager import FontProperties
+
+    fonts = get_fonts()
+    scale = font_scale(options)
+    if fonts:
+        font_main = FontProperties(fname=fonts['bold'], size=60 * scale)
+        font_top = FontProperties(fname=fonts['bold'], size=40 * scale)
+        font_sub = FontProperties(fname=fonts['light'], size=22 * scale)
+        font_coords = FontProperties(fname=fonts['regular'], size=14 * scale)
     else:
         # Fallback to system fonts
-        font_main = FontProperties(family='monospace', weight='bold', size=60)
-        font_top = FontProperties(family='monospace', weight='bold', size=40)
-        font_sub = FontProperties(family='monospace', weight='normal', size=22)
-        font_coords = FontProperties(family='monospace', size=14)
+        font_main = FontProperties(family='monospace', weight='bold', size=60 * scale)
+        font_top = FontProperties(family='monospace', weight='bold', size=40 * scale)
+        font_sub = FontProperties(family='monospace', weight='normal', size=22 * scale)
+        font_coords = FontProperties(family='monospace', size=14 * scale)
     
     spaced_city = "  ".join(list(city.upper()))
 
@@ -482,36 +1494,30 @@ def create_poster(city, country, point, dist, output_file, options=None):
     text_positions = options["typography_positions"]
 
     ax.text(0.5, text_positions["city_y"], spaced_city, transform=ax.transAxes,
-            color=THEME['text'], ha='center', fontproperties=font_main, zorder=11)
+            color=theme['text'], ha='center', fontproperties=font_main, zorder=11)
     
     ax.text(0.5, text_positions["country_y"], country.upper(), transform=ax.transAxes,
-            color=THEME['text'], ha='center', fontproperties=font_sub, zorder=11)
+            color=theme['text'], ha='center', fontproperties=font_sub, zorder=11)
     
     lat, lon = point
     coords = _format_coordinates(lat, lon)
     
     ax.text(0.5, text_positions["coords_y"], coords, transform=ax.transAxes,
-            color=THEME['text'], alpha=0.7, ha='center', fontproperties=font_coords, zorder=11)
+            color=theme['text'], alpha=0.7, ha='center', fontproperties=font_coords, zorder=11)
     
     ax.plot([0.4, 0.6], [text_positions["line_y"], text_positions["line_y"]], transform=ax.transAxes, 
-            color=THEME['text'], linewidth=1, zorder=11)
+            color=theme['text'], linewidth=1 * scale, zorder=11)
 
     # --- ATTRIBUTION (bottom right) ---
-    if FONTS:
-        font_attr = FontProperties(fname=FONTS['light'], size=8)
+    if fonts:
+        font_attr = FontProperties(fname=fonts['light'], size=8 * scale)
     else:
-        font_attr = FontProperties(family='monospace', size=8)
+        font_attr = FontProperties(family='monospace', size=8 * scale)
     
     ax.text(0.98, text_positions["attribution_y"], "© OpenStreetMap contributors", transform=ax.transAxes,
-            color=THEME['text'], alpha=0.5, ha='right', va='bottom', 
+            color=theme['text'], alpha=0.5, ha='right', va='bottom', 
             fontproperties=font_attr, zorder=11)
 
-    # 5. Save
-    print(f"Saving to {output_file}...")
-    plt.savefig(output_file, dpi=300, facecolor=THEME['bg'])
-    plt.close()
-    print(f"✓ Done! Poster saved as {output_file}")
-
 def print_examples():
     """Print usage examples."""
     print("""
@@ -557,7 +1563,15 @@ Options:
   --country, -C     Country name (required)
   --theme, -t       Theme name (default: feature_based)
   --distance, -d    Map radius in meters (default: 29000)
+  --distances       Several radii from one fetch, e.g. 4000,8000,15000
+  --zoom-frames     With --distances, also render an N-frame zoom animation
+  --paper           Print format: 12x16, 18x24, a2, a3, a4, square
+  --orientation     With --paper, portrait (default) or landscape
+  --formats         Several print formats from one fetch, e.g. a4,a3:landscape
   --list-themes     List all available themes
+  --batch           Render every row of a .csv/.jsonl jobs file
+  --workers         Worker processes for --batch (default: 2)
+  --profile         Print wall time and peak memory for each stage
 
 Distance guide:
   4000-6000m   Small/dense cities (Venice, Amsterdam old center)
@@ -593,7 +1607,163 @@ def list_themes():
             print(f"    {description}")
         print()
 
+def warm_cache_command(argv):
+    """`create_map_poster.py warm-cache ...`"""
+    from poster_warm import WARM_LAYERS, load_places, warm_cache
+
+    parser = argparse.ArgumentParser(
+        prog="create_map_poster.py warm-cache",
+        description="Pre-download and prepare map data for a list of places"
+    )
+    parser.add_argument('--cities', required=True, help='Text file with one "City, Country" per line')
+    parser.add_argument('--distances', default='4000,10000,29000',
+                        help='Comma-separated distances in meters (default: 4000,10000,29000)')
+    parser.add_argument('--layers', default='roads,water,parks',
+                        help=f"Comma-separated layers from {','.join(WARM_LAYERS)} (default: roads,water,parks)")
+    parser.add_argument('--rate', type=float, default=20,
+                        help='Max Overpass requests per minute (default: 20)')
+    parser.add_argument('--dpi', type=int, default=300,
+                        help='Output dpi the level of detail is chosen for (default: 300)')
+    parser.add_argument('--stop-at', help='Stop starting new fetches at this local time (HH:MM)')
+    parser.add_argument('--report', help='Write a JSON report of what was warmed to this file')
+    args = parser.parse_args(argv)
+
+    try:
+        places = load_places(args.cities)
+        distances = [int(d) for d in args.distances.split(',') if d.strip()]
+        layers = [layer.strip() for layer in args.layers.split(',') if layer.strip()]
+        report = warm_cache(places, distances, layers, requests_per_minute=args.rate,
+                            dpi=args.dpi, stop_at=args.stop_at, report_path=args.report)
+    except (OSError, ValueError) as e:
+        print(f"✗ Error: {e}")
+        return 1
+    return 1 if report['summary'].get('failed') else 0
+
+
+def cache_command(argv):
+    """`create_map_poster.py cache stats|prune ...`"""
+    from poster_cache import CacheManager, parse_age, parse_size
+
+    parser = argparse.ArgumentParser(prog="create_map_poster.py cache",
+                                     description="Inspect or prune the cache directory")
+    subparsers = parser.add_subparsers(dest="action", required=True)
+    subparsers.add_parser("stats", help="Show cache size per area")
+    prune = subparsers.add_parser("prune", help="Evict expired and least recently used entries")
+    prune.add_argument('--max-size', help='Byte budget, e.g. 500M or 5G')
+    prune.add_argument('--max-age', help='Evict entries unused for longer than this, e.g. 12h or 30d')
+    prune.add_argument('--dry-run', action='store_true', help='Only report what would be removed')
+    args = parser.parse_args(argv)
+
+    manager = CacheManager()
+    try:
+        if args.action == "prune":
+            if not args.max_size and not args.max_age:
+                parser.error("prune needs --max-size and/or --max-age")
+            result = manager.prune(
+                max_bytes=parse_size(args.max_size) if args.max_size else None,
+                max_age=parse_age(args.max_age) if args.max_age else None,
+                dry_run=args.dry_run
+            )
+            verb = "Would remove" if args.dry_run else "Removed"
+            print(f"✓ {verb} {result['removed_files']} files ({result['removed_bytes'] / 1024 ** 2:.1f} MB): "
+                  f"{result['reasons']['expired']} expired, {result['reasons']['lru']} least recently used, "
+                  f"{result['reasons']['stale']} stale temp files")
+            print(f"  {result['remaining_bytes'] / 1024 ** 2:.1f} MB remaining")
+            return 0
+
+        stats = manager.stats(refresh=True)
+    except ValueError as e:
+        print(f"✗ Error: {e}")
+        return 1
+
+    print(f"Cache directory: {stats['directory']}")
+    print(f"  {'Area':<10} {'Files':>8} {'Size':>12}")
+    for area, totals in sorted(stats['areas'].items()):
+        print(f"  {area:<10} {totals['files']:>8} {totals['bytes'] / 1024 ** 2:>9.1f} MB")
+    print(f"  {'total':<10} {stats['files']:>8} {stats['bytes'] / 1024 ** 2:>9.1f} MB")
+    if stats['oldest_access']:
+        oldest = datetime.fromtimestamp(stats['oldest_access']).strftime('%Y-%m-%d %H:%M')
+        print(f"  Least recently used entry: {oldest}")
+    return 0
+
+
+def preview_sample_command(argv):
+    """`create_map_poster.py preview-sample ...`"""
+    from poster_preview import SAMPLE_EXTRACT, build_sample_extract
+
+    parser = argparse.ArgumentParser(
+        prog="create_map_poster.py preview-sample",
+        description="Rebuild the sample extract theme previews are drawn from"
+    )
+    parser.add_argument('--city', '-c', required=True, help='City name')
+    parser.add_argument('--country', '-C', required=True, help='Country name')
+    parser.add_argument('--distance', '-d', type=int, default=2000, help='Radius in meters (default: 2000)')
+    parser.add_argument('--output', default=SAMPLE_EXTRACT, help=f'Output file (default: {SAMPLE_EXTRACT})')
+    args = parser.parse_args(argv)
+
+    try:
+        point = get_coordinates(args.city, args.country)
+        sample = build_sample_extract(point, args.distance, args.output, name=f"{args.city}, {args.country}")
+    except Exception as e:
+        print(f"✗ Error: {e}")
+        return 1
+    lines = sum(len(lines) for lines in sample['roads'].values())
+    print(f"✓ Sample extract written to {args.output} ({lines} road lines, "
+          f"{os.path.getsize(args.output) / 1024:.0f} KB)")
+    return 0
+
+
+def worker_command(argv):
+    """`create_map_poster.py worker ...`"""
+    from poster_cost import CostModel
+    from poster_queue import HEARTBEAT_SECONDS, LEASE_SECONDS, POLL_SECONDS, open_queue, run_worker
+    from poster_store import PosterStore
+
+    parser = argparse.ArgumentParser(
+        prog="create_map_poster.py worker",
+        description="Render poster jobs queued by the web app (run any number, on any machine)"
+    )
+    parser.add_argument('--queue', default=os.environ.get('POSTER_QUEUE'),
+                        help='Queue URL: sqlite:///path or redis://host:port/db (default: $POSTER_QUEUE)')
+    parser.add_argument('--posters-dir', default=POSTERS_DIR,
+                        help=f'Shared poster store directory (default: {POSTERS_DIR})')
+    parser.add_argument('--worker-id', help='Name shown in /api/workers (default: host-pid)')
+    parser.add_argument('--lease', type=float, default=LEASE_SECONDS,
+                        help=f'Seconds without a heartbeat before a job is handed to another worker '
+                             f'(default: {LEASE_SECONDS})')
+    parser.add_argument('--heartbeat', type=float, default=HEARTBEAT_SECONDS,
+                        help=f'Seconds between heartbeats (default: {HEARTBEAT_SECONDS})')
+    parser.add_argument('--poll', type=float, default=POLL_SECONDS,
+                        help=f'Seconds between checks of an empty queue (default: {POLL_SECONDS})')
+    parser.add_argument('--max-jobs', type=int, help='Exit after this many jobs')
+    args = parser.parse_args(argv)
+    if not args.queue:
+        parser.error("--queue or POSTER_QUEUE is required")
+    if args.heartbeat >= args.lease:
+        parser.error("--heartbeat must be shorter than --lease")
+
+    try:
+        queue = open_queue(args.queue)
+        store = PosterStore(args.posters_dir)
+    except (ImportError, OSError, ValueError) as e:
+        print(f"✗ Error: {e}")
+        return 1
+    run_worker(queue, store, worker_id=args.worker_id, lease_seconds=args.lease,
+               heartbeat_seconds=args.heartbeat, poll_seconds=args.poll, max_jobs=args.max_jobs,
+               cost_model=CostModel())
+    return 0
+
+
 if __name__ == "__main__":
+    if len(os.sys.argv) > 1 and os.sys.argv[1] == "warm-cache":
+        os.sys.exit(warm_cache_command(os.sys.argv[2:]))
+    if len(os.sys.argv) > 1 and os.sys.argv[1] == "cache":
+        os.sys.exit(cache_command(os.sys.argv[2:]))
+    if len(os.sys.argv) > 1 and os.sys.argv[1] == "preview-sample":
+        os.sys.exit(preview_sample_command(os.sys.argv[2:]))
+    if len(os.sys.argv) > 1 and os.sys.argv[1] == "worker":
+        os.sys.exit(worker_command(os.sys.argv[2:]))
+
     parser = argparse.ArgumentParser(
         description="Generate beautiful map posters for any city",
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -603,6 +1773,13 @@ Examples:
   python create_map_poster.py --city Tokyo --country Japan --theme midnight_blue
   python create_map_poster.py --city Paris --country France --theme noir --distance 15000
   python create_map_poster.py --list-themes
+  python create_map_poster.py --batch jobs.csv --workers 4
+  python create_map_poster.py --city Paris --country France --distances 4000,8000,15000,29000 --zoom-frames 24
+  python create_map_poster.py --city Paris --country France --formats a4,a3,18x24,square:landscape
+  python create_map_poster.py warm-cache --cities cities.txt --distances 4000,10000,29000 --layers roads,water,parks
+  python create_map_poster.py cache prune --max-size 5G --max-age 30d
+  python create_map_poster.py worker --queue redis://localhost:6379/0
+  python create_map_poster.py --city Venice --country Italy --profile --profile-output venice.prof
         """
     )
     
@@ -611,8 +1788,36 @@ Examples:
     parser.add_argument('--theme', '-t', type=str, default='feature_based', help='Theme name (default: feature_based)')
     parser.add_argument('--distance', '-d', type=int, default=29000, help='Map radius in meters (default: 29000)')
     parser.add_argument('--list-themes', action='store_true', help='List all available themes')
+    parser.add_argument('--no-lod', action='store_true',
+                        help='Download every road class and polygon regardless of distance')
+    parser.add_argument('--download-workers', type=int, default=1,
+                        help='Download large extents as this many concurrent tiles (default: 1, off)')
+    parser.add_argument('--download-rate', type=float, default=2.0,
+                        help='With --download-workers, max new requests per second (default: 2.0)')
+    parser.add_argument('--tiles', action='store_true',
+                        help='Also write a Deep Zoom tile pyramid (<poster>.dzi, <poster>_files/) for zoomable viewing')
+    parser.add_argument('--distances', type=str,
+                        help='Render one poster per radius, e.g. 4000,8000,15000, from a single fetch at the largest')
+    parser.add_argument('--zoom-frames', type=int, default=0, metavar='N',
+                        help='With --distances, also render an N-frame zoom animation (<poster>_zoom/, <poster>_zoom.gif)')
+    parser.add_argument('--paper', type=str, choices=sorted(PAPER_SIZES),
+                        help='Print format; the map is cropped to fill the page (default: classic 12x16in)')
+    parser.add_argument('--orientation', type=str, choices=['portrait', 'landscape'], default='portrait',
+                        help='With --paper, page orientation (default: portrait)')
+    parser.add_argument('--formats', type=str,
+                        help='Render several print formats from one fetch, e.g. a4,a3:landscape,square')
+    parser.add_argument('--batch', type=str, help='Render every row of a .csv or .jsonl jobs file')
+    parser.add_argument('--workers', type=int, default=2, help='Worker processes for --batch (default: 2)')
+    parser.add_argument('--output-dir', type=str, help='Output directory for --batch (default: posters/batch_<name>)')
+    parser.add_argument('--manifest', type=str, help='Manifest path for --batch (default: <output-dir>/manifest.json)')
+    parser.add_argument('--profile', action='store_true', help='Print wall time and peak memory for each stage')
+    parser.add_argument('--profile-output', type=str, help='With --profile, also write cProfile stats to this .prof file')
+    parser.add_argument('--tracemalloc-top', type=int, default=0, metavar='N',
+                        help='With --profile, also list the top N allocation sites')
     
     args = parser.parse_args()
+    if (args.profile_output or args.tracemalloc_top) and not args.profile:
+        parser.error("--profile-output and --tracemalloc-top require --profile")
     
     # If no arguments provided, show examples
     if len(os.sys.argv) == 1:
@@ -623,6 +1828,13 @@ Examples:
     if args.list_themes:
         list_themes()
         os.sys.exit(0)
+
+    # Batch mode
+    if args.batch:
+        from poster_batch import run_batch
+        manifest = run_batch(args.batch, output_dir=args.output_dir,
+                             workers=args.workers, manifest_path=args.manifest)
+        os.sys.exit(1 if manifest['failed_row_ids'] else 0)
     
     # Validate required arguments
     if not args.city or not args.country:
@@ -644,15 +1856,41 @@ Examples:
     # Load theme
     THEME = load_theme(args.theme)
     
+    if args.profile:
+        from poster_profile import StageProfiler
+        profiler = StageProfiler(profile_output=args.profile_output,
+                                 tracemalloc_top=args.tracemalloc_top)
+    else:
+        from contextlib import nullcontext
+        profiler = nullcontext()
+
     # Get coordinates and generate poster
     try:
-        coords = get_coordinates(args.city, args.country)
-        output_file = generate_output_filename(args.city, args.theme)
-        create_poster(args.city, args.country, coords, args.distance, output_file)
+        with profiler:
+            coords = get_coordinates(args.city, args.country)
+            output_file = generate_output_filename(args.city, args.theme)
+            options = {"lod": not args.no_lod,
+                       "download_workers": args.download_workers,
+                       "download_rate": args.download_rate,
+                       "tiles": args.tiles,
+                       "paper_size": args.paper,
+                       "orientation": args.orientation}
+            if args.distances or args.formats:
+                from poster_series import render_series
+                render_series(args.city, args.country, coords, args.distances or [args.distance],
+                              output_file, options=options, theme=THEME, frames=args.zoom_frames,
+                              formats=args.formats)
+            else:
+                create_poster(args.city, args.country, coords, args.distance, output_file,
+                              options=options)
         
         print("\n" + "=" * 50)
         print("✓ Poster generation complete!")
         print("=" * 50)
+
+        if args.profile:
+            print("\nStage profile:")
+            print(profiler.report())
         
     except Exception as e:
         print(f"\n✗ Error: {e}")
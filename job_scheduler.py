@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Map Poster Generator - Job Scheduler
+Priority scheduling, per-client fairness, memory budgets and cooperative
+cancellation for poster generation jobs
+"""
+
+import heapq
+import itertools
+import threading
+import time
+
+# Lower rank runs first
+PRIORITY_PREVIEW = 0
+PRIORITY_RENDER = 1
+PRIORITY_BATCH = 2
+
+
+class Job:
+    """A unit of work waiting for, or running on, a scheduler worker"""
+    def __init__(self, job_id, func, client_id, priority, distance, seq, memory=0, seconds=0.0):
+        self.job_id = job_id
+        self.func = func
+        self.client_id = client_id
+        self.priority = priority
+        self.distance = distance
+        self.seq = seq
+        self.memory = memory
+        self.seconds = seconds
+        self.started_at = None
+        self.state = 'queued'
+        self.cancel_event = threading.Event()
+
+    def sort_key(self):
+        return (self.priority, self.distance, self.seq)
+
+    def __lt__(self, other):
+        return self.sort_key() < other.sort_key()
+
+    def is_cancelled(self):
+        return self.cancel_event.is_set()
+
+
+class JobScheduler:
+    """
+    Runs jobs on a fixed pool of worker threads.
+
+    Each client has its own priority heap ordered by (priority, distance).
+    When a worker frees up it takes the best head job across clients,
+    preferring clients with fewer jobs running and fewer jobs served since
+    their queue was last empty, so one client submitting many jobs cannot
+    starve everyone else.
+
+    With a `memory_budget`, the best job waits until its estimated memory
+    fits alongside the running jobs' (a job always runs on an idle pool),
+    so large jobs hold back smaller ones rather than being starved.
+
+    Jobs receive a `should_cancel` callable and are expected to poll it
+    between stages; `cancel()` removes queued jobs immediately and flags
+    running ones.
+    """
+    def __init__(self, workers=2, memory_budget=None):
+        self.memory_budget = memory_budget
+        self._lock = threading.Condition()
+        self._queues = {}
+        self._running = {}
+        self._served = {}
+        self._jobs = {}
+        self._memory_in_use = 0
+        self._seq = itertools.count()
+        self._workers = []
+        for i in range(max(1, int(workers))):
+            thread = threading.Thread(target=self._worker_loop,
+                                      name=f"poster-worker-{i}")
+            thread.daemon = True
+            thread.start()
+            self._workers.append(thread)
+
+    def submit(self, job_id, func, client_id="anonymous",
+               priority=PRIORITY_RENDER, distance=0, memory=0, seconds=0.0):
+        """
+        Queue `func(should_cancel)` for execution and return the Job.
+        `memory` (bytes) and `seconds` are the job's estimated cost.
+        """
+        with self._lock:
+            job = Job(job_id, func, client_id, priority, distance, next(self._seq),
+                      memory=memory, seconds=seconds)
+            self._jobs[job_id] = job
+            heapq.heappush(self._queues.setdefault(client_id, []), job)
+            self._lock.notify()
+            return job
+
+    def cancel(self, job_id):
+        """
+        Cancel a job. Returns the job state after cancellation
+        ('cancelled' for queued jobs, 'cancelling' for running ones),
+        or None if the job is unknown or already finished.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.state in ('done', 'cancelled'):
+                return None
+
+            job.cancel_event.set()
+            if job.state == 'queued':
+                queue = self._queues.get(job.client_id, [])
+                if job in queue:
+                    queue.remove(job)
+                    heapq.heapify(queue)
+                job.state = 'cancelled'
+                del self._jobs[job_id]
+            else:
+                job.state = 'cancelling'
+            return job.state
+
+    def position(self, job_id):
+        """Number of queued jobs that would run before this one, or None."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.state != 'queued':
+                return None
+            ahead = 0
+            for queue in self._queues.values():
+                ahead += sum(1 for other in queue if other.sort_key() < job.sort_key())
+            return ahead
+
+    def eta(self, job_id):
+        """
+        Estimated seconds until a job finishes, from the estimates of the
+        jobs running and queued ahead of it, or None if it is not known.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.state in ('done', 'cancelled'):
+                return None
+            now = time.monotonic()
+            if job.started_at is not None:
+                return max(0.0, job.seconds - (now - job.started_at))
+            ahead = sum(max(0.0, other.seconds - (now - other.started_at))
+                        for other in self._jobs.values() if other.started_at is not None)
+            for queue in self._queues.values():
+                ahead += sum(other.seconds for other in queue if other.sort_key() < job.sort_key())
+            return ahead / len(self._workers) + job.seconds
+
+    def memory_in_use(self):
+        with self._lock:
+            return self._memory_in_use
+
+    def queue_depth(self):
+        with self._lock:
+            return sum(len(queue) for queue in self._queues.values())
+
+    def active_count(self):
+        with self._lock:
+            return sum(self._running.values())
+
+    def _next_job(self):
+        best = None
+        best_key = None
+        for client_id, queue in self._queues.items():
+            if not queue:
+                continue
+            head = queue[0]
+            key = (head.priority, self._running.get(client_id, 0),
+                   self._served.get(client_id, 0), head.distance, head.seq)
+            if best_key is None or key < best_key:
+                best, best_key = head, key
+        if best is not None and self.memory_budget is not None and self._running:
+            if self._memory_in_use + best.memory > self.memory_budget:
+                return None
+        if best is not None:
+            heapq.heappop(self._queues[best.client_id])
+            self._served[best.client_id] = self._served.get(best.client_id, 0) + 1
+        return best
+
+    def _worker_loop(self):
+        while True:
+            with self._lock:
+                job = self._next_job()
+                while job is None:
+                    self._lock.wait()
+                    job = self._next_job()
+                job.state = 'running'
+                job.started_at = time.monotonic()
+                self._memory_in_use += job.memory
+                self._running[job.client_id] = self._running.get(job.client_id, 0) + 1
+
+            try:
+                job.func(job.is_cancelled)
+            except Exception as e:
+                print(f"✗ Job {job.job_id} failed: {e}")
+            finally:
+                with self._lock:
+                    job.state = 'done'
+                    self._memory_in_use -= job.memory
+                    self._running[job.client_id] -= 1
+                    if not self._running[job.client_id]:
+                        del self._running[job.client_id]
+                    if not self._queues.get(job.client_id) and job.client_id not in self._running:
+                        self._queues.pop(job.client_id, None)
+                        self._served.pop(job.client_id, None)
+                    self._jobs.pop(job.job_id, None)
+                    # A job held back by the memory budget may fit now
+                    self._lock.notify_all()
@@ -8,16 +8,21 @@ import tkinter as tk
 from tkinter import ttk, messagebox, filedialog, scrolledtext
 import json
 import os
-import threading
 from pathlib import Path
-from PIL import Image, ImageTk
 import sys
 
 # Import the main poster creation functions
 from create_map_poster import (
-    get_coordinates, create_poster, load_theme,
-    get_available_themes, generate_output_filename
+    load_theme, get_available_themes, generate_output_filename, derivative_path
 )
+from poster_preview import PreviewEngine
+from poster_worker import RenderWorker
+
+# How often the UI checks the render worker for progress
+WORKER_POLL_MS = 100
+
+# Theme previews drawn over the bundled sample map, cached by theme colours
+PREVIEW_ENGINE = PreviewEngine()
 
 class ThemePreviewCanvas(tk.Canvas):
     """Canvas widget to display a visual preview of a theme's colors"""
@@ -28,9 +33,24 @@ class ThemePreviewCanvas(tk.Canvas):
         self.draw_preview()
 
     def draw_preview(self):
-        """Draw a simplified map preview using theme colors"""
+        """Draw the theme over the sample map, or a sketch if that fails"""
         self.delete("all")
+        try:
+            from PIL import ImageTk
+
+            image = PREVIEW_ENGINE.render(self.theme_data, (200, 100))
+            self._photo = ImageTk.PhotoImage(image)  # Keep reference
+            self.create_image(0, 0, image=self._photo, anchor=tk.NW)
+        except Exception:
+            self._draw_sketch()
+
+        # Text preview
+        text_color = self.theme_data.get('text', '#000000')
+        self.create_text(100, 90, text=self.theme_data.get('name', 'Theme'),
+                        fill=text_color, font=('Arial', 8, 'bold'))
 
+    def _draw_sketch(self):
+        """Simplified stand-in drawing using theme colors"""
         # Background
         bg_color = self.theme_data.get('bg', '#FFFFFF')
         self.configure(bg=bg_color)
@@ -58,11 +78,6 @@ class ThemePreviewCanvas(tk.Canvas):
         self.create_line(0, 60, 200, 60, fill=residential_color, width=1)
         self.create_line(150, 0, 150, 100, fill=residential_color, width=1)
 
-        # Text preview
-        text_color = self.theme_data.get('text', '#000000')
-        self.create_text(100, 90, text=self.theme_data.get('name', 'Theme'),
-                        fill=text_color, font=('Arial', 8, 'bold'))
-
 
 class ThemeCreatorDialog(tk.Toplevel):
     """Dialog window for creating/editing custom themes"""
@@ -90,6 +105,7 @@ class ThemeCreatorDialog(tk.Toplevel):
         }
 
         self.color_entries = {}
+        self._preview_job = None
         self.setup_ui()
 
     def setup_ui(self):
@@ -150,6 +166,7 @@ class ThemeCreatorDialog(tk.Toplevel):
                     box.configure(bg=color)
                 except:
                     pass
+                self.schedule_preview()
 
             entry.bind('<KeyRelease>', update_preview)
 
@@ -161,6 +178,7 @@ class ThemeCreatorDialog(tk.Toplevel):
                     ent.delete(0, tk.END)
                     ent.insert(0, color)
                     box.configure(bg=color)
+                    self.update_preview()
 
             ttk.Button(frame, text="Pick", width=8,
                       command=pick_color).pack(side=tk.LEFT)
@@ -189,8 +207,15 @@ class ThemeCreatorDialog(tk.Toplevel):
         # Initial preview
         self.update_preview()
 
+    def schedule_preview(self):
+        """Redraw the preview once typing pauses"""
+        if self._preview_job is not None:
+            self.after_cancel(self._preview_job)
+        self._preview_job = self.after(150, self.update_preview)
+
     def update_preview(self):
         """Update the theme preview"""
+        self._preview_job = None
         # Get current theme data from entries
         current_theme = {
             'name': self.name_entry.get(),
@@ -244,10 +269,14 @@ class MapPosterGUI:
         self.root.title("Map Poster Generator")
         self.root.geometry("1000x800")
 
-        # Global theme variable
         self.current_theme = None
         self.generated_poster_path = None
 
+        # Renders run in a separate process; the UI only polls its events
+        self.worker = RenderWorker()
+        self.current_job = None
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
         self.setup_ui()
         self.load_themes()
 
@@ -323,7 +352,11 @@ class MapPosterGUI:
         self.generate_btn = ttk.Button(left_panel, text="Generate Poster",
                                        command=self.generate_poster,
                                        style='Accent.TButton')
-        self.generate_btn.pack(fill=tk.X, pady=10)
+        self.generate_btn.pack(fill=tk.X, pady=(10, 2))
+
+        self.cancel_btn = ttk.Button(left_panel, text="Cancel",
+                                     command=self.cancel_generation, state='disabled')
+        self.cancel_btn.pack(fill=tk.X, pady=(0, 10))
 
         # Progress
         self.progress_var = tk.StringVar(value="Ready")
@@ -450,7 +483,7 @@ class MapPosterGUI:
                 self.on_theme_select(None)
 
     def generate_poster(self):
-        """Generate the map poster in a background thread"""
+        """Send the poster job to the background render worker"""
         city = self.city_entry.get().strip()
         country = self.country_entry.get().strip()
         distance = self.distance_var.get()
@@ -465,79 +498,110 @@ class MapPosterGUI:
 
         # Disable generate button
         self.generate_btn.config(state='disabled')
-        self.progress_var.set("Generating poster...")
+        self.cancel_btn.config(state='normal')
+        self.progress_var.set("Starting render worker...")
         self.progress_bar.start()
 
         # Hide poster preview
         self.poster_preview_label.config(image='', text='')
+        self.poster_preview_label.image = None
         self.save_btn.pack_forget()
 
-        # Run generation in background thread
-        thread = threading.Thread(target=self._generate_poster_thread,
-                                 args=(city, country, distance))
-        thread.daemon = True
-        thread.start()
-
-    def _generate_poster_thread(self, city, country, distance):
-        """Background thread for poster generation"""
+        # The theme travels with the job; nothing global is modified
+        output_file = generate_output_filename(city, self.current_theme)
+        self.current_job = self.worker.submit(
+            city, country, distance, output_file, theme=load_theme(self.current_theme),
+            options={"derivatives": True, "map_layer_cache": True}
+        )
+        self.root.after(WORKER_POLL_MS, self._poll_worker)
+
+    def cancel_generation(self):
+        """Ask the worker to stop the current poster at its next stage"""
+        if self.current_job:
+            self.worker.cancel(self.current_job)
+            self.cancel_btn.config(state='disabled')
+            self.progress_var.set("Cancelling...")
+
+    def _poll_worker(self):
+        """Apply progress, preview and completion events from the worker"""
+        for kind, job_id, payload in self.worker.poll():
+            if job_id not in (self.current_job, None):
+                continue
+            if kind == "progress":
+                self.progress_var.set(payload)
+            elif kind == "preview":
+                self._show_preview(*payload)
+            elif kind == "done":
+                self._on_generation_complete(payload)
+            elif kind == "cancelled":
+                self._on_generation_cancelled()
+            elif kind == "error":
+                self._on_generation_error(payload)
+
+        if self.current_job:
+            self.root.after(WORKER_POLL_MS, self._poll_worker)
+
+    def _show_preview(self, size, data):
+        """Show the downscaled render sent before the full-size file is encoded"""
         try:
-            # Load theme
-            global THEME
-            from create_map_poster import THEME as _THEME
-            theme_data = load_theme(self.current_theme)
-
-            # Monkey patch the THEME variable
-            import create_map_poster
-            create_map_poster.THEME = theme_data
-
-            # Get coordinates
-            self.root.after(0, lambda: self.progress_var.set("Looking up coordinates..."))
-            coords = get_coordinates(city, country)
-
-            # Generate poster
-            self.root.after(0, lambda: self.progress_var.set("Downloading map data..."))
-            output_file = generate_output_filename(city, self.current_theme)
-
-            create_poster(city, country, coords, distance, output_file)
-
-            # Success
-            self.generated_poster_path = output_file
-            self.root.after(0, lambda: self._on_generation_complete(output_file))
+            from PIL import Image, ImageTk
 
+            photo = ImageTk.PhotoImage(Image.frombytes("RGB", size, data))
+            self.poster_preview_label.config(image=photo, text='')
+            self.poster_preview_label.image = photo  # Keep reference
         except Exception as e:
-            self.root.after(0, lambda: self._on_generation_error(str(e)))
+            self.poster_preview_label.config(text=f"Preview unavailable: {e}")
 
-    def _on_generation_complete(self, output_file):
-        """Called when poster generation completes successfully"""
+    def _finish_job(self):
+        self.current_job = None
         self.progress_bar.stop()
-        self.progress_var.set(f"✓ Poster saved: {os.path.basename(output_file)}")
         self.generate_btn.config(state='normal')
+        self.cancel_btn.config(state='disabled')
 
-        # Load and display thumbnail
-        try:
-            img = Image.open(output_file)
-            img.thumbnail((400, 533))  # Maintain aspect ratio
-            photo = ImageTk.PhotoImage(img)
-
-            self.poster_preview_label.config(image=photo, text='')
-            self.poster_preview_label.image = photo  # Keep reference
+    def _on_generation_complete(self, output_file):
+        """Called when poster generation completes successfully"""
+        self._finish_job()
+        self.generated_poster_path = output_file
+        self.progress_var.set(f"✓ Poster saved: {os.path.basename(output_file)}")
 
-            # Show save button
-            self.save_btn.pack(pady=10)
+        # The worker normally sent a preview already; fall back to the written thumbnail
+        if getattr(self.poster_preview_label, 'image', None) is None:
+            try:
+                from PIL import Image, ImageTk
+
+                thumbnail_path = derivative_path(output_file, "thumb")
+                img = Image.open(thumbnail_path if os.path.exists(thumbnail_path) else output_file)
+                img.thumbnail((400, 533))  # Maintain aspect ratio
+                photo = ImageTk.PhotoImage(img)
+                self.poster_preview_label.config(image=photo, text='')
+                self.poster_preview_label.image = photo  # Keep reference
+            except Exception as e:
+                self.poster_preview_label.config(text=f"Preview unavailable: {e}")
 
-        except Exception as e:
-            self.poster_preview_label.config(text=f"Preview unavailable: {e}")
+        # Show save button
+        self.save_btn.pack(pady=10)
 
         messagebox.showinfo("Success", f"Poster generated successfully!\n\nSaved to: {output_file}")
 
+    def _on_generation_cancelled(self):
+        """Called when the worker stopped the poster after a cancel"""
+        self._finish_job()
+        self.progress_var.set("Generation cancelled")
+        self.poster_preview_label.config(image='', text='')
+        self.poster_preview_label.image = None
+
     def _on_generation_error(self, error_msg):
         """Called when poster generation fails"""
-        self.progress_bar.stop()
+        self._finish_job()
         self.progress_var.set("✗ Generation failed")
-        self.generate_btn.config(state='normal')
 
         messagebox.showerror("Error", f"Failed to generate poster:\n\n{error_msg}")
 
+    def on_close(self):
+        """Stop the render worker with the window"""
+        self.worker.stop()
+        self.root.destroy()
+
     def save_poster(self):
         """Save the generated poster to a user-specified location"""
         if not self.generated_poster_path or not os.path.exists(self.generated_poster_path):
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Map Poster Generator - Batch Generation
+Renders many posters in one process pool, fetching map data once for every
+group of rows that share a location, extent and layer selection
+"""
+
+import csv
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from create_map_poster import (
+    fetch_map_data, fetch_signature, get_coordinates, load_theme,
+    render_poster, POSTERS_DIR
+)
+from poster_store import _slug
+
+
+def load_batch_jobs(path):
+    """
+    Read batch rows from a .csv or .jsonl file.
+
+    Each row needs `city` and `country`; `theme`, `distance`, `lat`, `lon`,
+    `output` and `options` (a JSON object, or a JSON string in CSV files)
+    are optional.
+    """
+    rows = []
+    if path.endswith('.jsonl'):
+        with open(path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    rows.append(json.loads(line))
+    else:
+        with open(path, 'r', newline='') as f:
+            for row in csv.DictReader(f):
+                rows.append({k: v for k, v in row.items() if v not in (None, '')})
+
+    return [normalize_batch_row(row, index) for index, row in enumerate(rows)]
+
+
+def normalize_batch_row(row, index):
+    """Fill in defaults and give the row a stable id for checkpointing."""
+    city = str(row.get('city', '')).strip()
+    country = str(row.get('country', '')).strip()
+    if not city or not country:
+        raise ValueError(f"Batch row {index}: city and country are required")
+
+    options = row.get('options') or {}
+    if isinstance(options, str):
+        options = json.loads(options)
+
+    normalized = {
+        'city': city,
+        'country': country,
+        'theme': row.get('theme') or 'feature_based',
+        'distance': int(float(row.get('distance') or 29000)),
+        'options': options,
+        'output': row.get('output')
+    }
+    if row.get('lat') not in (None, '') and row.get('lon') not in (None, ''):
+        normalized['point'] = (float(row['lat']), float(row['lon']))
+
+    digest = hashlib.sha1(json.dumps(normalized, sort_keys=True).encode()).hexdigest()[:12]
+    normalized['row_id'] = f"{index:05d}_{digest}"
+    return normalized
+
+
+def batch_output_name(row):
+    """Deterministic file name for a row, so resumed batches reuse outputs."""
+    return f"{row['row_id'][:5]}_{_slug(row['city'])}_{_slug(row['theme'])}_{row['distance']}m.png"
+
+
+def _output_path(row, output_dir):
+    if row.get('output'):
+        return row['output']
+    return os.path.join(output_dir, batch_output_name(row))
+
+
+def group_batch_rows(rows):
+    """Group rows whose map data can be fetched once and shared."""
+    groups = {}
+    for row in rows:
+        key = fetch_signature(row['point'], row['distance'], row['options'])
+        groups.setdefault(key, []).append(row)
+    return list(groups.values())
+
+
+def run_group(rows, output_dir=POSTERS_DIR, should_cancel=None):
+    """
+    Fetch the shared data for one group once and render every row in it.
+    Returns one result dict per row with output path and timings.
+    """
+    first = rows[0]
+    start = time.perf_counter()
+    data = fetch_map_data(first['point'], first['distance'], first['options'],
+                          should_cancel=should_cancel)
+    fetch_seconds = time.perf_counter() - start
+
+    results = []
+    for row in rows:
+        output_file = _output_path(row, output_dir)
+        os.makedirs(os.path.dirname(output_file) or '.', exist_ok=True)
+        render_start = time.perf_counter()
+        try:
+            render_poster(row['city'], row['country'], row['point'], data, output_file,
+                          row['options'], theme=load_theme(row['theme']),
+                          should_cancel=should_cancel)
+            error = None
+        except Exception as e:
+            if should_cancel is not None and should_cancel():
+                raise
+            error = str(e)
+            output_file = None
+        results.append({
+            'row_id': row['row_id'],
+            'city': row['city'],
+            'country': row['country'],
+            'theme': row['theme'],
+            'distance': row['distance'],
+            'output_file': output_file,
+            'error': error,
+            'fetch_seconds': round(fetch_seconds, 3),
+            'render_seconds': round(time.perf_counter() - render_start, 3),
+            'shared_fetch_rows': len(rows)
+        })
+    return results
+
+
+def _read_checkpoint(checkpoint_path):
+    done = {}
+    if not os.path.exists(checkpoint_path):
+        return done
+    with open(checkpoint_path, 'r') as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                # A partially written final line from an interrupted run
+                continue
+            if not result.get('error'):
+                done[result['row_id']] = result
+    return done
+
+
+def failed_result(row, error):
+    """Result dict for a row that produced no poster."""
+    return {'row_id': row['row_id'], 'city': row['city'], 'country': row['country'],
+            'theme': row['theme'], 'distance': row['distance'], 'output_file': None,
+            'error': str(error)}
+
+
+def resolve_coordinates(rows):
+    """
+    Geocode rows without explicit coordinates, once per city/country.
+    Returns (rows with coordinates, failed results for rows that could not
+    be geocoded).
+    """
+    lookups = {}
+    resolved, failed = [], []
+    for row in rows:
+        if 'point' not in row:
+            key = (row['city'].lower(), row['country'].lower())
+            if key not in lookups:
+                try:
+                    lookups[key] = get_coordinates(row['city'], row['country'])
+                except Exception as e:
+                    lookups[key] = e
+            if isinstance(lookups[key], Exception):
+                failed.append(failed_result(row, f"Geocoding failed: {lookups[key]}"))
+                continue
+            row['point'] = lookups[key]
+        resolved.append(row)
+    return resolved, failed
+
+
+def run_batch(jobs_path, output_dir=None, workers=2, manifest_path=None):
+    """
+    Run every row in `jobs_path` and write a manifest of outputs with timings.
+
+    Completed rows are appended to `<manifest>.checkpoint.jsonl` as their
+    group finishes, so re-running the same command resumes an interrupted
+    batch instead of starting over.
+    """
+    rows = load_batch_jobs(jobs_path)
+    if output_dir is None:
+        base = os.path.splitext(os.path.basename(jobs_path))[0]
+        output_dir = os.path.join(POSTERS_DIR, f"batch_{base}")
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = manifest_path or os.path.join(output_dir, "manifest.json")
+    checkpoint_path = f"{os.path.splitext(manifest_path)[0]}.checkpoint.jsonl"
+
+    done = _read_checkpoint(checkpoint_path)
+    pending = [row for row in rows if row['row_id'] not in done]
+    print(f"Batch: {len(rows)} rows, {len(done)} already complete, {len(pending)} to run")
+
+    pending, geocode_failures = resolve_coordinates(pending)
+    groups = group_batch_rows(pending)
+    print(f"Batch: {len(groups)} distinct map extents to fetch")
+
+    def record(checkpoint, results):
+        for result in results:
+            checkpoint.write(json.dumps(result) + "\n")
+            if not result['error']:
+                done[result['row_id']] = result
+                print(f"✓ {result['city']} ({result['theme']}, {result['distance']}m) → {result['output_file']}")
+            else:
+                print(f"✗ {result['city']} ({result['theme']}, {result['distance']}m): {result['error']}")
+        checkpoint.flush()
+
+    batch_start = time.perf_counter()
+    with open(checkpoint_path, 'a') as checkpoint, \
+            ProcessPoolExecutor(max_workers=max(1, int(workers))) as pool:
+        record(checkpoint, geocode_failures)
+        futures = {pool.submit(run_group, group, output_dir): group for group in groups}
+        for future in as_completed(futures):
+            group = futures[future]
+            try:
+                results = future.result()
+            except Exception as e:
+                results = [failed_result(row, e) for row in group]
+            record(checkpoint, results)
+
+    failed = [row['row_id'] for row in rows if row['row_id'] not in done]
+    manifest = {
+        'jobs_file': jobs_path,
+        'completed_at': datetime.now().isoformat(timespec='seconds'),
+        'wall_seconds': round(time.perf_counter() - batch_start, 3),
+        'rows': [done[row['row_id']] for row in rows if row['row_id'] in done],
+        'failed_row_ids': failed
+    }
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    print(f"✓ Manifest written to {manifest_path} ({len(manifest['rows'])} ok, {len(failed)} failed)")
+    return manifest
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Map Poster Generator - Cache Manager
+Keeps the cache/ directory (osmnx HTTP responses, prepared graphs and
+layers) under a byte budget with least-recently-used and age-based eviction
+"""
+
+import os
+import re
+import threading
+import time
+
+import create_map_poster
+from create_map_poster import count, remove_idle_lock
+
+# Small and expensive to rebuild one entry at a time; never evicted.
+# Maps each file to the area it is reported under in stats
+PROTECTED_FILES = {"geocode_cache.json": "geocode", "cost_history.json": "cost_history"}
+
+# Single-flight lock files unused for this long are removed, unless held
+STALE_LOCK_AGE = 3600
+
+# Files touched more recently than this may belong to an in-flight fetch
+DEFAULT_MIN_AGE = 60
+
+# Temporary files older than this are left over from a crashed writer
+STALE_TMP_AGE = 3600
+
+_SIZE_RE = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*([KMGT]?)I?B?\s*$', re.IGNORECASE)
+_AGE_RE = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*([smhdw]?)\s*$', re.IGNORECASE)
+
+
+def parse_size(text):
+    """'500M', '5G', '1.5GB' or plain bytes -> int bytes."""
+    match = _SIZE_RE.match(str(text))
+    if not match:
+        raise ValueError(f"Invalid size: {text!r}")
+    number, unit = match.groups()
+    return int(float(number) * 1024 ** " KMGT".index(unit.upper() or " "))
+
+
+def parse_age(text):
+    """'90s', '12h', '30d', '2w' or plain seconds -> float seconds."""
+    match = _AGE_RE.match(str(text))
+    if not match:
+        raise ValueError(f"Invalid age: {text!r}")
+    number, unit = match.groups()
+    return float(number) * {"": 1, "s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}[unit.lower()]
+
+
+def _area(relative_path):
+    top = relative_path.split(os.sep, 1)[0]
+    if top in ("layers", "graphs", "geometry", "map_layers", "locks"):
+        return top
+    if relative_path in PROTECTED_FILES:
+        return PROTECTED_FILES[relative_path]
+    if relative_path.endswith(".json") and os.sep not in relative_path:
+        return "osmnx"
+    return "other"
+
+
+class CacheManager:
+    """
+    Enforces a byte budget and a maximum age on the cache directory.
+
+    Recency is the file mtime: cache readers in create_map_poster touch a
+    file on every hit, so the oldest mtime is the least recently used
+    entry. Eviction skips files touched in the last `min_age` seconds and
+    in-progress temporary files, and readers treat a file that disappears
+    under them as a miss, so pruning is safe while workers are running.
+    """
+    def __init__(self, cache_dir=None, max_bytes=None, max_age=None,
+                 min_age=DEFAULT_MIN_AGE, stats_ttl=30.0):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.min_age = min_age
+        self.stats_ttl = stats_ttl
+        self._lock = threading.Lock()
+        self._stats = None
+        self._stats_time = 0.0
+        self._pruner = None
+
+    @property
+    def directory(self):
+        # Follow create_map_poster.CACHE_DIR unless given explicitly
+        return self.cache_dir or create_map_poster.CACHE_DIR
+
+    def scan(self):
+        """Return [(path, relative_path, size, mtime)] for every cache entry."""
+        entries = []
+        root = self.directory
+        if not os.path.isdir(root):
+            return entries
+        for dirpath, _, filenames in os.walk(root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((path, os.path.relpath(path, root), st.st_size, st.st_mtime))
+        return entries
+
+    def stats(self, refresh=False):
+        """Totals per cache area; cached for `stats_ttl` seconds."""
+        with self._lock:
+            now = time.monotonic()
+            if not refresh and self._stats is not None and now - self._stats_time < self.stats_ttl:
+                return self._stats
+
+        areas = {}
+        total_bytes = 0
+        oldest = newest = None
+        entries = self.scan()
+        for _, relative, size, mtime in entries:
+            area = areas.setdefault(_area(relative), {'files': 0, 'bytes': 0})
+            area['files'] += 1
+            area['bytes'] += size
+            total_bytes += size
+            oldest = mtime if oldest is None else min(oldest, mtime)
+            newest = mtime if newest is None else max(newest, mtime)
+
+        stats = {
+            'directory': self.directory,
+            'files': len(entries),
+            'bytes': total_bytes,
+            'max_bytes': self.max_bytes,
+            'max_age_seconds': self.max_age,
+            'areas': areas,
+            'oldest_access': oldest,
+            'newest_access': newest
+        }
+        with self._lock:
+            self._stats = stats
+            self._stats_time = time.monotonic()
+        return stats
+
+    def total_bytes(self):
+        return self.stats()['bytes']
+
+    def prune(self, max_bytes=None, max_age=None, dry_run=False):
+        """
+        Remove expired entries, then least recently used ones until the
+        cache fits in `max_bytes`. Returns a summary dict.
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        max_age = self.max_age if max_age is None else max_age
+        now = time.time()
+
+        evictable = []
+        kept_bytes = 0
+        removed = []
+        for path, relative, size, mtime in self.scan():
+            age = now - mtime
+            if relative in PROTECTED_FILES:
+                kept_bytes += size
+            elif relative.split(os.sep, 1)[0] == "locks":
+                # Empty files, so they only count against the file count
+                if age > STALE_LOCK_AGE:
+                    removed.append((path, size, 'stale'))
+            elif relative.endswith('.tmp'):
+                if age > STALE_TMP_AGE:
+                    removed.append((path, size, 'stale'))
+                else:
+                    kept_bytes += size
+            elif age < self.min_age:
+                kept_bytes += size
+            elif max_age is not None and age > max_age:
+                removed.append((path, size, 'expired'))
+            else:
+                evictable.append((mtime, path, size))
+
+        total = kept_bytes + sum(size for _, _, size in evictable)
+        if max_bytes is not None and total > max_bytes:
+            for mtime, path, size in sorted(evictable):
+                if total <= max_bytes:
+                    break
+                removed.append((path, size, 'lru'))
+                total -= size
+
+        removed_bytes = 0
+        removed_files = 0
+        for path, size, _ in removed:
+            if not dry_run:
+                if path.endswith('.lock'):
+                    if not remove_idle_lock(path):
+                        continue
+                else:
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        continue
+            removed_files += 1
+            removed_bytes += size
+
+        if not dry_run:
+            count("cache_evicted_files", removed_files)
+            count("cache_evicted_bytes", removed_bytes)
+            with self._lock:
+                self._stats = None
+
+        return {
+            'removed_files': removed_files,
+            'removed_bytes': removed_bytes,
+            'reasons': {reason: sum(1 for *_, r in removed if r == reason)
+                        for reason in ('expired', 'lru', 'stale')},
+            'remaining_bytes': total,
+            'dry_run': dry_run
+        }
+
+    def start_pruner(self, interval=600):
+        """Prune every `interval` seconds on a daemon thread."""
+        if self._pruner is not None:
+            return
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    result = self.prune()
+                except OSError as e:
+                    print(f"⚠ Cache prune failed: {e}")
+                    continue
+                if result['removed_files']:
+                    print(f"✓ Cache pruned: {result['removed_files']} files, "
+                          f"{result['removed_bytes'] / 1024 ** 2:.1f} MB")
+
+        self._pruner = threading.Thread(target=run, daemon=True)
+        self._pruner.start()
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Map Poster Generator - Cost Estimates
+Predicts download size, vertex count, memory and time of a poster job
+before it starts, calibrated by the jobs that ran before it
+"""
+
+import json
+import math
+import os
+import threading
+
+from create_map_poster import (
+    _custom_layers, _lock_file, _merge_options, _network_types, _osmnx, _unlock_file, count,
+    fetch_radius, lod_highway_classes, paper_size_in, prepared_cache_paths, CACHE_DIR, LOD_LEVELS
+)
+
+COST_HISTORY_FILE = os.path.join(CACHE_DIR, "cost_history.json")
+
+# Prepared-cache bytes per km² of a dense city centre, before level of detail
+LAYER_BYTES_PER_KM2 = {
+    "network": 150000,
+    "water": 6000,
+    "parks": 20000,
+    "buildings": 400000,
+    "railways": 5000,
+    "custom": 10000,
+}
+
+# Density falls off away from the centre as 1 / (1 + (r / URBAN_RADIUS_KM)²)
+URBAN_RADIUS_KM = 6.0
+
+# Share of the full street network each network type or LOD level keeps
+NETWORK_TYPE_SHARE = {"all": 1.0, "drive": 0.35, "bike": 0.6, "walk": 0.8}
+LOD_NETWORK_SHARE = [1.0, 0.7, 0.55, 0.12]
+
+# In-memory size relative to prepared (pickled) size: networkx graphs are
+# dicts of dicts, geodataframes are mostly packed coordinates
+IN_MEMORY_FACTOR = {"network": 8.0}
+DEFAULT_IN_MEMORY_FACTOR = 4.0
+
+BYTES_PER_VERTEX = 32
+
+# Prepared bytes per highway way, for estimates refined by Overpass
+BYTES_PER_WAY = 600
+
+# Interpreter, matplotlib and osmnx before any data is loaded
+BASE_MEMORY_BYTES = 300 * 1024 ** 2
+
+# RGBA buffers alive at once while saving: canvas, PIL copy, map layer, text layer
+RASTER_COPIES = 4
+
+DOWNLOAD_BYTES_PER_SECOND = 1.5e6
+CACHE_READ_BYTES_PER_SECOND = 200e6
+REQUEST_LATENCY_SECONDS = 2.0
+SECONDS_PER_VERTEX = 4e-6
+SECONDS_PER_PIXEL = 2.5e-7
+
+# Coarser LOD steps tried, in order, to fit a job into the memory budget
+DOWNGRADE_LOD_SCALES = (2.0, 4.0, 8.0)
+
+# Calibration cells are this many degrees wide
+HISTORY_CELL_DEG = 0.25
+HISTORY_SMOOTHING = 0.3
+
+
+def _cell(point):
+    lat = round(point[0] / HISTORY_CELL_DEG) * HISTORY_CELL_DEG
+    lon = round(point[1] / HISTORY_CELL_DEG) * HISTORY_CELL_DEG
+    return f"{lat:.2f},{lon:.2f}"
+
+
+def _network_share(dist, options):
+    share = 0.0
+    for network_type in _network_types(options):
+        share += NETWORK_TYPE_SHARE.get(network_type, 1.0)
+    if "all" in _network_types(options):
+        classes = lod_highway_classes(dist, options)
+        for level, (_, level_classes) in enumerate(LOD_LEVELS):
+            if level_classes == classes:
+                share *= LOD_NETWORK_SHARE[level]
+                break
+    return share
+
+
+def _cached_layer_bytes(point, dist, options):
+    """{layer: bytes} of the prepared-cache files already on disk for this job."""
+    sizes = {}
+    for layer, path in prepared_cache_paths(point, dist, options).items():
+        if os.path.exists(path):
+            if layer.startswith("network"):
+                layer = "network"
+            elif layer.startswith("custom_"):
+                layer = "custom"
+            sizes[layer] = sizes.get(layer, 0) + os.path.getsize(path)
+    return sizes
+
+
+def _predicted_layer_bytes(dist, options):
+    """{layer: prepared bytes} before calibration."""
+    # Integral of the density falloff over the square extent (approximated as
+    # the circle scaled by 4/π), in km² at centre density
+    radius_km = fetch_radius(dist, options) / 1000
+    area_km2 = 4 * URBAN_RADIUS_KM ** 2 * math.log(1 + (radius_km / URBAN_RADIUS_KM) ** 2)
+    layers = {}
+    if _network_types(options):
+        layers["network"] = LAYER_BYTES_PER_KM2["network"] * area_km2 * _network_share(dist, options)
+    for layer in ("water", "parks", "buildings", "railways"):
+        if options[f"show_{layer}"]:
+            layers[layer] = LAYER_BYTES_PER_KM2[layer] * area_km2
+    custom = len(_custom_layers(options))
+    if custom:
+        layers["custom"] = LAYER_BYTES_PER_KM2["custom"] * area_km2 * custom
+    return layers
+
+
+def overpass_way_count(point, radius, highway_classes=None, timeout=25):
+    """
+    Number of highway ways within `radius` of `point` from a cheap Overpass
+    `out count` query, or None if it fails.
+    """
+    import requests
+    ox = _osmnx()
+    west, south, east, north = ox.utils_geo.bbox_from_point(point, dist=radius)
+    selector = f'["highway"~"^({"|".join(highway_classes)})$"]' if highway_classes else '["highway"]'
+    query = f"[out:json][timeout:{timeout}];way{selector}({south},{west},{north},{east});out count;"
+    try:
+        response = requests.post(f"{ox.settings.overpass_url}/interpreter", data={"data": query},
+                                  timeout=timeout + 5)
+        response.raise_for_status()
+        return int(response.json()["elements"][0]["tags"]["ways"])
+    except Exception:
+        return None
+
+
+class CostModel:
+    """
+    Estimates job cost from extent, layers and output size.
+
+    Layer densities start from LAYER_BYTES_PER_KM2 and are corrected per
+    area by the ratio of actual to predicted prepared-cache bytes of past
+    jobs nearby (falling back to the average over all areas), and time
+    estimates by the ratio of actual to predicted job duration. History is
+    kept in cache/cost_history.json and shared by every process using it:
+    it is reloaded whenever the file changes, and updated under a file lock.
+    """
+    def __init__(self, history_file=COST_HISTORY_FILE, overpass=False):
+        self.history_file = history_file
+        self.overpass = overpass
+        self._lock = threading.Lock()
+        self._history = None
+        self._mtime = None
+
+    def _load(self):
+        try:
+            mtime = os.stat(self.history_file).st_mtime_ns
+        except OSError:
+            mtime = None
+        if self._history is None or mtime != self._mtime:
+            try:
+                with open(self.history_file, 'r') as f:
+                    self._history = json.load(f)
+            except (OSError, ValueError):
+                self._history = {}
+            self._mtime = mtime
+            self._history.setdefault("cells", {})
+            self._history.setdefault("global", {})
+            self._history.setdefault("time_factor", 1.0)
+        return self._history
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.history_file) or ".", exist_ok=True)
+        tmp_path = f"{self.history_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self._history, f)
+        os.replace(tmp_path, self.history_file)
+        self._mtime = os.stat(self.history_file).st_mtime_ns
+
+    def _density_ratio(self, point, layer):
+        history = self._load()
+        if point is not None:
+            ratio = history["cells"].get(_cell(point), {}).get(layer)
+            if ratio is not None:
+                return ratio
+        return history["global"].get(layer, 1.0)
+
+    def estimate(self, point, dist, options=None):
+        """
+        Estimated cost of one poster: prepared `bytes`, map `vertices`,
+        peak `memory_bytes`, `seconds` of work and the `basis` used.
+        `point` may be None when the place is not geocoded yet.
+        """
+        options = _merge_options(options)
+        with self._lock:
+            history = self._load()
+            predicted = _predicted_layer_bytes(dist, options)
+            layer_bytes = {layer: value * self._density_ratio(point, layer)
+                           for layer, value in predicted.items()}
+            time_factor = history["time_factor"]
+            basis = "history" if point is not None and _cell(point) in history["cells"] else "model"
+
+        # Exact sizes are known for whatever is already downloaded
+        cached = _cached_layer_bytes(point, dist, options) if point is not None else {}
+        layer_bytes.update(cached)
+        if cached:
+            basis = "cache"
+
+        if self.overpass and point is not None and "network" in layer_bytes and "network" not in cached:
+            classes = lod_highway_classes(dist, options) if "all" in _network_types(options) else None
+            ways = overpass_way_count(point, fetch_radius(dist, options), classes)
+            if ways is not None:
+                layer_bytes["network"] = ways * BYTES_PER_WAY
+                basis = "overpass"
+
+        total_bytes = sum(layer_bytes.values())
+        vertices = total_bytes / BYTES_PER_VERTEX
+        width_in, height_in = paper_size_in(options)
+        pixels = width_in * height_in * options["dpi"] ** 2
+        memory = BASE_MEMORY_BYTES + pixels * 4 * RASTER_COPIES + sum(
+            value * IN_MEMORY_FACTOR.get(layer, DEFAULT_IN_MEMORY_FACTOR)
+            for layer, value in layer_bytes.items()
+        )
+
+        seconds = 0.0
+        for layer, value in layer_bytes.items():
+            if layer in cached:
+                seconds += value / CACHE_READ_BYTES_PER_SECOND
+            else:
+                seconds += REQUEST_LATENCY_SECONDS + value / DOWNLOAD_BYTES_PER_SECOND
+        seconds += vertices * SECONDS_PER_VERTEX
+        seconds += pixels * SECONDS_PER_PIXEL * (2 if options["tiles"] else 1)
+
+        return {
+            "bytes": int(total_bytes),
+            "vertices": int(vertices),
+            "memory_bytes": int(memory),
+            "seconds": round(seconds * time_factor, 1),
+            "basis": basis,
+        }
+
+    def record(self, point, dist, options, estimate, seconds):
+        """Calibrate densities for this area and the time factor from a finished job."""
+        options = _merge_options(options)
+        actual = _cached_layer_bytes(point, dist, options)
+        predicted = _predicted_layer_bytes(dist, options)
+        with self._lock:
+            try:
+                # In locks/ so cache pruning treats it like the single-flight locks
+                lock_dir = os.path.join(os.path.dirname(self.history_file) or ".", "locks")
+                os.makedirs(lock_dir, exist_ok=True)
+                lock_file = open(os.path.join(lock_dir, "cost_history.lock"), 'a')
+            except OSError as e:
+                print(f"⚠ Could not save cost history: {e}")
+                return
+            with lock_file:
+                # Reload under the lock so updates saved by other processes are kept
+                _lock_file(lock_file, blocking=True)
+                try:
+                    history = self._load()
+                    cell = history["cells"].setdefault(_cell(point), {})
+                    for layer, value in actual.items():
+                        if not predicted.get(layer):
+                            continue
+                        ratio = value / predicted[layer]
+                        cell[layer] = ratio if layer not in cell else (
+                            (1 - HISTORY_SMOOTHING) * cell[layer] + HISTORY_SMOOTHING * ratio)
+                        previous = history["global"].get(layer)
+                        history["global"][layer] = ratio if previous is None else (
+                            (1 - HISTORY_SMOOTHING) * previous + HISTORY_SMOOTHING * ratio)
+                    if estimate and estimate.get("seconds"):
+                        # estimate["seconds"] already includes the old factor
+                        ratio = history["time_factor"] * seconds / estimate["seconds"]
+                        history["time_factor"] = min(10.0, max(0.1, (1 - HISTORY_SMOOTHING) * history["time_factor"]
+                                                               + HISTORY_SMOOTHING * ratio))
+                    try:
+                        self._save()
+                    except OSError as e:
+                        print(f"⚠ Could not save cost history: {e}")
+                finally:
+                    _unlock_file(lock_file)
+        count("cost_estimates_recorded")
+
+
+def admit(model, point, dist, options, memory_budget=None):
+    """
+    Decide whether a job fits `memory_budget` bytes. Returns (decision,
+    options, estimate) where decision is "accept" (options unchanged),
+    "downgrade" (coarser LOD options that fit) or "reject".
+    """
+    options = _merge_options(options)
+    estimate = model.estimate(point, dist, options)
+    if memory_budget is None or estimate["memory_bytes"] <= memory_budget:
+        return "accept", options, estimate
+
+    for lod_scale in DOWNGRADE_LOD_SCALES:
+        downgraded = {**options, "lod": True, "lod_scale": lod_scale}
+        downgraded_estimate = model.estimate(point, dist, downgraded)
+        if downgraded_estimate["memory_bytes"] <= memory_budget:
+            count("jobs_downgraded")
+            return "downgrade", downgraded, downgraded_estimate
+    count("jobs_rejected")
+    return "reject", options, estimate
+
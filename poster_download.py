@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Map Poster Generator - Tiled Downloads
+Splits a large poster extent into tiles, downloads them concurrently within
+a rate budget and merges the results, deduplicating along the seams
+"""
+
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from create_map_poster import PosterCancelled, count, timed_stage
+
+
+class RateBudget:
+    """
+    Caps how many requests run at once and how quickly new ones start.
+    Shared by every tile of a fetch so layers cannot add up past the budget.
+    """
+    def __init__(self, max_concurrent=4, per_second=2.0):
+        self.max_concurrent = max_concurrent
+        self.per_second = per_second
+        self._semaphore = threading.Semaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self._next_start = 0.0
+
+    @contextmanager
+    def slot(self):
+        with self._semaphore:
+            if self.per_second:
+                with self._lock:
+                    now = time.monotonic()
+                    start = max(now, self._next_start)
+                    self._next_start = start + 1.0 / self.per_second
+                if start > now:
+                    time.sleep(start - now)
+            yield
+
+
+def split_bbox(bbox, dist, tile_m):
+    """
+    Split (west, south, east, north) into an n x n grid of tiles no wider
+    than `tile_m` metres, where the bbox spans 2 * `dist` metres.
+    """
+    west, south, east, north = bbox
+    n = max(1, math.ceil(2 * dist / tile_m))
+    lon_step = (east - west) / n
+    lat_step = (north - south) / n
+    return [
+        (west + i * lon_step, south + j * lat_step,
+         west + (i + 1) * lon_step, south + (j + 1) * lat_step)
+        for j in range(n) for i in range(n)
+    ]
+
+
+class TiledDownloader:
+    """
+    Downloads the street network and feature layers for a bbox tile by tile.
+
+    Tiles run on a thread pool gated by a RateBudget. Street network tiles
+    are fetched unsimplified with edges that cross the tile edge, so seam
+    edges are identical between neighbours and merge by OSM node id; the
+    merged graph is then truncated and simplified once. Features are
+    merged on their (element type, OSM id) index.
+    """
+    def __init__(self, ox, point, dist, tile_m=10000, workers=4, per_second=2.0,
+                 should_cancel=None):
+        self.ox = ox
+        self.bbox = ox.utils_geo.bbox_from_point(point, dist=dist)
+        self.tiles = split_bbox(self.bbox, dist, tile_m)
+        self.workers = workers
+        self.budget = RateBudget(workers, per_second)
+        self.should_cancel = should_cancel
+
+    def _run(self, layer, fetch_tile):
+        from osmnx._errors import InsufficientResponseError
+
+        def run_tile(index):
+            if self.should_cancel and self.should_cancel():
+                raise PosterCancelled()
+            with self.budget.slot():
+                with timed_stage("download_tile", layer=layer):
+                    try:
+                        result = fetch_tile(self.tiles[index])
+                    except (InsufficientResponseError, ValueError):
+                        # Tile with no matching data, e.g. open sea
+                        result = None
+            count("download_tiles", layer=layer)
+            return result
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            return [r for r in executor.map(run_tile, range(len(self.tiles))) if r is not None]
+
+    def graph(self, network_type="all", custom_filter=None, retain_all=False):
+        import networkx as nx
+        ox = self.ox
+
+        layer = "network" if custom_filter else f"network_{network_type}"
+        parts = self._run(layer, lambda tile: ox.graph_from_bbox(
+            tile, network_type=network_type, custom_filter=custom_filter,
+            simplify=False, retain_all=True, truncate_by_edge=True))
+        if not parts:
+            raise ValueError("Found no graph nodes within the requested bbox")
+
+        with timed_stage("tile_merge", layer=layer):
+            G = nx.compose_all(parts)
+            count("tile_seam_nodes", sum(len(part) for part in parts) - len(G), layer=layer)
+            G = ox.truncate.truncate_graph_bbox(G, self.bbox, truncate_by_edge=True)
+            G = ox.simplify_graph(G)
+            if not retain_all:
+                G = ox.truncate.largest_component(G)
+        return G
+
+    def features(self, tags, layer="features"):
+        import pandas as pd
+
+        from osmnx._errors import InsufficientResponseError
+
+        parts = self._run(layer, lambda tile: self.ox.features_from_bbox(tile, tags=tags))
+        if not parts:
+            raise InsufficientResponseError("No features found in any tile")
+
+        with timed_stage("tile_merge", layer=layer):
+            gdf = pd.concat(parts)
+            duplicated = gdf.index.duplicated(keep="first")
+            count("tile_seam_features", int(duplicated.sum()), layer=layer)
+            return gdf[~duplicated]
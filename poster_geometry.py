@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Map Poster Generator - Preview Geometry
+Simplified, quantized map geometry that the web UI draws and recolours
+locally as a live preview, so only the final poster needs a server render
+"""
+
+import hashlib
+import json
+import os
+
+import create_map_poster
+from create_map_poster import (
+    _cached_download, _format_coordinates, _osmnx, collapse_reverse_edges,
+    fetch_map_data, fetch_signature, timed_stage
+)
+
+# Bump when the encoding changes so stale cached geometry is not served
+GEOMETRY_VERSION = 1
+
+# Coordinates are integers on a QUANTIZE x QUANTIZE grid over the bbox
+QUANTIZE = 4095
+
+# Lines are simplified to about one pixel of a preview this wide
+PREVIEW_PIXELS = 1200
+
+# Same grouping get_edge_colors_by_type colours roads by
+ROAD_STYLE_CLASSES = {
+    'motorway': ['motorway', 'motorway_link'],
+    'primary': ['trunk', 'trunk_link', 'primary', 'primary_link'],
+    'secondary': ['secondary', 'secondary_link'],
+    'tertiary': ['tertiary', 'tertiary_link'],
+    'residential': ['residential', 'living_street', 'unclassified'],
+}
+_ROAD_STYLE = {highway: name for name, group in ROAD_STYLE_CLASSES.items() for highway in group}
+
+
+def road_style_class(highway):
+    """Theme colour class ('motorway', ..., 'default') of an edge's highway tag."""
+    if isinstance(highway, list):
+        highway = highway[0] if highway else 'unclassified'
+    return _ROAD_STYLE.get(highway, 'default')
+
+
+def _geometry_cache_path(point, dist, options, pixels):
+    key = json.dumps([GEOMETRY_VERSION, fetch_signature(point, dist, options), pixels])
+    digest = hashlib.sha1(key.encode()).hexdigest()
+    return os.path.join(create_map_poster.CACHE_DIR, "geometry", f"{digest}.pkl")
+
+
+def _delta(coords):
+    """[x0, y0, dx1, dy1, ...] of rounded coordinates, dropping repeats; [] if degenerate."""
+    flat = []
+    px = py = 0
+    for x, y, *_ in coords:
+        qx, qy = round(x), round(y)
+        if flat and qx == px and qy == py:
+            continue
+        flat.extend((qx - px, qy - py))
+        px, py = qx, qy
+    return flat if len(flat) >= 4 else []
+
+
+def _encode(geometry, lines, polygons):
+    """Append the parts of a quantized shapely geometry; points are dropped."""
+    if geometry is None or geometry.is_empty:
+        return
+    kind = geometry.geom_type
+    if kind in ('LineString', 'LinearRing'):
+        coords = _delta(geometry.coords)
+        if coords:
+            lines.append(coords)
+    elif kind == 'Polygon':
+        exterior = _delta(geometry.exterior.coords)
+        if len(exterior) >= 6:
+            holes = [_delta(ring.coords) for ring in geometry.interiors]
+            polygons.append([exterior] + [hole for hole in holes if len(hole) >= 6])
+    elif hasattr(geometry, 'geoms'):
+        for part in geometry.geoms:
+            _encode(part, lines, polygons)
+
+
+def _quantize(geoseries, matrix, tolerance):
+    geoseries = geoseries.affine_transform(matrix).clip_by_rect(0, 0, QUANTIZE, QUANTIZE)
+    return geoseries.simplify(tolerance, preserve_topology=True)
+
+
+def _encode_layer(gdf, matrix, tolerance):
+    if gdf is None or gdf.empty:
+        return None
+    lines, polygons = [], []
+    for geometry in _quantize(gdf.geometry, matrix, tolerance):
+        _encode(geometry, lines, polygons)
+    return {'lines': lines, 'polygons': polygons}
+
+
+def _encode_roads(G, matrix, tolerance):
+    if G is None or len(G.edges) == 0:
+        return {}
+    edges = _osmnx().graph_to_gdfs(collapse_reverse_edges(G), nodes=False, fill_edge_geometry=True)
+    roads = {}
+    for style, geometry in zip(edges['highway'].map(road_style_class),
+                               _quantize(edges.geometry, matrix, tolerance)):
+        _encode(geometry, roads.setdefault(style, []), [])
+    return roads
+
+
+def preview_geometry(point, dist, options=None, pixels=PREVIEW_PIXELS, should_cancel=None):
+    """
+    Geometry for a live preview of the poster at `point`: the layers
+    `options` selects, clipped to the poster bbox, simplified to about one
+    pixel at `pixels` wide and quantized to integers on a QUANTIZE grid
+    (x east, y south from the top-left corner), delta-encoded per line or
+    ring. Built from the same prepared data as the poster and cached under
+    cache/geometry/.
+    """
+    ox = _osmnx()
+    west, south, east, north = ox.utils_geo.bbox_from_point(point, dist=dist)
+    sx = QUANTIZE / (east - west)
+    sy = QUANTIZE / (north - south)
+    matrix = [sx, 0, 0, -sy, -west * sx, north * sy]
+    tolerance = QUANTIZE / pixels
+
+    def build():
+        data = fetch_map_data(point, dist, options, should_cancel=should_cancel)
+        with timed_stage("preview_geometry"):
+            return {
+                'version': GEOMETRY_VERSION,
+                'bbox': [west, south, east, north],
+                'point': list(point),
+                'coordinates': _format_coordinates(*point),
+                'quantize': QUANTIZE,
+                'roads': _encode_roads(data["graph"], matrix, tolerance),
+                'water': _encode_layer(data["water"], matrix, tolerance),
+                'parks': _encode_layer(data["parks"], matrix, tolerance),
+                'buildings': _encode_layer(data["buildings"], matrix, tolerance),
+                'railways': _encode_layer(data["railways"], matrix, tolerance),
+                'custom_layers': [_encode_layer(gdf, matrix, tolerance) for gdf in data["custom_layers"]]
+            }
+
+    use_cache = bool((options or {}).get("use_cache", True))
+    return _cached_download(_geometry_cache_path(point, dist, options, pixels), "geometry", use_cache, build)
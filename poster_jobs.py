@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Map Poster Generator - Poster Jobs
+Runs one /api/generate job from start to finish: geocoding, poster store
+lookup, rendering and indexing the result. Shared by the web app's
+in-process workers and by queue workers on other machines
+"""
+
+import os
+import time
+from pathlib import Path
+
+import create_map_poster
+from create_map_poster import (
+    PosterCancelled, create_poster, get_coordinates, load_theme, save_derivatives,
+    save_tile_pyramid, timed_stage
+)
+from poster_series import render_series
+from poster_store import move_poster_files, remove_poster_files, render_key
+
+
+def poster_key(city, country, coords, distance, theme, options, add_house_marker=False):
+    return render_key(
+        city=city, country=country,
+        point=[round(coords[0], 6), round(coords[1], 6)],
+        distance=int(distance), theme=theme, options=options or {},
+        house_marker=bool(add_house_marker)
+    )
+
+
+def _status(status, progress, message, output_file=None, error=None, **extra):
+    return {'status': status, 'progress': progress, 'message': message,
+            'output_file': output_file, 'error': error, **extra}
+
+
+def run_job(job_id, job, store, should_cancel=None, on_status=None, cost_model=None):
+    """
+    Run a generation job described by the JSON-able dict `job` (see
+    app.generate for its fields) and return its final status dict.
+
+    `on_status`, if given, is called with each intermediate status dict.
+    Rendered posters are indexed in `store`; `cost_model` is calibrated
+    with the render time of single posters.
+    """
+    on_status = on_status or (lambda status: None)
+    try:
+        on_status(_status('geocoding', 10, 'Looking up coordinates...'))
+        theme = job.get('theme') or load_theme(job['theme_id'])
+        coordinates = job.get('coordinates')
+        if coordinates:
+            coords = (coordinates['lat'], coordinates['lon'])
+        else:
+            coords = get_coordinates(job['city'], job['country'])
+
+        if job.get('distances'):
+            return _run_series(job_id, job, store, theme, coords, should_cancel, on_status)
+        return _run_poster(job_id, job, store, theme, coords, should_cancel, on_status, cost_model)
+
+    except PosterCancelled:
+        return _status('cancelled', 0, 'Generation cancelled')
+
+    except Exception as e:
+        return _status('error', 0, 'Generation failed', error=str(e))
+
+    finally:
+        # Clean up partial output, including renders already served by the store
+        for partial_file in Path(store.root).glob(f".{job_id}*.png"):
+            remove_poster_files(str(partial_file))
+
+
+def _run_poster(job_id, job, store, theme, coords, should_cancel, on_status, cost_model):
+    city, country, distance = job['city'], job['country'], job['distance']
+    options = job.get('options') or {}
+    add_house_marker = bool(job.get('add_house_marker'))
+
+    # Identical requests are served from the poster store
+    key = poster_key(city, country, coords, distance, theme, options, add_house_marker)
+    output_file = store.lookup(key)
+    if output_file is None:
+        on_status(_status('downloading', 30, 'Downloading map data...'))
+
+        # Render under a temporary name, then index it under its content address
+        partial_file = os.path.join(store.root, f".{job_id}.png")
+        render_start = time.time()
+        render_path = create_poster_with_marker(city, country, coords, distance, partial_file,
+                                                add_house_marker, options, theme=theme,
+                                                should_cancel=should_cancel)
+        # Text-only and fully cached renders take a fraction of the estimate
+        # and would drag the time calibration down
+        if cost_model is not None and render_path == "fetched":
+            cost_model.record(coords, distance, options, job.get('estimate'), time.time() - render_start)
+        stored_file = store.path_for(key, city, job['theme_id'])
+        move_poster_files(partial_file, stored_file)
+        output_file = store.add(key, stored_file, city=city, country=country, theme=job['theme_id'],
+                                distance=distance, inputs={'options': options,
+                                                           'house_marker': add_house_marker})
+
+    return _status('complete', 100, 'Poster generated successfully!', output_file=output_file)
+
+
+def _run_series(job_id, job, store, theme, coords, should_cancel, on_status):
+    city, country, theme_id = job['city'], job['country'], job['theme_id']
+    options = job.get('options') or {}
+    distances = job['distances']
+    formats = [tuple(paper_format) for paper_format in job.get('formats') or []]
+
+    # Posters rendered before are served from the poster store
+    paper_formats = formats or [(options.get('paper_size'), options.get('orientation', 'portrait'))]
+    outputs = []
+    for dist in distances:
+        for paper, orientation in paper_formats:
+            poster_options = {**options, 'paper_size': paper, 'orientation': orientation}
+            key = poster_key(city, country, coords, dist, theme, poster_options)
+            outputs.append({'distance': dist, 'paper_size': paper, 'orientation': orientation,
+                            'key': key, 'output_file': store.lookup(key)})
+
+    missing = [output for output in outputs if output['output_file'] is None]
+    if missing:
+        on_status(_status('downloading', 30, f'Downloading map data for {len(missing)} posters...'))
+
+        # Render the missing distances in every format; extra renders are indexed too
+        missing_distances = sorted({output['distance'] for output in missing})
+        rendered = render_series(city, country, coords, missing_distances,
+                                 os.path.join(store.root, f".{job_id}.png"), options,
+                                 theme=theme, should_cancel=should_cancel,
+                                 formats=[f"{paper}:{orientation}" for paper, orientation in formats])
+        by_variant = {(o['distance'], o['paper_size'], o['orientation']): o for o in outputs}
+        for poster in rendered:
+            output = by_variant[(poster['distance'], poster['paper_size'], poster['orientation'])]
+            if output['output_file'] is None:
+                stored_file = store.path_for(output['key'], city, theme_id)
+                move_poster_files(poster['output_file'], stored_file)
+                output['output_file'] = store.add(
+                    output['key'], stored_file, city=city, country=country, theme=theme_id,
+                    distance=output['distance'],
+                    inputs={'options': {**options, 'paper_size': output['paper_size'],
+                                        'orientation': output['orientation']},
+                            'house_marker': False})
+
+    return _status('complete', 100, f'{len(outputs)} posters generated successfully!',
+                   output_file=outputs[-1]['output_file'],
+                   outputs=[{k: v for k, v in output.items() if k != 'key'} for output in outputs])
+
+
+def create_poster_with_marker(city, country, coords, distance, output_file, add_house_marker, options=None,
+                              theme=None, should_cancel=None):
+    """Create poster and optionally add a house marker; returns create_poster's render path"""
+
+    # Create the base poster
+    render_path = create_poster(city, country, coords, distance, output_file, options=options,
+                                theme=theme, should_cancel=should_cancel)
+
+    # Add house marker if requested
+    if add_house_marker:
+        with timed_stage("marker_overlay"):
+            # Reopen the image and add the marker
+            from PIL import Image, ImageDraw, ImageFont
+
+            img = Image.open(output_file)
+            draw = ImageDraw.Draw(img)
+
+            # Calculate marker position (center of image)
+            width, height = img.size
+            marker_x = width // 2
+            marker_y = height // 2
+
+            # Draw house emoji/symbol
+            # For a simple house marker, draw a house shape
+            marker_size = 40
+            half_size = marker_size // 2
+
+            # House shape (triangle roof + square base)
+            # Triangle (roof)
+            roof_points = [
+                (marker_x, marker_y - half_size),  # Top
+                (marker_x - half_size, marker_y),  # Bottom left
+                (marker_x + half_size, marker_y)   # Bottom right
+            ]
+
+            # Square (base)
+            base_box = [
+                marker_x - half_size * 0.7,
+                marker_y,
+                marker_x + half_size * 0.7,
+                marker_y + half_size
+            ]
+
+            # Get theme for colors
+            theme = theme or create_map_poster.THEME
+            marker_color = theme.get('text', '#FF0000')
+            outline_color = theme.get('bg', '#FFFFFF')
+
+            # Draw with outline for visibility
+            draw.polygon(roof_points, fill=marker_color, outline=outline_color, width=3)
+            draw.rectangle(base_box, fill=marker_color, outline=outline_color, width=3)
+
+            # Save the modified image
+            img.save(output_file)
+            if (options or {}).get("derivatives"):
+                save_derivatives(img, output_file)
+            if (options or {}).get("tiles"):
+                save_tile_pyramid(img, output_file)
+    return render_path
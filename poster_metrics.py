@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Map Poster Generator - Metrics
+Prometheus-style histograms, counters and gauges fed by the stage timing
+hooks in create_map_poster
+"""
+
+import threading
+
+import create_map_poster
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+                   2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _label_string(labels):
+    if not labels:
+        return ""
+    parts = []
+    for key, value in sorted(labels.items()):
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{key}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by label set"""
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets) + (float('inf'),)
+        self._series = {}
+
+    def observe(self, value, labels=None):
+        key = tuple(sorted((labels or {}).items()))
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series['counts'][i] += 1
+        series['sum'] += value
+        series['count'] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for key, series in sorted(self._series.items()):
+            labels = dict(key)
+            for bound, bucket_count in zip(self.buckets, series['counts']):
+                bucket_labels = _label_string({**labels, 'le': _format_value(bound)})
+                lines.append(f"{self.name}_bucket{bucket_labels} {bucket_count}")
+            lines.append(f"{self.name}_sum{_label_string(labels)} {_format_value(series['sum'])}")
+            lines.append(f"{self.name}_count{_label_string(labels)} {series['count']}")
+        return lines
+
+
+class Counter:
+    """Monotonic counter keyed by label set"""
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self._values = {}
+
+    def inc(self, value=1, labels=None):
+        key = tuple(sorted((labels or {}).items()))
+        self._values[key] = self._values.get(key, 0) + value
+
+    def value(self, labels=None):
+        return self._values.get(tuple(sorted((labels or {}).items())), 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_label_string(dict(key))} {_format_value(value)}")
+        return lines
+
+
+class Gauge:
+    """Gauge whose value is read from a callback at scrape time"""
+    def __init__(self, name, help_text, callback):
+        self.name = name
+        self.help_text = help_text
+        self.callback = callback
+
+    def render(self):
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge",
+                f"{self.name} {_format_value(self.callback())}"]
+
+
+class MetricsRegistry:
+    """
+    Collects stage timings and counters emitted by create_map_poster.
+
+    `install()` registers the registry as an instrumentation listener, so
+    the same numbers are recorded whether a poster is rendered by the CLI,
+    the GUI or the web app.
+    """
+    def __init__(self, prefix="maptoposter"):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self.stage_seconds = Histogram(f"{prefix}_stage_seconds",
+                                       "Wall time of poster pipeline stages")
+        self._counters = {}
+        self._gauges = []
+
+    def install(self):
+        create_map_poster.add_listener(self.on_event)
+        return self
+
+    def uninstall(self):
+        create_map_poster.remove_listener(self.on_event)
+
+    def counter(self, name, help_text=""):
+        full_name = f"{self.prefix}_{name}_total"
+        with self._lock:
+            if full_name not in self._counters:
+                self._counters[full_name] = Counter(full_name, help_text or name.replace('_', ' '))
+            return self._counters[full_name]
+
+    def gauge(self, name, help_text, callback):
+        self._gauges.append(Gauge(f"{self.prefix}_{name}", help_text, callback))
+
+    def on_event(self, kind, name, value, labels):
+        if kind == "end":
+            with self._lock:
+                self.stage_seconds.observe(value, {'stage': name, **labels})
+        elif kind == "count":
+            counter = self.counter(name)
+            with self._lock:
+                counter.inc(value, labels)
+
+    def render(self):
+        """Return all metrics in the Prometheus text exposition format."""
+        with self._lock:
+            lines = self.stage_seconds.render()
+            for name in sorted(self._counters):
+                lines.extend(self._counters[name].render())
+        for gauge in self._gauges:
+            lines.extend(gauge.render())
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Map Poster Generator - Theme Previews
+Renders any theme over a small bundled sample extract in a few
+milliseconds, for theme galleries and the theme creators
+"""
+
+import hashlib
+import io
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from create_map_poster import count, timed_stage
+from theme_registry import validate_theme
+
+SAMPLE_EXTRACT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "samples", "preview_extract.json")
+
+# Only these theme keys show up in a preview
+PREVIEW_THEME_KEYS = [
+    "bg", "water", "parks", "gradient_color", "road_motorway", "road_primary",
+    "road_secondary", "road_tertiary", "road_residential", "road_default"
+]
+
+# Line widths in pixels of a 200px-wide preview, least important first so
+# major roads are drawn on top
+PREVIEW_ROAD_WIDTHS = [
+    ("default", 0.5), ("residential", 0.6), ("tertiary", 1.0),
+    ("secondary", 1.3), ("primary", 1.6), ("motorway", 2.0)
+]
+
+# Drawn at this multiple of the output size and downsampled, for antialiasing
+SUPERSAMPLE = 3
+
+MAX_PREVIEW_SIZE = (800, 600)
+
+
+def _decode(flat):
+    points = []
+    x = y = 0
+    for i in range(0, len(flat), 2):
+        x += flat[i]
+        y += flat[i + 1]
+        points.append((x, y))
+    return points
+
+
+def theme_preview_key(theme, size):
+    """Hash of the theme colours a preview of `size` depends on."""
+    colors = {key: theme.get(key) for key in PREVIEW_THEME_KEYS}
+    return hashlib.sha1(json.dumps([colors, list(size)], sort_keys=True).encode()).hexdigest()
+
+
+def build_sample_extract(point, dist, output_path=SAMPLE_EXTRACT, name=None, pixels=600):
+    """Write a new sample extract from real map data around `point`."""
+    from poster_geometry import preview_geometry
+
+    geometry = preview_geometry(point, dist, {"network_types": ["all"], "show_water": True,
+                                              "show_parks": True}, pixels=pixels)
+    sample = {key: geometry[key] for key in ("version", "bbox", "quantize", "roads", "water", "parks")}
+    sample["name"] = name
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open(output_path, 'w') as f:
+        json.dump(sample, f, separators=(',', ':'))
+    return sample
+
+
+class PreviewEngine:
+    """
+    Theme previews drawn with PIL from the sample extract. The extract is
+    decoded once and projected once per output size; projections for the
+    most recent sizes and finished previews are kept in LRU caches, the
+    latter keyed by theme_preview_key.
+    """
+    def __init__(self, sample_path=SAMPLE_EXTRACT, cache_size=256, projected_size=8):
+        self.sample_path = sample_path
+        self.cache_size = cache_size
+        self.projected_size = projected_size
+        self._lock = threading.Lock()
+        self._sample = None
+        self._projected = OrderedDict()
+        self._cache = OrderedDict()
+
+    def _load(self):
+        if self._sample is None:
+            with open(self.sample_path, 'r') as f:
+                raw = json.load(f)
+            self._sample = {
+                'quantize': raw['quantize'],
+                'roads': {name: [_decode(line) for line in lines] for name, lines in raw['roads'].items()},
+                'water': [[_decode(ring) for ring in polygon] for polygon in (raw.get('water') or {}).get('polygons', [])],
+                'parks': [[_decode(ring) for ring in polygon] for polygon in (raw.get('parks') or {}).get('polygons', [])],
+            }
+        return self._sample
+
+    def _project(self, size):
+        """Sample coordinates scaled to cover a supersampled canvas of `size`, centred."""
+        with self._lock:
+            layers = self._projected.get(size)
+            if layers is not None:
+                self._projected.move_to_end(size)
+                return layers
+            sample = self._load()
+
+        width, height = size[0] * SUPERSAMPLE, size[1] * SUPERSAMPLE
+        scale = max(width, height) / sample['quantize']
+        dx = (width - sample['quantize'] * scale) / 2
+        dy = (height - sample['quantize'] * scale) / 2
+
+        def project(points):
+            return [(x * scale + dx, y * scale + dy) for x, y in points]
+
+        layers = {
+            'roads': {name: [project(line) for line in lines] for name, lines in sample['roads'].items()},
+            'water': [[project(ring) for ring in polygon] for polygon in sample['water']],
+            'parks': [[project(ring) for ring in polygon] for polygon in sample['parks']],
+        }
+        with self._lock:
+            self._projected[size] = layers
+            while len(self._projected) > self.projected_size:
+                self._projected.popitem(last=False)
+        return layers
+
+    def _draw(self, rgb, size):
+        from PIL import Image, ImageDraw
+
+        # validate_theme colours are 0-1 floats; PIL wants 0-255 ints
+        theme = {key: tuple(round(c * 255) for c in value) for key, value in rgb.items()}
+        layers = self._project(size)
+        width, height = size[0] * SUPERSAMPLE, size[1] * SUPERSAMPLE
+        image = Image.new("RGB", (width, height), theme['bg'])
+        draw = ImageDraw.Draw(image)
+
+        for layer in ("water", "parks"):
+            for polygon in layers[layer]:
+                draw.polygon(polygon[0], fill=theme[layer])
+                for hole in polygon[1:]:
+                    draw.polygon(hole, fill=theme['bg'])
+
+        width_scale = SUPERSAMPLE * size[0] / 200
+        for name, line_width in PREVIEW_ROAD_WIDTHS:
+            color = theme[f"road_{name}"]
+            pixels = max(1, round(line_width * width_scale))
+            for line in layers['roads'].get(name, []):
+                draw.line(line, fill=color, width=pixels)
+
+        # Top and bottom fades, as on the poster
+        fade_height = height // 4
+        fade = Image.linear_gradient("L").resize((width, fade_height))
+        overlay = Image.new("RGB", (width, fade_height), theme['gradient_color'])
+        image.paste(overlay, (0, height - fade_height), fade)
+        image.paste(overlay, (0, 0), fade.transpose(Image.FLIP_TOP_BOTTOM))
+
+        return image.resize(size, Image.LANCZOS)
+
+    def _entry(self, theme, size, rgb):
+        key = theme_preview_key(theme, size)
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                self._cache.move_to_end(key)
+                count("theme_preview_hits")
+                return key, entry
+        count("theme_preview_misses")
+        with timed_stage("theme_preview"):
+            entry = {'image': self._draw(rgb or validate_theme(theme), size), 'png': None}
+        with self._lock:
+            self._cache[key] = entry
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return key, entry
+
+    def render(self, theme, size=(200, 100), rgb=None):
+        """
+        PIL RGB preview of `theme`; callers must not modify it. `rgb` is
+        the theme's validate_theme colours, if the caller already has them.
+        """
+        return self._entry(theme, tuple(size), rgb)[1]['image']
+
+    def png(self, theme, size=(200, 100), rgb=None):
+        """(key, PNG bytes) of the preview of `theme`; `rgb` as for render."""
+        key, entry = self._entry(theme, tuple(size), rgb)
+        if entry['png'] is None:
+            buffer = io.BytesIO()
+            entry['image'].save(buffer, format="PNG", optimize=True)
+            entry['png'] = buffer.getvalue()
+        return key, entry['png']
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Map Poster Generator - Profiling
+Per-stage wall time and peak memory for create_poster, with optional
+cProfile dump and tracemalloc top-N report
+"""
+
+import cProfile
+import time
+import tracemalloc
+
+import create_map_poster
+
+
+def _stage_label(name, labels):
+    if not labels:
+        return name
+    return f"{name}[{','.join(str(v) for _, v in sorted(labels.items()))}]"
+
+
+def _format_bytes(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(size) < 1024 or unit == "GB":
+            return f"{size:.1f} {unit}" if unit != "B" else f"{int(size)} B"
+        size /= 1024.0
+
+
+class StageProfiler:
+    """
+    Records wall time and tracemalloc peak for every stage reported by
+    create_map_poster.timed_stage().
+
+    Use as a context manager around a create_poster() call; `report()`
+    returns the table printed by `create_map_poster.py --profile`.
+    """
+    def __init__(self, profile_output=None, tracemalloc_top=0):
+        self.profile_output = profile_output
+        self.tracemalloc_top = tracemalloc_top
+        self.stages = []
+        self._open = []
+        self._profiler = None
+        self._snapshot = None
+        self._snapshot_size = -1
+        self._start = None
+        self._total_peak = 0
+
+    def __enter__(self):
+        tracemalloc.start(25 if self.tracemalloc_top else 1)
+        create_map_poster.add_listener(self.on_event)
+        if self.profile_output:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.total_seconds = time.perf_counter() - self._start
+        if self._profiler is not None:
+            self._profiler.disable()
+            self._profiler.dump_stats(self.profile_output)
+        create_map_poster.remove_listener(self.on_event)
+        self._total_peak = max(self._total_peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        return False
+
+    @property
+    def total_peak_bytes(self):
+        return self._total_peak
+
+    def on_event(self, kind, name, value, labels):
+        if kind == "start":
+            current, peak = tracemalloc.get_traced_memory()
+            # Fold the peak so far into enclosing stages before resetting it
+            for stage in self._open:
+                stage['peak'] = max(stage['peak'], peak)
+            self._total_peak = max(self._total_peak, peak)
+            tracemalloc.reset_peak()
+            self._open.append({'name': name, 'labels': labels, 'baseline': current, 'peak': current})
+        elif kind == "end" and self._open:
+            stage = self._open.pop()
+            current, peak = tracemalloc.get_traced_memory()
+            stage['peak'] = max(stage['peak'], peak)
+            for outer in self._open:
+                outer['peak'] = max(outer['peak'], stage['peak'])
+            self._total_peak = max(self._total_peak, stage['peak'])
+            self.stages.append({
+                'stage': _stage_label(stage['name'], stage['labels']),
+                'seconds': value,
+                'peak_bytes': stage['peak'],
+                'peak_delta_bytes': stage['peak'] - stage['baseline'],
+                'retained_bytes': current - stage['baseline']
+            })
+            if self.tracemalloc_top and current > self._snapshot_size:
+                self._snapshot = tracemalloc.take_snapshot()
+                self._snapshot_size = current
+
+    def report(self):
+        """Return the per-stage table (and tracemalloc top-N) as text."""
+        lines = [
+            f"{'Stage':<32} {'Wall time':>10} {'Peak':>11} {'Peak Δ':>11} {'Retained':>11}",
+            "-" * 79
+        ]
+        for stage in self.stages:
+            lines.append(
+                f"{stage['stage']:<32} {stage['seconds']:>9.3f}s "
+                f"{_format_bytes(stage['peak_bytes']):>11} "
+                f"{_format_bytes(stage['peak_delta_bytes']):>11} "
+                f"{_format_bytes(stage['retained_bytes']):>11}"
+            )
+        lines.append("-" * 79)
+        lines.append(f"{'Total':<32} {self.total_seconds:>9.3f}s {_format_bytes(self._total_peak):>11}")
+        if self.profile_output:
+            lines.append(f"\ncProfile stats written to {self.profile_output}")
+
+        if self._snapshot is not None:
+            lines.append(f"\nTop {self.tracemalloc_top} allocation sites at highest retained memory:")
+            for stat in self._snapshot.statistics('lineno')[:self.tracemalloc_top]:
+                frame = stat.traceback[0]
+                lines.append(f"  {_format_bytes(stat.size):>11}  {stat.count:>8} blocks  "
+                             f"{frame.filename}:{frame.lineno}")
+        return "\n".join(lines)
@@ -0,0 +1,616 @@
+#!/usr/bin/env python3
+"""
+Map Poster Generator - Job Queue
+A job queue shared by the web app and any number of worker processes on
+any number of machines, backed by SQLite or Redis, with leases so the jobs
+of dead workers are handed to live ones
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from job_scheduler import PRIORITY_RENDER
+
+# A running job whose worker misses heartbeats for this long goes back to the queue
+LEASE_SECONDS = 60
+HEARTBEAT_SECONDS = 5
+POLL_SECONDS = 2
+
+# Jobs whose workers died this many times are failed instead of retried
+MAX_ATTEMPTS = 3
+
+# Finished jobs and silent workers are forgotten after this long
+RETENTION_SECONDS = 24 * 3600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    distance INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    status TEXT NOT NULL,
+    worker_id TEXT,
+    lease_until REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (state, priority, distance, created_at);
+CREATE INDEX IF NOT EXISTS jobs_lease ON jobs (state, lease_until);
+CREATE TABLE IF NOT EXISTS workers (
+    worker_id TEXT PRIMARY KEY,
+    host TEXT,
+    pid INTEGER,
+    job_id TEXT,
+    started_at REAL NOT NULL,
+    heartbeat_at REAL NOT NULL
+);
+"""
+
+
+def _status(status, progress, message, error=None):
+    return {'status': status, 'progress': progress, 'message': message,
+            'output_file': None, 'error': error}
+
+
+QUEUED_STATUS = _status('queued', 0, 'Waiting for a free worker...')
+REQUEUED_STATUS = _status('queued', 0, 'Worker lost, waiting for another worker...')
+CANCELLED_STATUS = _status('cancelled', 0, 'Generation cancelled')
+ABANDONED_STATUS = _status('error', 0, 'Generation failed',
+                           error=f'Worker lost {MAX_ATTEMPTS} times while rendering this job')
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class SQLiteQueue:
+    """
+    Jobs and worker heartbeats in one SQLite file. Every worker process
+    that can open the file can take jobs, so it suits workers on one
+    machine or on a shared filesystem with working locks. Jobs run in
+    priority order, then smallest distance first, then oldest first.
+    """
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        db = sqlite3.connect(path, timeout=30)
+        try:
+            db.executescript(_SCHEMA)
+        finally:
+            db.close()
+
+    @contextmanager
+    def _connect(self):
+        """One short-lived connection per call, so any thread or process can use the queue."""
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        try:
+            db.execute("PRAGMA journal_mode=WAL")
+            # Take the write lock up front so two workers never claim the same job
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+        finally:
+            db.close()
+
+    def enqueue(self, job_id, job, priority=PRIORITY_RENDER):
+        """Add `job`, a JSON-able dict for poster_jobs.run_job."""
+        now = time.time()
+        with self._connect() as db:
+            db.execute(
+                "INSERT INTO jobs (job_id, payload, priority, distance, state, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, 'queued', ?, ?, ?)",
+                (job_id, json.dumps(job), priority, int(job.get('distance') or 0),
+                 json.dumps(QUEUED_STATUS), now, now)
+            )
+
+    def claim(self, worker_id, lease_seconds=LEASE_SECONDS):
+        """Lease the next queued job to `worker_id`. Returns (job_id, job) or None."""
+        now = time.time()
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT job_id, payload FROM jobs WHERE state = 'queued' "
+                "ORDER BY priority, distance, created_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            db.execute(
+                "UPDATE jobs SET state = 'running', worker_id = ?, lease_until = ?, started_at = ?, "
+                "attempts = attempts + 1, updated_at = ? WHERE job_id = ?",
+                (worker_id, now + lease_seconds, now, now, row['job_id'])
+            )
+            db.execute("UPDATE workers SET job_id = ? WHERE worker_id = ?", (row['job_id'], worker_id))
+        return row['job_id'], json.loads(row['payload'])
+
+    def heartbeat(self, worker_id, job_id=None, lease_seconds=LEASE_SECONDS):
+        """
+        Record that `worker_id` is alive and extend the lease of its job.
+        Returns False if the job was cancelled or its lease was lost, so
+        the worker should stop it.
+        """
+        now = time.time()
+        with self._connect() as db:
+            db.execute("UPDATE workers SET heartbeat_at = ?, job_id = ? WHERE worker_id = ?",
+                       (now, job_id, worker_id))
+            if job_id is None:
+                return True
+            row = db.execute("SELECT cancel_requested FROM jobs WHERE job_id = ? AND state = 'running' "
+                             "AND worker_id = ?", (job_id, worker_id)).fetchone()
+            if row is None:
+                return False
+            db.execute("UPDATE jobs SET lease_until = ? WHERE job_id = ?", (now + lease_seconds, job_id))
+            return not row['cancel_requested']
+
+    def update(self, job_id, worker_id, status):
+        """Publish the progress `status` of a job `worker_id` still holds."""
+        with self._connect() as db:
+            db.execute("UPDATE jobs SET status = ?, updated_at = ? WHERE job_id = ? AND state = 'running' "
+                       "AND worker_id = ?", (json.dumps(status), time.time(), job_id, worker_id))
+
+    def finish(self, job_id, worker_id, status):
+        """Record the final `status` of a job, unless its lease went to another worker."""
+        with self._connect() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET state = 'done', status = ?, lease_until = NULL, updated_at = ? "
+                "WHERE job_id = ? AND state = 'running' AND worker_id = ?",
+                (json.dumps(status), time.time(), job_id, worker_id)
+            )
+            db.execute("UPDATE workers SET job_id = NULL WHERE worker_id = ?", (worker_id,))
+            return cursor.rowcount == 1
+
+    def cancel(self, job_id):
+        """
+        Cancel a job. Returns 'cancelled' for queued jobs, 'cancelling' for
+        running ones (their worker stops at its next heartbeat), or None if
+        the job is unknown or already finished.
+        """
+        now = time.time()
+        with self._connect() as db:
+            row = db.execute("SELECT state, status FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None or row['state'] == 'done':
+                return None
+            if row['state'] == 'queued':
+                db.execute("UPDATE jobs SET state = 'done', status = ?, updated_at = ? WHERE job_id = ?",
+                           (json.dumps(CANCELLED_STATUS), now, job_id))
+                return 'cancelled'
+            status = json.loads(row['status'])
+            status['message'] = 'Cancelling...'
+            db.execute("UPDATE jobs SET cancel_requested = 1, status = ?, updated_at = ? WHERE job_id = ?",
+                       (json.dumps(status), now, job_id))
+            return 'cancelling'
+
+    def status(self, job_id):
+        """
+        The status dict a job's worker last reported, plus `estimate` from
+        the job, `queue_position` while queued, and `worker_id` and
+        `started_at` while running. None if the job is unknown.
+        """
+        with self._connect() as db:
+            row = db.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            status = json.loads(row['status'])
+            status['estimate'] = json.loads(row['payload']).get('estimate')
+            if row['state'] == 'queued':
+                status['queue_position'] = db.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE state = 'queued' AND "
+                    "(priority, distance, created_at) < (?, ?, ?)",
+                    (row['priority'], row['distance'], row['created_at'])
+                ).fetchone()[0]
+            elif row['state'] == 'running':
+                status['worker_id'] = row['worker_id']
+                status['started_at'] = row['started_at']
+            return status
+
+    def release_expired(self, max_attempts=MAX_ATTEMPTS):
+        """
+        Put running jobs whose lease ran out back in the queue, or fail them
+        after `max_attempts` (cancel them if a cancel was requested), and
+        forget old finished jobs and silent workers. Returns the number of
+        jobs released.
+        """
+        now = time.time()
+        with self._connect() as db:
+            expired = db.execute("SELECT job_id, attempts, cancel_requested FROM jobs "
+                                 "WHERE state = 'running' AND lease_until < ?", (now,)).fetchall()
+            for row in expired:
+                if row['cancel_requested']:
+                    db.execute("UPDATE jobs SET state = 'done', status = ?, lease_until = NULL, "
+                               "updated_at = ? WHERE job_id = ?",
+                               (json.dumps(CANCELLED_STATUS), now, row['job_id']))
+                elif row['attempts'] >= max_attempts:
+                    db.execute("UPDATE jobs SET state = 'done', status = ?, lease_until = NULL, "
+                               "updated_at = ? WHERE job_id = ?",
+                               (json.dumps(ABANDONED_STATUS), now, row['job_id']))
+                else:
+                    db.execute("UPDATE jobs SET state = 'queued', status = ?, worker_id = NULL, "
+                               "lease_until = NULL, started_at = NULL, updated_at = ? WHERE job_id = ?",
+                               (json.dumps(REQUEUED_STATUS), now, row['job_id']))
+            db.execute("DELETE FROM jobs WHERE state = 'done' AND updated_at < ?", (now - RETENTION_SECONDS,))
+            db.execute("DELETE FROM workers WHERE heartbeat_at < ?", (now - RETENTION_SECONDS,))
+        return len(expired)
+
+    def register_worker(self, worker_id):
+        now = time.time()
+        with self._connect() as db:
+            db.execute("INSERT OR REPLACE INTO workers (worker_id, host, pid, job_id, started_at, heartbeat_at) "
+                       "VALUES (?, ?, ?, NULL, ?, ?)",
+                       (worker_id, socket.gethostname(), os.getpid(), now, now))
+
+    def unregister_worker(self, worker_id):
+        """Remove a worker that is shutting down and requeue the job it held."""
+        now = time.time()
+        with self._connect() as db:
+            db.execute("UPDATE jobs SET state = 'done', status = ?, lease_until = NULL, updated_at = ? "
+                       "WHERE state = 'running' AND worker_id = ? AND cancel_requested = 1",
+                       (json.dumps(CANCELLED_STATUS), now, worker_id))
+            # A clean shutdown does not count as a lost worker
+            db.execute("UPDATE jobs SET state = 'queued', status = ?, worker_id = NULL, lease_until = NULL, "
+                       "started_at = NULL, attempts = attempts - 1, updated_at = ? "
+                       "WHERE state = 'running' AND worker_id = ?",
+                       (json.dumps(QUEUED_STATUS), now, worker_id))
+            db.execute("DELETE FROM workers WHERE worker_id = ?", (worker_id,))
+
+    def workers(self):
+        """Registered workers, most recent heartbeat first."""
+        with self._connect() as db:
+            rows = db.execute("SELECT * FROM workers ORDER BY heartbeat_at DESC").fetchall()
+        return [dict(row) for row in rows]
+
+    def queue_depth(self):
+        with self._connect() as db:
+            return db.execute("SELECT COUNT(*) FROM jobs WHERE state = 'queued'").fetchone()[0]
+
+    def running_count(self):
+        with self._connect() as db:
+            return db.execute("SELECT COUNT(*) FROM jobs WHERE state = 'running'").fetchone()[0]
+
+
+# Pops the first queued job and leases it: KEYS queued, leases, job prefix;
+# ARGV worker_id, lease_until, now
+_CLAIM_SCRIPT = """
+local member = redis.call('ZRANGE', KEYS[1], 0, 0)[1]
+if not member then return nil end
+redis.call('ZREM', KEYS[1], member)
+local job_id = string.sub(member, 15)
+local key = KEYS[3] .. job_id
+redis.call('HSET', key, 'state', 'running', 'worker_id', ARGV[1], 'lease_until', ARGV[2], 'started_at', ARGV[3])
+redis.call('HINCRBY', key, 'attempts', 1)
+redis.call('ZADD', KEYS[2], ARGV[2], job_id)
+return {job_id, redis.call('HGET', key, 'payload')}
+"""
+
+# Extends a lease if the worker still holds it: KEYS job, leases; ARGV
+# job_id, worker_id, lease_until. Returns -1 if lost, else cancel_requested
+_HEARTBEAT_SCRIPT = """
+if redis.call('HGET', KEYS[1], 'state') ~= 'running' or redis.call('HGET', KEYS[1], 'worker_id') ~= ARGV[2] then
+    return -1
+end
+redis.call('HSET', KEYS[1], 'lease_until', ARGV[3])
+redis.call('ZADD', KEYS[2], ARGV[3], ARGV[1])
+return tonumber(redis.call('HGET', KEYS[1], 'cancel_requested') or '0')
+"""
+
+# Sets the status of a job the worker still holds, finishing it when ARGV[4]
+# is '1': KEYS job, leases; ARGV job_id, worker_id, status, finish, retention
+_UPDATE_SCRIPT = """
+if redis.call('HGET', KEYS[1], 'state') ~= 'running' or redis.call('HGET', KEYS[1], 'worker_id') ~= ARGV[2] then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'status', ARGV[3])
+if ARGV[4] == '1' then
+    redis.call('HSET', KEYS[1], 'state', 'done')
+    redis.call('ZREM', KEYS[2], ARGV[1])
+    redis.call('EXPIRE', KEYS[1], ARGV[5])
+end
+return 1
+"""
+
+# KEYS job, queued; ARGV cancelled status, retention
+_CANCEL_SCRIPT = """
+local state = redis.call('HGET', KEYS[1], 'state')
+if state == 'queued' then
+    redis.call('ZREM', KEYS[2], redis.call('HGET', KEYS[1], 'member'))
+    redis.call('HSET', KEYS[1], 'state', 'done', 'status', ARGV[1])
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+    return 'cancelled'
+elseif state == 'running' then
+    local status = cjson.decode(redis.call('HGET', KEYS[1], 'status'))
+    status['message'] = 'Cancelling...'
+    redis.call('HSET', KEYS[1], 'cancel_requested', 1, 'status', cjson.encode(status))
+    return 'cancelling'
+end
+return nil
+"""
+
+# Requeues, cancels or fails jobs whose lease ran out: KEYS leases, queued,
+# job prefix; ARGV now, max_attempts, requeued status, abandoned status,
+# retention, cancelled status
+_RELEASE_SCRIPT = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+for _, job_id in ipairs(expired) do
+    local key = KEYS[3] .. job_id
+    redis.call('ZREM', KEYS[1], job_id)
+    if redis.call('HGET', key, 'cancel_requested') == '1' then
+        redis.call('HSET', key, 'state', 'done', 'status', ARGV[6])
+        redis.call('EXPIRE', key, ARGV[5])
+    elseif tonumber(redis.call('HGET', key, 'attempts') or '0') >= tonumber(ARGV[2]) then
+        redis.call('HSET', key, 'state', 'done', 'status', ARGV[4])
+        redis.call('EXPIRE', key, ARGV[5])
+    else
+        redis.call('HSET', key, 'state', 'queued', 'status', ARGV[3], 'worker_id', '')
+        redis.call('ZADD', KEYS[2], redis.call('HGET', key, 'score'), redis.call('HGET', key, 'member'))
+    end
+end
+return #expired
+"""
+
+
+class RedisQueue:
+    """
+    The same queue on a Redis server (or anything speaking its protocol,
+    such as a fakeredis client passed as `client`), for workers spread over
+    several machines. Claims, heartbeats and releases are Lua scripts, so
+    they are atomic across workers. A `client` must be created with
+    decode_responses=True.
+    """
+    def __init__(self, url=None, client=None, prefix="maptoposter"):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url, decode_responses=True)
+        elif not client.connection_pool.connection_kwargs.get('decode_responses'):
+            raise ValueError("RedisQueue needs a client created with decode_responses=True")
+        self.redis = client
+        self.prefix = prefix
+        self._queued = f"{prefix}:queued"
+        self._leases = f"{prefix}:leases"
+        self._workers = f"{prefix}:workers"
+        self._job_prefix = f"{prefix}:job:"
+        self._claim = client.register_script(_CLAIM_SCRIPT)
+        self._heartbeat = client.register_script(_HEARTBEAT_SCRIPT)
+        self._update = client.register_script(_UPDATE_SCRIPT)
+        self._cancel = client.register_script(_CANCEL_SCRIPT)
+        self._release = client.register_script(_RELEASE_SCRIPT)
+
+    def _job_key(self, job_id):
+        return f"{self._job_prefix}{job_id}"
+
+    def enqueue(self, job_id, job, priority=PRIORITY_RENDER):
+        """Add `job`, a JSON-able dict for poster_jobs.run_job."""
+        now = time.time()
+        # Equal scores sort by member, so the zero-padded time keeps them in order
+        score = priority * 1e9 + int(job.get('distance') or 0)
+        member = f"{int(now * 1000):013d}:{job_id}"
+        with self.redis.pipeline() as pipe:
+            pipe.hset(self._job_key(job_id), mapping={
+                'payload': json.dumps(job), 'state': 'queued', 'status': json.dumps(QUEUED_STATUS),
+                'score': score, 'member': member, 'attempts': 0, 'cancel_requested': 0,
+                'created_at': now
+            })
+            pipe.zadd(self._queued, {member: score})
+            pipe.execute()
+
+    def claim(self, worker_id, lease_seconds=LEASE_SECONDS):
+        """Lease the next queued job to `worker_id`. Returns (job_id, job) or None."""
+        now = time.time()
+        claimed = self._claim(keys=[self._queued, self._leases, self._job_prefix],
+                              args=[worker_id, now + lease_seconds, now])
+        if not claimed:
+            return None
+        job_id, payload = claimed
+        self._set_worker(worker_id, job_id=job_id)
+        return job_id, json.loads(payload)
+
+    def heartbeat(self, worker_id, job_id=None, lease_seconds=LEASE_SECONDS):
+        """
+        Record that `worker_id` is alive and extend the lease of its job.
+        Returns False if the job was cancelled or its lease was lost, so
+        the worker should stop it.
+        """
+        self._set_worker(worker_id, job_id=job_id)
+        if job_id is None:
+            return True
+        result = self._heartbeat(keys=[self._job_key(job_id), self._leases],
+                                 args=[job_id, worker_id, time.time() + lease_seconds])
+        return int(result) == 0
+
+    def update(self, job_id, worker_id, status):
+        """Publish the progress `status` of a job `worker_id` still holds."""
+        self._update(keys=[self._job_key(job_id), self._leases],
+                     args=[job_id, worker_id, json.dumps(status), 0, RETENTION_SECONDS])
+
+    def finish(self, job_id, worker_id, status):
+        """Record the final `status` of a job, unless its lease went to another worker."""
+        finished = self._update(keys=[self._job_key(job_id), self._leases],
+                                args=[job_id, worker_id, json.dumps(status), 1, RETENTION_SECONDS])
+        self._set_worker(worker_id, job_id=None)
+        return bool(finished)
+
+    def cancel(self, job_id):
+        """
+        Cancel a job. Returns 'cancelled' for queued jobs, 'cancelling' for
+        running ones (their worker stops at its next heartbeat), or None if
+        the job is unknown or already finished.
+        """
+        return self._cancel(keys=[self._job_key(job_id), self._queued],
+                            args=[json.dumps(CANCELLED_STATUS), RETENTION_SECONDS])
+
+    def status(self, job_id):
+        """
+        The status dict a job's worker last reported, plus `estimate` from
+        the job, `queue_position` while queued, and `worker_id` and
+        `started_at` while running. None if the job is unknown.
+        """
+        job = self.redis.hgetall(self._job_key(job_id))
+        if not job:
+            return None
+        status = json.loads(job['status'])
+        status['estimate'] = json.loads(job['payload']).get('estimate')
+        if job['state'] == 'queued':
+            status['queue_position'] = self.redis.zrank(self._queued, job['member'])
+        elif job['state'] == 'running':
+            status['worker_id'] = job.get('worker_id')
+            status['started_at'] = float(job['started_at'])
+        return status
+
+    def release_expired(self, max_attempts=MAX_ATTEMPTS):
+        """
+        Put running jobs whose lease ran out back in the queue, or fail them
+        after `max_attempts` (cancel them if a cancel was requested), and
+        forget silent workers. Finished jobs expire on their own. Returns the number of jobs released.
+        """
+        now = time.time()
+        released = self._release(keys=[self._leases, self._queued, self._job_prefix],
+                                 args=[now, max_attempts, json.dumps(REQUEUED_STATUS),
+                                       json.dumps(ABANDONED_STATUS), RETENTION_SECONDS,
+                                       json.dumps(CANCELLED_STATUS)])
+        for worker in self.workers():
+            if worker['heartbeat_at'] < now - RETENTION_SECONDS:
+                self.redis.hdel(self._workers, worker['worker_id'])
+        return int(released)
+
+    def _set_worker(self, worker_id, **fields):
+        worker = json.loads(self.redis.hget(self._workers, worker_id) or '{}')
+        worker.update(fields, worker_id=worker_id, heartbeat_at=time.time())
+        self.redis.hset(self._workers, worker_id, json.dumps(worker))
+
+    def register_worker(self, worker_id):
+        now = time.time()
+        self.redis.hset(self._workers, worker_id, json.dumps({
+            'worker_id': worker_id, 'host': socket.gethostname(), 'pid': os.getpid(),
+            'job_id': None, 'started_at': now, 'heartbeat_at': now
+        }))
+
+    def unregister_worker(self, worker_id):
+        """Remove a worker that is shutting down and requeue the job it held."""
+        worker = json.loads(self.redis.hget(self._workers, worker_id) or '{}')
+        if worker.get('job_id'):
+            # An expired lease is requeued by the next release; a clean
+            # shutdown does not count as a lost worker
+            key = self._job_key(worker['job_id'])
+            if self.redis.hget(key, 'worker_id') == worker_id:
+                self.redis.zadd(self._leases, {worker['job_id']: 0})
+                self.redis.hincrby(key, 'attempts', -1)
+        self.redis.hdel(self._workers, worker_id)
+
+    def workers(self):
+        """Registered workers, most recent heartbeat first."""
+        workers = [json.loads(value) for value in self.redis.hvals(self._workers)]
+        return sorted(workers, key=lambda worker: -worker['heartbeat_at'])
+
+    def queue_depth(self):
+        return self.redis.zcard(self._queued)
+
+    def running_count(self):
+        return self.redis.zcard(self._leases)
+
+
+def open_queue(url):
+    """
+    A queue from `redis://host:port/db`, `sqlite:///relative/path`,
+    `sqlite:////absolute/path` or a plain file path.
+    """
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisQueue(url)
+    if url.startswith('sqlite:///'):
+        return SQLiteQueue(url[len('sqlite:///'):])
+    if '://' in url:
+        raise ValueError(f"Unsupported queue URL '{url}' (use sqlite:///path or redis://host)")
+    return SQLiteQueue(url)
+
+
+def run_worker(queue, store, worker_id=None, lease_seconds=LEASE_SECONDS,
+               heartbeat_seconds=HEARTBEAT_SECONDS, poll_seconds=POLL_SECONDS,
+               max_jobs=None, cost_model=None):
+    """
+    Take jobs from `queue` and run them until interrupted (or `max_jobs`
+    have run), indexing the posters in `store`. A background thread sends
+    heartbeats; stage progress is published as the job's status message.
+    """
+    import create_map_poster
+    from poster_jobs import run_job
+    from poster_worker import stage_message
+
+    worker_id = worker_id or default_worker_id()
+    current = {'job_id': None, 'status': None}
+    lock = threading.Lock()
+    cancelled = threading.Event()
+    stopped = threading.Event()
+
+    def publish(status):
+        current['status'] = status
+        queue.update(current['job_id'], worker_id, status)
+
+    def on_event(kind, name, value, labels):
+        if kind == "start" and current['job_id'] and current['status']:
+            message = stage_message(name, labels)
+            if message:
+                publish({**current['status'], 'message': message})
+
+    def send_heartbeats():
+        while not stopped.wait(heartbeat_seconds):
+            job_id = current['job_id']
+            try:
+                alive = queue.heartbeat(worker_id, job_id, lease_seconds)
+            except Exception as e:
+                print(f"⚠ Heartbeat failed: {e}")
+                continue
+            with lock:
+                # The job may have finished while the heartbeat was in flight
+                if not alive and current['job_id'] == job_id:
+                    cancelled.set()
+
+    queue.register_worker(worker_id)
+    heartbeat_thread = threading.Thread(target=send_heartbeats, daemon=True)
+    heartbeat_thread.start()
+    print(f"✓ Worker {worker_id} waiting for jobs")
+
+    finished = 0
+    create_map_poster.add_listener(on_event)
+    try:
+        while max_jobs is None or finished < max_jobs:
+            released = queue.release_expired()
+            if released:
+                print(f"⚠ Released {released} jobs of lost workers")
+            claimed = queue.claim(worker_id, lease_seconds)
+            if claimed is None:
+                time.sleep(poll_seconds)
+                continue
+
+            job_id, job = claimed
+            print(f"\nRunning job {job_id}: {job['city']}, {job['country']}")
+            with lock:
+                cancelled.clear()
+                current['job_id'] = job_id
+            status = run_job(job_id, job, store, should_cancel=cancelled.is_set,
+                             on_status=publish, cost_model=cost_model)
+            with lock:
+                current['job_id'] = current['status'] = None
+            if not queue.finish(job_id, worker_id, status):
+                print(f"⚠ Job {job_id} was handed to another worker")
+            elif status['status'] == 'complete':
+                print(f"✓ Job {job_id} complete: {status['output_file']}")
+            else:
+                print(f"✗ Job {job_id} {status['status']}: {status['error'] or status['message']}")
+            finished += 1
+    except KeyboardInterrupt:
+        print(f"\nStopping worker {worker_id}")
+    finally:
+        create_map_poster.remove_listener(on_event)
+        stopped.set()
+        heartbeat_thread.join()
+        queue.unregister_worker(worker_id)
+    return finished
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Map Poster Generator - Poster Series
+Renders one place at several distances and paper sizes from a single
+fetch, clipping the shared data down for every smaller poster
+"""
+
+import os
+
+from create_map_poster import (
+    _check_cancelled, _drop_small_polygons, _graph_requests, _merge_options, _network_types,
+    _osmnx, count, fetch_map_data, fetch_radius, lod_highway_classes, lod_min_polygon_area,
+    render_poster, timed_stage, PAPER_SIZES
+)
+
+MAX_SERIES_DISTANCES = 8
+MAX_SERIES_FORMATS = 6
+
+ORIENTATIONS = ("portrait", "landscape")
+
+# Zoom animation frames are small: 12x16in at this dpi
+ZOOM_FRAME_DPI = 72
+ZOOM_FRAME_MS = 120
+
+
+def parse_distances(value):
+    """Sorted, unique distances in metres from "4000,8000,15000" or a list."""
+    if isinstance(value, str):
+        value = [part for part in value.split(',') if part.strip()]
+    distances = sorted({int(float(dist)) for dist in value})
+    if not distances or distances[0] <= 0:
+        raise ValueError("Distances must be positive numbers of metres")
+    return distances
+
+
+def parse_formats(value):
+    """Unique (paper_size, orientation) pairs from "a4,a3:landscape,square" or a list."""
+    if isinstance(value, str):
+        value = [part for part in value.split(',') if part.strip()]
+    formats = []
+    for spec in value:
+        paper, _, orientation = str(spec).strip().lower().partition(':')
+        orientation = orientation or "portrait"
+        if paper not in PAPER_SIZES:
+            raise ValueError(f"Unknown paper size '{paper}'. Available: {', '.join(PAPER_SIZES)}")
+        if orientation not in ORIENTATIONS:
+            raise ValueError(f"Orientation must be one of: {', '.join(ORIENTATIONS)}")
+        if (paper, orientation) not in formats:
+            formats.append((paper, orientation))
+    if not formats:
+        raise ValueError("At least one paper size is required")
+    return formats
+
+
+def format_name(paper, orientation="portrait"):
+    return paper if orientation == "portrait" else f"{paper}-{orientation}"
+
+
+def series_output_file(output_file, dist=None, paper_format=None):
+    """Output path of one poster of a series written to `output_file`."""
+    base, ext = os.path.splitext(output_file)
+    if dist is not None:
+        base += f"_{dist}m"
+    if paper_format is not None:
+        base += f"_{format_name(*paper_format)}"
+    return f"{base}{ext}"
+
+
+def series_fetch_plan(variants):
+    """
+    Group poster `variants` [(dist, options)] by the street network they
+    need. With LOD on, small or large-format posters keep road classes
+    others drop, so each level gets one network fetch covering all of its
+    posters. Returns [(key, dist, options, radius)], largest radius first;
+    fetching the first entry also fetches the feature layers for everyone.
+    """
+    groups = {}
+    for dist, options in variants:
+        groups.setdefault(tuple(_graph_requests(dist, options)), []).append((dist, options))
+
+    plan = []
+    for key, members in groups.items():
+        dist, options = max(members, key=lambda member: fetch_radius(*member))
+        plan.append((key, dist, options, fetch_radius(dist, options)))
+    plan.sort(key=lambda entry: -entry[3])
+    return plan
+
+
+def fetch_series_data(point, plan, should_cancel=None):
+    """
+    Fetch everything a series plan needs: every layer once at the largest
+    radius, plus the street network of each other LOD level. Returns
+    {key: data}, the data dicts sharing their feature layers.
+    """
+    key, dist, options, radius = plan[0]
+    # Small polygons are dropped per poster in clip_map_data, not here
+    shared = fetch_map_data(point, dist, {**options, "min_polygon_pixels": 0},
+                            should_cancel=should_cancel, radius=radius)
+    fetched = {key: shared}
+
+    for key, dist, options, radius in plan[1:]:
+        roads_only = {**options, "show_water": False, "show_parks": False,
+                      "show_buildings": False, "show_railways": False, "custom_layers": []}
+        roads = fetch_map_data(point, dist, roads_only, should_cancel=should_cancel, radius=radius)
+        fetched[key] = {**shared, "radius": radius, "graph": roads["graph"]}
+    return fetched
+
+
+def series_source(fetched, dist, options):
+    """The fetched data whose streets suit a poster of `dist`, or the finest covering it."""
+    radius = fetch_radius(dist, options)
+    data = fetched.get(tuple(_graph_requests(dist, options)))
+    if data is not None and data["radius"] >= radius:
+        return data
+    covering = [data for data in fetched.values() if data["radius"] >= radius]
+    if not covering:
+        return max(fetched.values(), key=lambda data: data["radius"])
+    return min(covering, key=lambda data: data["radius"])
+
+
+def _filter_road_classes(G, classes):
+    """G without the edges outside the highway `classes`."""
+    classes = set(classes)
+    keep = []
+    for u, v, key, data in G.edges(keys=True, data=True):
+        highway = data.get('highway')
+        if classes.intersection(highway if isinstance(highway, list) else [highway]):
+            keep.append((u, v, key))
+    if len(keep) == G.number_of_edges():
+        return G
+    count("edges_lod_filtered", G.number_of_edges() - len(keep))
+    return G.edge_subgraph(keep)
+
+
+def clip_map_data(data, point, dist, options=None):
+    """
+    Cut fetched map `data` down to one poster of `dist`: clip every layer
+    to its extent and re-apply its level of detail (road classes and
+    small-polygon filter). The result can be passed to `render_poster`.
+    """
+    from shapely.geometry import box
+    ox = _osmnx()
+
+    options = _merge_options(options)
+    radius = fetch_radius(dist, options)
+    bbox = ox.utils_geo.bbox_from_point(point, dist=radius)
+    min_area = lod_min_polygon_area(dist, options)
+    highway_classes = lod_highway_classes(dist, options) if "all" in _network_types(options) else None
+
+    def clip_layer(gdf):
+        if gdf is None or gdf.empty:
+            return gdf
+        return _drop_small_polygons(gdf.clip(box(*bbox)), point, min_area)
+
+    with timed_stage("series_clip"):
+        G = data["graph"]
+        if G is not None and radius < data.get("radius", data["dist"]):
+            G = ox.truncate.truncate_graph_bbox(G, bbox, truncate_by_edge=True)
+        if G is not None and highway_classes:
+            G = _filter_road_classes(G, highway_classes)
+        return {
+            "dist": dist,
+            "radius": radius,
+            "graph": G,
+            "water": clip_layer(data["water"]),
+            "parks": clip_layer(data["parks"]),
+            "buildings": clip_layer(data["buildings"]),
+            "railways": clip_layer(data["railways"]),
+            "custom_layers": [clip_layer(gdf) for gdf in data["custom_layers"]]
+        }
+
+
+def zoom_distances(distances, frames):
+    """`frames` distances from the largest of `distances` to the smallest, evenly spaced in scale."""
+    near, far = min(distances), max(distances)
+    if frames <= 1:
+        return [far]
+    return [round(far * (near / far) ** (i / (frames - 1))) for i in range(frames)]
+
+
+def zoom_frames_paths(output_file):
+    """(frames directory, animated GIF) of the zoom sequence for `output_file`."""
+    base, _ = os.path.splitext(output_file)
+    return f"{base}_zoom", f"{base}_zoom.gif"
+
+
+def render_zoom_frames(city, country, point, fetched, distances, output_file, frames,
+                       options=None, theme=None, should_cancel=None):
+    """
+    Render a zoom animation from the largest of `distances` to the smallest
+    as numbered PNG frames plus an animated GIF. Returns the GIF path.
+    """
+    from PIL import Image
+
+    frame_options = {**_merge_options(options), "dpi": ZOOM_FRAME_DPI, "derivatives": False,
+                     "tiles": False, "map_layer_cache": False}
+    frames_dir, gif_path = zoom_frames_paths(output_file)
+    os.makedirs(frames_dir, exist_ok=True)
+
+    frame_files = []
+    for index, dist in enumerate(zoom_distances(distances, frames)):
+        _check_cancelled(should_cancel)
+        frame_file = os.path.join(frames_dir, f"frame_{index:03d}.png")
+        data = clip_map_data(series_source(fetched, dist, frame_options), point, dist, frame_options)
+        render_poster(city, country, point, data, frame_file, frame_options,
+                      theme=theme, should_cancel=should_cancel)
+        frame_files.append(frame_file)
+        count("zoom_frames_written")
+
+    with timed_stage("zoom_gif"):
+        images = [Image.open(path).convert("RGB") for path in frame_files]
+        images[0].save(gif_path, save_all=True, append_images=images[1:],
+                       duration=ZOOM_FRAME_MS, loop=0)
+    print(f"✓ Zoom animation saved to {gif_path}")
+    return gif_path
+
+
+def render_series(city, country, point, distances, output_file, options=None, theme=None,
+                  should_cancel=None, frames=0, formats=None):
+    """
+    Render a poster of `point` for every distance in `distances` and every
+    (paper_size, orientation) in `formats` from one shared fetch. With
+    `frames`, also render a zoom animation across the distances.
+
+    Returns one {"distance", "paper_size", "orientation", "output_file"}
+    dict per poster. Files are named by series_output_file: by distance
+    unless `formats` is given with a single distance, and by format when
+    `formats` has more than one.
+    """
+    distances = parse_distances(distances)
+    options = _merge_options(options)
+    paper_formats = parse_formats(formats) if formats else [(options["paper_size"], options["orientation"])]
+
+    posters, variants = [], []
+    for dist in sorted(distances, reverse=True):
+        for paper, orientation in paper_formats:
+            name_dist = dist if len(distances) > 1 or not formats else None
+            name_format = (paper, orientation) if formats and len(paper_formats) > 1 else None
+            posters.append({
+                "distance": dist,
+                "paper_size": paper,
+                "orientation": orientation,
+                "output_file": series_output_file(output_file, name_dist, name_format)
+            })
+            variants.append((dist, {**options, "paper_size": paper, "orientation": orientation}))
+
+    plan = series_fetch_plan(variants)
+    print(f"\nGenerating {len(posters)} posters of {city}, {country} "
+          f"from {len(plan)} network fetch{'es' if len(plan) > 1 else ''}...")
+    fetched = fetch_series_data(point, plan, should_cancel=should_cancel)
+
+    for poster, (dist, poster_options) in zip(posters, variants):
+        _check_cancelled(should_cancel)
+        label = format_name(poster["paper_size"], poster["orientation"]) if poster["paper_size"] else "poster"
+        print(f"\nRendering the {dist} m {label}...")
+        data = clip_map_data(series_source(fetched, dist, poster_options), point, dist, poster_options)
+        render_poster(city, country, point, data, poster["output_file"], poster_options,
+                      theme=theme, should_cancel=should_cancel)
+        count("series_posters_written")
+
+    if frames:
+        render_zoom_frames(city, country, point, fetched, distances, output_file, frames,
+                           options, theme=theme, should_cancel=should_cancel)
+    return posters
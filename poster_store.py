@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Map Poster Generator - Poster Store
+Content-addressed poster files with a SQLite index, deduplication and a
+retention budget
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from create_map_poster import (
+    DERIVATIVE_SIZES, POSTERS_DIR, count, derivative_path, tile_pyramid_paths
+)
+
+# Bump when rendering changes so old posters are not served for new requests
+STORE_VERSION = 1
+
+INDEX_FILE = "index.sqlite3"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS posters (
+    key TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    city TEXT,
+    country TEXT,
+    theme TEXT,
+    distance INTEGER,
+    inputs TEXT,
+    size INTEGER NOT NULL,
+    content_hash TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS posters_filename ON posters (filename);
+CREATE INDEX IF NOT EXISTS posters_content ON posters (content_hash);
+CREATE INDEX IF NOT EXISTS posters_last_access ON posters (last_access);
+"""
+
+
+def render_key(**inputs):
+    """
+    Hash every input that affects the rendered image. Equal keys mean the
+    poster can be served from the store instead of being rendered again.
+    """
+    canonical = json.dumps({'version': STORE_VERSION, **inputs}, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def _slug(text):
+    return re.sub(r'[^a-z0-9]+', '_', str(text).lower()).strip('_')[:40] or 'poster'
+
+
+def poster_files(path):
+    """A poster file followed by its thumbnail/preview copies and tile pyramid."""
+    dzi_path, tiles_dir = tile_pyramid_paths(path)
+    return [path] + [derivative_path(path, size) for size in DERIVATIVE_SIZES] + [dzi_path, tiles_dir]
+
+
+def move_poster_files(src, dst):
+    """Rename a poster and whichever of its companion files exist."""
+    for src_path, dst_path in zip(poster_files(src), poster_files(dst)):
+        if os.path.isdir(src_path):
+            shutil.rmtree(dst_path, ignore_errors=True)
+            os.replace(src_path, dst_path)
+        elif os.path.exists(src_path):
+            os.replace(src_path, dst_path)
+
+
+def remove_poster_files(path):
+    """Remove a poster and its companion files."""
+    for file_path in poster_files(path):
+        if os.path.isdir(file_path):
+            shutil.rmtree(file_path, ignore_errors=True)
+        else:
+            try:
+                os.remove(file_path)
+            except FileNotFoundError:
+                pass
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class PosterStore:
+    """
+    Posters are named `{city}_{theme}_{key[:16]}.png`, where the key is a
+    hash of the render inputs. The index records metadata, size and last
+    access for each key. Keys whose output bytes are identical share one
+    file. When a size or age budget is set, the least recently used
+    posters are removed after each add.
+    """
+    def __init__(self, root=POSTERS_DIR, max_bytes=None, max_age=None):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.db_path = os.path.join(root, INDEX_FILE)
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        with self._connect() as db:
+            db.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """One short-lived connection per call, so any thread or process can use the store."""
+        db = sqlite3.connect(self.db_path, timeout=30)
+        db.row_factory = sqlite3.Row
+        try:
+            db.execute("PRAGMA journal_mode=WAL")
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def filename_for(self, key, city, theme):
+        return f"{_slug(city)}_{_slug(theme)}_{key[:16]}.png"
+
+    def path_for(self, key, city, theme):
+        """Where a new poster for `key` should be written."""
+        return os.path.join(self.root, self.filename_for(key, city, theme))
+
+    def lookup(self, key):
+        """Return the stored poster path for `key`, or None."""
+        with self._connect() as db:
+            row = db.execute("SELECT filename FROM posters WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                count("poster_store_misses")
+                return None
+            path = os.path.join(self.root, row['filename'])
+            if not os.path.exists(path):
+                db.execute("DELETE FROM posters WHERE key = ?", (key,))
+                count("poster_store_misses")
+                return None
+            db.execute("UPDATE posters SET last_access = ? WHERE key = ?", (time.time(), key))
+        count("poster_store_hits")
+        return path
+
+    def resolve(self, filename):
+        """Return the path of an indexed poster file, or None if it is not in the index."""
+        with self._connect() as db:
+            row = db.execute("SELECT filename FROM posters WHERE filename = ? LIMIT 1",
+                             (filename,)).fetchone()
+            if row is None:
+                return None
+            db.execute("UPDATE posters SET last_access = ? WHERE filename = ?", (time.time(), filename))
+        path = os.path.join(self.root, row['filename'])
+        return path if os.path.exists(path) else None
+
+    def add(self, key, path, city=None, country=None, theme=None, distance=None, inputs=None):
+        """
+        Index a finished poster at `path`. If another poster has identical
+        bytes, `path` is removed and the key points at the existing file.
+        Returns the path the poster is served from.
+        """
+        content_hash = _file_hash(path)
+        size = os.path.getsize(path)
+        now = time.time()
+        filename = os.path.basename(path)
+
+        with self._lock, self._connect() as db:
+            existing = db.execute(
+                "SELECT filename FROM posters WHERE content_hash = ? AND filename != ? LIMIT 1",
+                (content_hash, filename)
+            ).fetchone()
+            if existing is not None and os.path.exists(os.path.join(self.root, existing['filename'])):
+                remove_poster_files(path)
+                filename = existing['filename']
+                count("poster_store_deduplicated")
+            db.execute(
+                "INSERT OR REPLACE INTO posters (key, filename, city, country, theme, distance, inputs, "
+                "size, content_hash, created_at, last_access) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, filename, city, country, theme, distance,
+                 json.dumps(inputs, sort_keys=True, default=str) if inputs is not None else None,
+                 size, content_hash, now, now)
+            )
+
+        if self.max_bytes is not None or self.max_age is not None:
+            # Never evict the poster this call is about to return
+            self.prune(keep=filename)
+        return os.path.join(self.root, filename)
+
+    def import_existing(self):
+        """Index poster files written before the store existed, keyed by file name."""
+        with self._connect() as db:
+            known = {row['filename'] for row in db.execute("SELECT filename FROM posters")}
+        added = 0
+        for name in os.listdir(self.root):
+            if name.endswith('.png') and not name.startswith('.') and name not in known:
+                path = os.path.join(self.root, name)
+                mtime = os.path.getmtime(path)
+                with self._connect() as db:
+                    db.execute(
+                        "INSERT OR IGNORE INTO posters (key, filename, size, content_hash, created_at, "
+                        "last_access) VALUES (?, ?, ?, ?, ?, ?)",
+                        (f"file:{name}", name, os.path.getsize(path), f"file:{name}", mtime, mtime)
+                    )
+                added += 1
+        return added
+
+    def _remove_file_if_unused(self, db, filename):
+        still_used = db.execute("SELECT 1 FROM posters WHERE filename = ? LIMIT 1", (filename,)).fetchone()
+        if still_used is None:
+            remove_poster_files(os.path.join(self.root, filename))
+            return True
+        return False
+
+    def stats(self):
+        with self._connect() as db:
+            row = db.execute("SELECT COUNT(*) AS keys, COUNT(DISTINCT filename) AS files FROM posters").fetchone()
+            size = db.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM (SELECT MAX(size) AS size FROM posters GROUP BY filename)"
+            ).fetchone()[0]
+        return {'keys': row['keys'], 'files': row['files'], 'bytes': size,
+                'max_bytes': self.max_bytes, 'max_age_seconds': self.max_age}
+
+    def prune(self, max_bytes=None, max_age=None, keep=None):
+        """
+        Drop expired posters, then least recently used ones until within
+        `max_bytes`. The file named `keep` is never dropped.
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        max_age = self.max_age if max_age is None else max_age
+        removed_files = 0
+
+        with self._lock, self._connect() as db:
+            if max_age is not None:
+                expired = db.execute("SELECT key, filename FROM posters WHERE last_access < ?",
+                                     (time.time() - max_age,)).fetchall()
+                for row in expired:
+                    if row['filename'] == keep:
+                        continue
+                    db.execute("DELETE FROM posters WHERE key = ?", (row['key'],))
+                    removed_files += self._remove_file_if_unused(db, row['filename'])
+
+            if max_bytes is not None:
+                # One row per file, most recent access across the keys sharing it
+                files = db.execute(
+                    "SELECT filename, MAX(size) AS size, MAX(last_access) AS last_access "
+                    "FROM posters GROUP BY filename ORDER BY last_access"
+                ).fetchall()
+                total = sum(row['size'] for row in files)
+                for row in files:
+                    if total <= max_bytes:
+                        break
+                    if row['filename'] == keep:
+                        continue
+                    db.execute("DELETE FROM posters WHERE filename = ?", (row['filename'],))
+                    removed_files += self._remove_file_if_unused(db, row['filename'])
+                    total -= row['size']
+
+        if removed_files:
+            count("poster_store_evicted", removed_files)
+        return removed_files
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Map Poster Generator - Cache Warmer
+Pre-downloads and prepares map data for a list of popular places so the
+first poster of the day does not wait on Overpass
+"""
+
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+from create_map_poster import fetch_map_data, get_coordinates, prepared_cache_paths
+
+WARM_LAYERS = ["roads", "water", "parks", "buildings", "railways"]
+
+
+def load_places(path):
+    """
+    Read places from a text file, one "City, Country" per line.
+    Blank lines and lines starting with # are ignored.
+    """
+    places = []
+    with open(path, 'r') as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            city, sep, country = line.rpartition(',')
+            if not sep or not city.strip() or not country.strip():
+                raise ValueError(f"{path}:{number}: expected 'City, Country', got {line!r}")
+            places.append((city.strip(), country.strip()))
+    return places
+
+
+def warm_options(layers, lod=True):
+    """Fetch options that download exactly `layers`."""
+    unknown = [layer for layer in layers if layer not in WARM_LAYERS]
+    if unknown:
+        raise ValueError(f"Unknown layer(s): {', '.join(unknown)}; choose from {', '.join(WARM_LAYERS)}")
+    return {
+        "network_types": ["all"] if "roads" in layers else [],
+        "show_water": "water" in layers,
+        "show_parks": "parks" in layers,
+        "show_buildings": "buildings" in layers,
+        "show_railways": "railways" in layers,
+        "lod": lod,
+        "use_cache": True,
+    }
+
+
+def _stop_time(stop_at):
+    """Next occurrence of HH:MM (tomorrow if it has passed today), as a timestamp."""
+    hour, minute = (int(part) for part in stop_at.split(':'))
+    now = datetime.now()
+    stop = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if stop <= now:
+        stop += timedelta(days=1)
+    return stop.timestamp()
+
+
+def warm_cache(places, distances, layers, requests_per_minute=20, dpi=300, stop_at=None,
+               report_path=None):
+    """
+    Fetch every (place, distance) whose prepared data is not cached yet.
+
+    Each cold layer counts as one Overpass request against
+    `requests_per_minute`. `stop_at` ("HH:MM") ends the run before peak
+    hours; remaining entries are reported as skipped.
+    """
+    options = {**warm_options(layers), "dpi": dpi}
+    pause_per_request = 60.0 / requests_per_minute if requests_per_minute else 0.0
+    deadline = _stop_time(stop_at) if stop_at else None
+
+    entries = []
+    for city, country in places:
+        for dist in distances:
+            entry = {'city': city, 'country': country, 'distance': dist}
+            entries.append(entry)
+
+            if deadline and time.time() >= deadline:
+                entry['status'] = 'skipped'
+                continue
+
+            try:
+                point = get_coordinates(city, country)
+            except Exception as e:
+                entry.update(status='failed', error=str(e))
+                print(f"✗ {city}, {country}: {e}")
+                continue
+
+            paths = prepared_cache_paths(point, dist, options)
+            cold = [layer for layer, path in paths.items() if not os.path.exists(path)]
+            if not cold:
+                entry['status'] = 'already_warm'
+                print(f"✓ {city}, {country} @ {dist}m already warm")
+                continue
+
+            start = time.perf_counter()
+            try:
+                fetch_map_data(point, dist, options)
+            except Exception as e:
+                entry.update(status='failed', error=str(e), cold_layers=cold)
+                print(f"✗ {city}, {country} @ {dist}m: {e}")
+            else:
+                entry.update(status='warmed', cold_layers=cold, seconds=time.perf_counter() - start)
+                print(f"✓ {city}, {country} @ {dist}m warmed {', '.join(cold)} "
+                      f"in {entry['seconds']:.1f}s")
+            time.sleep(pause_per_request * len(cold))
+
+    summary = {}
+    for entry in entries:
+        summary[entry['status']] = summary.get(entry['status'], 0) + 1
+    report = {
+        'finished_at': datetime.now().isoformat(timespec='seconds'),
+        'layers': layers,
+        'distances': distances,
+        'summary': summary,
+        'entries': entries
+    }
+    if report_path:
+        with open(report_path, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    print("\n" + ", ".join(f"{count} {status.replace('_', ' ')}" for status, count in sorted(summary.items())))
+    return report
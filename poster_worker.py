@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Map Poster Generator - Render Worker Process
+Runs poster jobs in a separate process so a GUI stays responsive, streaming
+stage progress and a downscaled preview back through a queue
+"""
+
+import multiprocessing
+import queue
+import uuid
+
+# Progress messages for the stages create_poster reports
+STAGE_MESSAGES = {
+    "geocode": "Looking up coordinates...",
+    "single_flight_wait": "Waiting for another download of this place...",
+    "download": "Downloading {layer}...",
+    "download_tile": "Downloading {layer} tiles...",
+    "layer_cache_load": "Loading cached {layer}...",
+    "lod_polygons": "Simplifying polygons...",
+    "map_layer_load": "Reusing the cached map...",
+    "plot": "Drawing {layer}...",
+    "edge_dedupe": "Preparing roads...",
+    "edge_styling": "Styling roads...",
+    "gradients": "Drawing gradients...",
+    "text": "Drawing text...",
+    "savefig": "Encoding full-resolution image...",
+    "derivatives": "Writing thumbnails...",
+    "tile_pyramid": "Writing zoom tiles...",
+}
+
+
+def stage_message(name, labels):
+    message = STAGE_MESSAGES.get(name)
+    if message is None:
+        return None
+    return message.format(layer=str(labels.get("layer", "map data")).replace("_", " "))
+
+
+def _worker_main(requests, events, cancelled):
+    """
+    Process entry point: render jobs from `requests` until a None arrives.
+    `cancelled` holds the id of the job to stop, so a cancel that arrives
+    after its job finished cannot stop the next one.
+    """
+    # Heavy imports happen once, in the worker, not in the GUI process
+    import create_map_poster
+    from create_map_poster import PosterCancelled, create_poster, get_coordinates
+
+    state = {"job_id": None}
+
+    def on_event(kind, name, value, labels):
+        if kind == "start":
+            message = stage_message(name, labels)
+            if message:
+                events.put(("progress", state["job_id"], message))
+
+    create_map_poster.add_listener(on_event)
+
+    while True:
+        job = requests.get()
+        if job is None:
+            return
+        job_id = state["job_id"] = job["job_id"]
+
+        def should_cancel(job_key=job_id.encode()):
+            return cancelled.value == job_key
+
+        if should_cancel():
+            events.put(("cancelled", job_id, None))
+            continue
+
+        def on_preview(image, size=job.get("preview_size", (400, 533))):
+            preview = image.convert("RGB")
+            preview.thumbnail(size)
+            events.put(("preview", job_id, (preview.size, preview.tobytes())))
+
+        try:
+            point = job.get("point") or get_coordinates(job["city"], job["country"])
+            create_poster(job["city"], job["country"], point, job["distance"], job["output_file"],
+                          options=job.get("options"), theme=job["theme"],
+                          should_cancel=should_cancel, on_preview=on_preview)
+        except PosterCancelled:
+            events.put(("cancelled", job_id, None))
+        except Exception as e:
+            events.put(("error", job_id, str(e)))
+        else:
+            events.put(("done", job_id, job["output_file"]))
+
+
+class RenderWorker:
+    """
+    One background render process, started on first use and reused so the
+    matplotlib/osmnx import cost is paid once.
+
+    `submit` queues a job; `poll` returns the (kind, job_id, payload) events
+    it produced so far without blocking. Kinds are "progress" (message),
+    "preview" ((width, height), RGB bytes), "done" (output file), "error"
+    (message) and "cancelled".
+    """
+    def __init__(self):
+        # spawn: forking a process that has Tk loaded is unsafe on macOS
+        self._context = multiprocessing.get_context("spawn")
+        self._process = None
+        self._requests = None
+        self._events = None
+        self._cancel = None
+
+    def _ensure_started(self):
+        if self._process is not None and self._process.is_alive():
+            return
+        self._requests = self._context.Queue()
+        self._events = self._context.Queue()
+        # Id of the job to cancel; uuid4 strings are 36 characters
+        self._cancel = self._context.Array("c", 36)
+        self._process = self._context.Process(
+            target=_worker_main, args=(self._requests, self._events, self._cancel), daemon=True
+        )
+        self._process.start()
+
+    def submit(self, city, country, distance, output_file, theme, options=None, point=None):
+        """Queue a poster job; returns its job id."""
+        self._ensure_started()
+        job_id = str(uuid.uuid4())
+        self._requests.put({
+            "job_id": job_id,
+            "city": city,
+            "country": country,
+            "point": point,
+            "distance": distance,
+            "output_file": output_file,
+            "theme": theme,
+            "options": options,
+        })
+        return job_id
+
+    def cancel(self, job_id):
+        """Stop job `job_id` at its next stage boundary, or skip it if still queued."""
+        if self._cancel is not None:
+            self._cancel.value = job_id.encode()
+
+    def poll(self):
+        events = []
+        if self._events is None:
+            return events
+        while True:
+            try:
+                events.append(self._events.get_nowait())
+            except queue.Empty:
+                break
+        if not events and self._process is not None and not self._process.is_alive():
+            events.append(("error", None, f"Render worker exited (code {self._process.exitcode})"))
+            self._process = None
+        return events
+
+    def stop(self):
+        if self._process is not None and self._process.is_alive():
+            self._requests.put(None)
+            self._process.join(timeout=2)
+            if self._process.is_alive():
+                self._process.terminate()
+        self._process = None
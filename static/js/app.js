@@ -5,6 +5,9 @@ let selectedTheme = null;
 let currentJobId = null;
 let currentCoordinates = null;
 let savedLayerPresets = [];
+let zoomViewer = null;
+let selectedThemeData = null;
+let livePreview = { key: null, geometry: null, loading: false, refetchTimer: null };
 
 const BUILTIN_LAYER_PRESETS = {
     buildings: {
@@ -76,6 +79,9 @@ function setupEventListeners() {
     // Generate button
     document.getElementById('generate-btn').addEventListener('click', generatePoster);
 
+    // Cancel button
+    document.getElementById('cancel-btn').addEventListener('click', cancelGeneration);
+
     // Theme search
     document.getElementById('theme-search').addEventListener('input', (e) => {
         filterThemes(e.target.value);
@@ -83,10 +89,19 @@ function setupEventListeners() {
 
     // New poster button
     document.getElementById('new-poster-btn').addEventListener('click', () => {
+        closeZoomViewer();
         document.getElementById('poster-result').style.display = 'none';
         document.getElementById('generate-btn').disabled = false;
     });
 
+    // Zoom button
+    document.getElementById('zoom-btn').addEventListener('click', toggleZoomViewer);
+
+    // Live preview: geometry is fetched once, every other edit redraws locally
+    document.getElementById('live-preview-btn').addEventListener('click', loadLivePreview);
+    document.querySelector('.app-layout').addEventListener('input', renderLivePreview);
+    document.querySelector('.app-layout').addEventListener('change', renderLivePreview);
+
     // Address lookup button
     document.getElementById('lookup-btn').addEventListener('click', lookupAddress);
 
@@ -148,6 +163,7 @@ function renderThemes(themesToRender) {
 
     grid.innerHTML = themesToRender.map(theme => `
         <div class="theme-card" data-theme-id="${theme.id}">
+            <img class="theme-card-preview" src="${theme.preview_url}" alt="" width="200" height="100" loading="lazy">
             <h4>${theme.name}</h4>
             <p>${theme.description || 'Custom theme'}</p>
             <div class="theme-colors">
@@ -208,13 +224,14 @@ async function showThemePreview(themeId) {
     try {
         const response = await fetch(`/api/theme/${themeId}`);
         const theme = await response.json();
+        selectedThemeData = theme;
+        renderLivePreview();
 
         const previewDiv = document.getElementById('theme-preview');
         const detailsDiv = document.getElementById('theme-details');
 
-        // Draw preview canvas
-        previewDiv.innerHTML = '<canvas id="theme-canvas" width="400" height="300"></canvas>';
-        drawThemePreview(theme);
+        // Map preview rendered by the server from the sample extract
+        previewDiv.innerHTML = `<img id="theme-preview-image" src="/api/theme/${themeId}/preview.png?w=400&h=300" alt="${theme.name} preview" width="400" height="300">`;
 
         // Show details
         document.getElementById('theme-name').textContent = theme.name;
@@ -248,76 +265,77 @@ async function showThemePreview(themeId) {
     }
 }
 
-// Draw theme preview on canvas
-function drawThemePreview(theme) {
-    const canvas = document.getElementById('theme-canvas');
-    if (!canvas) return;
-
-    const ctx = canvas.getContext('2d');
-    const width = canvas.width;
-    const height = canvas.height;
-
-    // Background
-    ctx.fillStyle = theme.bg;
-    ctx.fillRect(0, 0, width, height);
-
-    // Parks (rectangles)
-    ctx.fillStyle = theme.parks;
-    ctx.fillRect(40, 30, 80, 60);
-    ctx.fillRect(240, 110, 100, 70);
-
-    // Water (organic shape)
-    ctx.fillStyle = theme.water;
-    ctx.beginPath();
-    ctx.ellipse(100, 200, 120, 80, 0, 0, Math.PI * 2);
-    ctx.fill();
-
-    // Roads
-    // Motorway (thick)
-    ctx.strokeStyle = theme.road_motorway;
-    ctx.lineWidth = 6;
-    ctx.beginPath();
-    ctx.moveTo(0, 80);
-    ctx.lineTo(width, 90);
-    ctx.stroke();
-
-    // Primary roads
-    ctx.strokeStyle = theme.road_primary;
-    ctx.lineWidth = 4;
-    ctx.beginPath();
-    ctx.moveTo(100, 0);
-    ctx.lineTo(100, height);
-    ctx.stroke();
-
-    ctx.beginPath();
-    ctx.moveTo(250, 0);
-    ctx.lineTo(250, height);
-    ctx.stroke();
-
-    // Residential (thin)
-    ctx.strokeStyle = theme.road_residential;
-    ctx.lineWidth = 2;
-
-    ctx.beginPath();
-    ctx.moveTo(0, 150);
-    ctx.lineTo(width, 150);
-    ctx.stroke();
-
-    ctx.beginPath();
-    ctx.moveTo(200, 0);
-    ctx.lineTo(200, height);
-    ctx.stroke();
-
-    ctx.beginPath();
-    ctx.moveTo(300, 0);
-    ctx.lineTo(300, height);
-    ctx.stroke();
-
-    // Text
-    ctx.fillStyle = theme.text;
-    ctx.font = 'bold 16px Arial';
-    ctx.textAlign = 'center';
-    ctx.fillText(theme.name, width / 2, height - 20);
+function livePreviewRequest() {
+    return {
+        city: document.getElementById('city').value.trim(),
+        country: document.getElementById('country').value.trim(),
+        distance: parseInt(document.getElementById('distance').value),
+        coordinates: currentCoordinates,
+        options: getAdvancedOptions()
+    };
+}
+
+// Only these inputs change the geometry; everything else is a local redraw
+function livePreviewKey(request) {
+    const options = request.options;
+    return JSON.stringify([
+        request.city, request.country, request.distance, request.coordinates,
+        options.network_types, options.show_water, options.show_parks,
+        options.show_buildings, options.show_railways,
+        options.custom_layers.map(layer => [layer.tag_key, layer.tag_value])
+    ]);
+}
+
+function setLivePreviewStatus(message) {
+    document.getElementById('live-preview-status').textContent = message;
+}
+
+async function loadLivePreview() {
+    const request = livePreviewRequest();
+    if (!request.city || !request.country) {
+        alert('Please enter both city and country');
+        return;
+    }
+
+    clearTimeout(livePreview.refetchTimer);
+    livePreview.loading = true;
+    setLivePreviewStatus('Loading map data...');
+    try {
+        const response = await fetch('/api/preview/geometry', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(request)
+        });
+        const geometry = await response.json();
+        if (!response.ok) {
+            throw new Error(geometry.error || 'Could not load preview');
+        }
+        livePreview.geometry = geometry;
+        livePreview.key = livePreviewKey(request);
+        setLivePreviewStatus('');
+        document.getElementById('live-preview-canvas').style.display = 'block';
+    } catch (error) {
+        console.error('Error loading live preview:', error);
+        setLivePreviewStatus(`Error: ${error.message}`);
+    } finally {
+        livePreview.loading = false;
+    }
+    renderLivePreview();
+}
+
+function renderLivePreview() {
+    if (!livePreview.geometry || !selectedThemeData) return;
+
+    const request = livePreviewRequest();
+    if (livePreviewKey(request) !== livePreview.key && !livePreview.loading) {
+        // Location, radius or layers changed; fetch new geometry once the edits settle
+        clearTimeout(livePreview.refetchTimer);
+        livePreview.refetchTimer = setTimeout(loadLivePreview, 800);
+        setLivePreviewStatus('Map data changed, updating...');
+    }
+
+    drawLivePreview(document.getElementById('live-preview-canvas'), livePreview.geometry,
+        selectedThemeData, request.options, request.city, request.country);
 }
 
 // Generate poster
@@ -388,11 +406,25 @@ async function pollStatus(jobId) {
         const response = await fetch(`/api/status/${jobId}`);
         const status = await response.json();
 
-        updateProgress(status.progress, status.message);
+        let message = status.message;
+        if (status.status === 'queued' && status.queue_position) {
+            message = `${message} (${status.queue_position} ahead)`;
+        }
+        if (status.estimate && status.estimate.decision === 'downgrade') {
+            message = `${message} (simplified to fit server memory)`;
+        }
+        if (status.eta_seconds != null && status.status !== 'complete') {
+            message = `${message} · about ${formatEta(status.eta_seconds)} left`;
+        }
+        updateProgress(status.progress, message);
 
         if (status.status === 'complete') {
             // Show result
             showPosterResult(status.output_file);
+        } else if (status.status === 'cancelled') {
+            currentJobId = null;
+            document.getElementById('generate-btn').disabled = false;
+            document.getElementById('progress-container').style.display = 'none';
         } else if (status.status === 'error') {
             throw new Error(status.error);
         } else {
@@ -407,6 +439,32 @@ async function pollStatus(jobId) {
     }
 }
 
+// Format an estimated duration for progress messages
+function formatEta(seconds) {
+    if (seconds < 60) {
+        return `${Math.max(1, Math.round(seconds))} s`;
+    }
+    return `${Math.round(seconds / 60)} min`;
+}
+
+// Cancel the current generation job
+async function cancelGeneration() {
+    if (!currentJobId) return;
+
+    try {
+        const response = await fetch(`/api/cancel/${currentJobId}`, { method: 'POST' });
+        const result = await response.json();
+
+        if (!result.success) {
+            throw new Error(result.error || 'Cancel failed');
+        }
+
+        updateProgress(0, 'Cancelling...');
+    } catch (error) {
+        console.error('Error cancelling job:', error);
+    }
+}
+
 // Update progress bar
 function updateProgress(percent, message) {
     document.getElementById('progress-fill').style.width = `${percent}%`;
@@ -427,6 +485,9 @@ function showPosterResult(filename) {
     const downloadUrl = `/api/poster/${filename.split('/').pop()}`;
 
     posterImage.src = thumbnailUrl;
+    posterImage.srcset = `${thumbnailUrl} 1x, ${thumbnailUrl}?size=preview 3x`;
+    posterImage.dataset.tiles = `/api/poster/tiles/${filename.split('/').pop().replace(/\.png$/, '')}.dzi`;
+    closeZoomViewer();
     downloadBtn.href = downloadUrl;
     downloadBtn.download = filename.split('/').pop();
 
@@ -436,6 +497,39 @@ function showPosterResult(filename) {
     resultDiv.scrollIntoView({ behavior: 'smooth' });
 }
 
+// Switch the result between the thumbnail and the zoomable tile viewer
+async function toggleZoomViewer() {
+    if (zoomViewer) {
+        closeZoomViewer();
+        return;
+    }
+
+    const posterImage = document.getElementById('poster-image');
+    const container = document.getElementById('poster-zoom');
+    container.style.height = `${posterImage.clientHeight || 533}px`;
+    container.style.display = 'block';
+    posterImage.style.display = 'none';
+    document.getElementById('zoom-btn').textContent = 'Close Zoom';
+
+    zoomViewer = new DeepZoomViewer(container, posterImage.dataset.tiles);
+    try {
+        await zoomViewer.open();
+    } catch (error) {
+        closeZoomViewer();
+        alert(error.message);
+    }
+}
+
+function closeZoomViewer() {
+    if (zoomViewer) {
+        zoomViewer.destroy();
+        zoomViewer = null;
+    }
+    document.getElementById('poster-zoom').style.display = 'none';
+    document.getElementById('poster-image').style.display = '';
+    document.getElementById('zoom-btn').textContent = 'Zoom In';
+}
+
 function parseNumber(value, fallback) {
     const parsed = parseFloat(value);
     return Number.isFinite(parsed) ? parsed : fallback;
@@ -830,6 +924,8 @@ function getAdvancedOptions() {
         railway_color: document.getElementById('railway-color').value,
         railway_width: parseNumber(document.getElementById('railway-width').value, 0.6),
         custom_layers: customLayers,
+        paper_size: document.getElementById('paper-size').value || null,
+        orientation: document.getElementById('paper-orientation').value,
         typography_positions: {
             city_y: parseNumber(document.getElementById('text-city-y').value, 0.14),
             line_y: parseNumber(document.getElementById('text-line-y').value, 0.125),
@@ -0,0 +1,211 @@
+// Live poster preview drawn from /api/preview/geometry
+// Mirrors render_poster's layer order, widths and typography so colour,
+// layer and text tweaks can be previewed without a server render
+
+const POSTER_WIDTH_IN = 12;
+const POINTS_PER_INCH = 72;
+
+const ROAD_WIDTHS = {
+    motorway: 1.2,
+    primary: 1.0,
+    secondary: 0.8,
+    tertiary: 0.6,
+    residential: 0.4,
+    default: 0.4
+};
+
+// Road classes drawn least important first so major roads end up on top
+const ROAD_DRAW_ORDER = ['default', 'residential', 'tertiary', 'secondary', 'primary', 'motorway'];
+
+// Undo the delta encoding of one line or ring and map it into the map box
+function tracePath(ctx, flat, box, scale, close) {
+    let x = 0;
+    let y = 0;
+    for (let i = 0; i < flat.length; i += 2) {
+        x += flat[i];
+        y += flat[i + 1];
+        const px = box.x + x * scale.x;
+        const py = box.y + y * scale.y;
+        if (i === 0) {
+            ctx.moveTo(px, py);
+        } else {
+            ctx.lineTo(px, py);
+        }
+    }
+    if (close) ctx.closePath();
+}
+
+function fillPolygons(ctx, polygons, box, scale, color, alpha = 1) {
+    if (!polygons || !polygons.length) return;
+    ctx.save();
+    ctx.globalAlpha = alpha;
+    ctx.fillStyle = color;
+    ctx.beginPath();
+    polygons.forEach(rings => rings.forEach(ring => tracePath(ctx, ring, box, scale, true)));
+    ctx.fill('evenodd');
+    ctx.restore();
+}
+
+function strokeLines(ctx, lines, box, scale, color, width, alpha = 1) {
+    if (!lines || !lines.length) return;
+    ctx.save();
+    ctx.globalAlpha = alpha;
+    ctx.strokeStyle = color;
+    ctx.lineWidth = width;
+    ctx.lineCap = 'round';
+    ctx.lineJoin = 'round';
+    ctx.beginPath();
+    lines.forEach(line => tracePath(ctx, line, box, scale, false));
+    ctx.stroke();
+    ctx.restore();
+}
+
+function drawLayer(ctx, layer, box, scale, style) {
+    if (!layer) return;
+    if (style.mode === 'fill') {
+        fillPolygons(ctx, layer.polygons, box, scale, style.color, style.alpha);
+    } else {
+        // GeoDataFrame.plot with `color` strokes polygon outlines as well as lines
+        const outlines = (layer.polygons || []).flat();
+        strokeLines(ctx, layer.lines.concat(outlines), box, scale, style.color, style.width, style.alpha);
+    }
+}
+
+function drawGradient(ctx, box, color, location) {
+    const height = box.height * 0.25;
+    const top = location === 'bottom' ? box.y + box.height - height : box.y;
+    const gradient = ctx.createLinearGradient(0, top, 0, top + height);
+    const transparent = hexToRgba(color, 0);
+    const opaque = hexToRgba(color, 1);
+    gradient.addColorStop(0, location === 'bottom' ? transparent : opaque);
+    gradient.addColorStop(1, location === 'bottom' ? opaque : transparent);
+    ctx.fillStyle = gradient;
+    ctx.fillRect(box.x, top, box.width, height);
+}
+
+function hexToRgba(hex, alpha) {
+    const value = hex.replace('#', '');
+    const full = value.length === 3 ? value.split('').map(c => c + c).join('') : value;
+    const r = parseInt(full.slice(0, 2), 16);
+    const g = parseInt(full.slice(2, 4), 16);
+    const b = parseInt(full.slice(4, 6), 16);
+    return `rgba(${r}, ${g}, ${b}, ${alpha})`;
+}
+
+function drawText(ctx, text, x, y, sizePx, weight, color, alpha, align, baseline) {
+    ctx.save();
+    ctx.globalAlpha = alpha;
+    ctx.fillStyle = color;
+    ctx.font = `${weight} ${sizePx}px Roboto, Arial, sans-serif`;
+    ctx.textAlign = align;
+    ctx.textBaseline = baseline;
+    ctx.fillText(text, x, y);
+    ctx.restore();
+}
+
+// Draw the poster preview for `geometry` onto `canvas` (3:4, like the 12x16in poster)
+function drawLivePreview(canvas, geometry, theme, options, city, country) {
+    const ctx = canvas.getContext('2d');
+    const width = canvas.width;
+    const height = canvas.height;
+    const pt = width / (POSTER_WIDTH_IN * POINTS_PER_INCH);
+
+    ctx.fillStyle = theme.bg;
+    ctx.fillRect(0, 0, width, height);
+
+    // The map keeps its true aspect ratio and is centred, like matplotlib's equal-aspect axes
+    const [west, south, east, north] = geometry.bbox;
+    const midLat = (south + north) / 2 * Math.PI / 180;
+    const aspect = (east - west) * Math.cos(midLat) / (north - south);
+    const box = aspect > width / height
+        ? { width: width, height: width / aspect }
+        : { width: height * aspect, height: height };
+    box.x = (width - box.width) / 2;
+    box.y = (height - box.height) / 2;
+    const scale = { x: box.width / geometry.quantize, y: box.height / geometry.quantize };
+
+    ctx.save();
+    ctx.beginPath();
+    ctx.rect(box.x, box.y, box.width, box.height);
+    ctx.clip();
+
+    // Layers in render_poster's zorder; equal zorders keep plotting order
+    const layers = [];
+    if (options.show_water && geometry.water) {
+        layers.push({ zorder: 1, draw: () => fillPolygons(ctx, geometry.water.polygons, box, scale, theme.water) });
+    }
+    if (options.show_parks && geometry.parks) {
+        layers.push({ zorder: 2, draw: () => fillPolygons(ctx, geometry.parks.polygons, box, scale, theme.parks) });
+    }
+    if (options.show_buildings && geometry.buildings) {
+        const color = options.building_color || theme.road_residential || '#999999';
+        layers.push({
+            zorder: 2.2,
+            draw: () => fillPolygons(ctx, geometry.buildings.polygons, box, scale, color, 0.4)
+        });
+    }
+    if (options.show_railways && geometry.railways) {
+        const color = options.railway_color || theme.road_primary || '#666666';
+        layers.push({
+            zorder: 2.6,
+            draw: () => drawLayer(ctx, geometry.railways, box, scale,
+                { mode: 'line', color, width: options.railway_width * pt, alpha: 0.9 })
+        });
+    }
+    (options.custom_layers || []).forEach((layer, index) => {
+        const data = (geometry.custom_layers || [])[index];
+        layers.push({
+            zorder: layer.zorder ?? 2.5,
+            draw: () => drawLayer(ctx, data, box, scale, {
+                mode: layer.mode,
+                color: layer.color || '#333333',
+                width: (layer.line_width ?? 0.5) * pt,
+                alpha: layer.alpha ?? 1
+            })
+        });
+    });
+    // osmnx plots roads at zorder 1, after every other layer
+    layers.push({
+        zorder: 1,
+        draw: () => ROAD_DRAW_ORDER.forEach(roadClass => {
+            const color = options.use_road_hierarchy_colors
+                ? theme[`road_${roadClass}`]
+                : (options.road_color || theme.road_default);
+            const roadWidth = options.use_road_hierarchy_widths ? ROAD_WIDTHS[roadClass] : options.road_width;
+            strokeLines(ctx, geometry.roads[roadClass], box, scale, color, roadWidth * pt);
+        })
+    });
+
+    layers
+        .map((layer, index) => ({ ...layer, index }))
+        .sort((a, b) => a.zorder - b.zorder || a.index - b.index)
+        .forEach(layer => layer.draw());
+
+    if (options.show_gradients) {
+        drawGradient(ctx, box, theme.gradient_color, 'bottom');
+        drawGradient(ctx, box, theme.gradient_color, 'top');
+    }
+    ctx.restore();
+
+    // Typography, positioned in map-box fractions like ax.transAxes
+    const positions = options.typography_positions;
+    const yAt = fraction => box.y + box.height * (1 - fraction);
+    const centre = box.x + box.width / 2;
+
+    drawText(ctx, city.toUpperCase().split('').join('  '), centre, yAt(positions.city_y),
+        60 * pt, 'bold', theme.text, 1, 'center', 'alphabetic');
+    drawText(ctx, country.toUpperCase(), centre, yAt(positions.country_y),
+        22 * pt, '300', theme.text, 1, 'center', 'alphabetic');
+    drawText(ctx, geometry.coordinates, centre, yAt(positions.coords_y),
+        14 * pt, 'normal', theme.text, 0.7, 'center', 'alphabetic');
+
+    ctx.strokeStyle = theme.text;
+    ctx.lineWidth = pt;
+    ctx.beginPath();
+    ctx.moveTo(box.x + box.width * 0.4, yAt(positions.line_y));
+    ctx.lineTo(box.x + box.width * 0.6, yAt(positions.line_y));
+    ctx.stroke();
+
+    drawText(ctx, '© OpenStreetMap contributors', box.x + box.width * 0.98, yAt(positions.attribution_y),
+        8 * pt, '300', theme.text, 0.5, 'right', 'bottom');
+}
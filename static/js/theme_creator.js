@@ -31,6 +31,7 @@ function setupColorPickers() {
         // Color picker changes hex input
         colorInput.addEventListener('input', (e) => {
             hexInput.value = e.target.value.toUpperCase();
+            schedulePreview();
         });
 
         // Hex input changes color picker
@@ -38,6 +39,7 @@ function setupColorPickers() {
             const hex = e.target.value;
             if (/^#[0-9A-F]{6}$/i.test(hex)) {
                 colorInput.value = hex;
+                schedulePreview();
             }
         });
     });
@@ -86,93 +88,31 @@ function getThemeData() {
     return theme;
 }
 
-// Draw theme preview on canvas
-function drawThemePreview(theme) {
-    const canvas = document.getElementById('preview-canvas');
-    const ctx = canvas.getContext('2d');
-    const width = canvas.width;
-    const height = canvas.height;
+// Render the theme over the sample map; only the newest request is shown
+let previewRequest = 0;
+let previewTimer = null;
 
-    // Clear canvas
-    ctx.clearRect(0, 0, width, height);
-
-    // Background
-    ctx.fillStyle = theme.bg;
-    ctx.fillRect(0, 0, width, height);
-
-    // Parks (rectangles)
-    ctx.fillStyle = theme.parks;
-    ctx.fillRect(40, 30, 100, 80);
-    ctx.fillRect(280, 130, 100, 90);
-
-    // Water (organic shapes)
-    ctx.fillStyle = theme.water;
-    ctx.beginPath();
-    ctx.ellipse(120, 220, 140, 70, 0, 0, Math.PI * 2);
-    ctx.fill();
-
-    // Roads with different hierarchy
-    // Motorway (thickest)
-    ctx.strokeStyle = theme.road_motorway;
-    ctx.lineWidth = 8;
-    ctx.beginPath();
-    ctx.moveTo(0, 90);
-    ctx.lineTo(width, 100);
-    ctx.stroke();
-
-    // Primary roads
-    ctx.strokeStyle = theme.road_primary;
-    ctx.lineWidth = 5;
-    ctx.beginPath();
-    ctx.moveTo(120, 0);
-    ctx.lineTo(120, height);
-    ctx.stroke();
-
-    ctx.beginPath();
-    ctx.moveTo(280, 0);
-    ctx.lineTo(280, height);
-    ctx.stroke();
-
-    // Secondary roads
-    ctx.strokeStyle = theme.road_secondary;
-    ctx.lineWidth = 3;
-    ctx.beginPath();
-    ctx.moveTo(0, 160);
-    ctx.lineTo(width, 160);
-    ctx.stroke();
-
-    // Tertiary roads
-    ctx.strokeStyle = theme.road_tertiary;
-    ctx.lineWidth = 2;
-    ctx.beginPath();
-    ctx.moveTo(200, 0);
-    ctx.lineTo(200, height);
-    ctx.stroke();
-
-    // Residential (thinnest)
-    ctx.strokeStyle = theme.road_residential;
-    ctx.lineWidth = 1.5;
-
-    ctx.beginPath();
-    ctx.moveTo(0, 200);
-    ctx.lineTo(width, 200);
-    ctx.stroke();
-
-    ctx.beginPath();
-    ctx.moveTo(240, 0);
-    ctx.lineTo(240, height);
-    ctx.stroke();
-
-    ctx.beginPath();
-    ctx.moveTo(340, 0);
-    ctx.lineTo(340, height);
-    ctx.stroke();
+async function drawThemePreview(theme) {
+    const request = ++previewRequest;
+    try {
+        const response = await fetch('/api/theme/preview?w=400&h=300', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(theme)
+        });
+        if (!response.ok || request !== previewRequest) return;
+        const image = document.getElementById('preview-image');
+        const previous = image.src;
+        image.src = URL.createObjectURL(await response.blob());
+        if (previous.startsWith('blob:')) URL.revokeObjectURL(previous);
+    } catch (error) {
+        console.error('Error rendering preview:', error);
+    }
+}
 
-    // Text preview
-    ctx.fillStyle = theme.text;
-    ctx.font = 'bold 18px Arial';
-    ctx.textAlign = 'center';
-    ctx.fillText(theme.name, width / 2, height - 20);
+function schedulePreview() {
+    clearTimeout(previewTimer);
+    previewTimer = setTimeout(updatePreview, 150);
 }
 
 // Update color list below preview
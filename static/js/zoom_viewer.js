@@ -0,0 +1,126 @@
+// Deep Zoom viewer for poster tile pyramids
+// Loads only the 256px tiles that cover the visible area at the current zoom
+
+class DeepZoomViewer {
+    constructor(container, dziUrl) {
+        this.container = container;
+        this.dziUrl = dziUrl;
+        this.tilesUrl = dziUrl.replace(/\.dzi$/, '_files');
+        this.tiles = new Map();
+        this.layer = document.createElement('div');
+        this.layer.className = 'zoom-layer';
+        this.container.appendChild(this.layer);
+        this.dragStart = null;
+
+        this.container.addEventListener('wheel', (e) => this.onWheel(e), { passive: false });
+        this.container.addEventListener('pointerdown', (e) => this.onPointerDown(e));
+        this.container.addEventListener('pointermove', (e) => this.onPointerMove(e));
+        this.container.addEventListener('pointerup', () => { this.dragStart = null; });
+        this.container.addEventListener('pointerleave', () => { this.dragStart = null; });
+    }
+
+    async open() {
+        const response = await fetch(this.dziUrl);
+        if (!response.ok) {
+            throw new Error('Zoom tiles are not available for this poster');
+        }
+        const xml = new DOMParser().parseFromString(await response.text(), 'application/xml');
+        const image = xml.documentElement;
+        const size = image.getElementsByTagName('Size')[0];
+        this.tileSize = parseInt(image.getAttribute('TileSize'), 10);
+        this.format = image.getAttribute('Format');
+        this.width = parseInt(size.getAttribute('Width'), 10);
+        this.height = parseInt(size.getAttribute('Height'), 10);
+        this.maxLevel = Math.ceil(Math.log2(Math.max(this.width, this.height)));
+        this.fit();
+    }
+
+    fit() {
+        const box = this.container.getBoundingClientRect();
+        this.minScale = Math.min(box.width / this.width, box.height / this.height);
+        this.scale = this.minScale;
+        this.x = (box.width - this.width * this.scale) / 2;
+        this.y = (box.height - this.height * this.scale) / 2;
+        this.render();
+    }
+
+    onWheel(e) {
+        e.preventDefault();
+        const box = this.container.getBoundingClientRect();
+        const factor = e.deltaY < 0 ? 1.25 : 0.8;
+        const scale = Math.min(1, Math.max(this.minScale, this.scale * factor));
+        // Keep the image point under the cursor fixed
+        const px = e.clientX - box.left;
+        const py = e.clientY - box.top;
+        this.x = px - (px - this.x) * (scale / this.scale);
+        this.y = py - (py - this.y) * (scale / this.scale);
+        this.scale = scale;
+        this.render();
+    }
+
+    onPointerDown(e) {
+        this.dragStart = { px: e.clientX, py: e.clientY, x: this.x, y: this.y };
+        this.container.setPointerCapture(e.pointerId);
+    }
+
+    onPointerMove(e) {
+        if (!this.dragStart) return;
+        this.x = this.dragStart.x + e.clientX - this.dragStart.px;
+        this.y = this.dragStart.y + e.clientY - this.dragStart.py;
+        this.render();
+    }
+
+    render() {
+        const box = this.container.getBoundingClientRect();
+        // Smallest level that still has at least one tile pixel per screen pixel
+        const level = Math.min(this.maxLevel,
+            this.maxLevel + Math.ceil(Math.log2(this.scale * (window.devicePixelRatio || 1))));
+        const levelScale = Math.pow(2, level - this.maxLevel);
+        const tileOnScreen = this.tileSize / levelScale * this.scale;
+        const levelWidth = Math.ceil(this.width * levelScale);
+        const levelHeight = Math.ceil(this.height * levelScale);
+
+        const firstCol = Math.max(0, Math.floor(-this.x / tileOnScreen));
+        const firstRow = Math.max(0, Math.floor(-this.y / tileOnScreen));
+        const lastCol = Math.min(Math.ceil(levelWidth / this.tileSize) - 1,
+            Math.floor((box.width - this.x) / tileOnScreen));
+        const lastRow = Math.min(Math.ceil(levelHeight / this.tileSize) - 1,
+            Math.floor((box.height - this.y) / tileOnScreen));
+
+        const visible = new Set();
+        for (let col = firstCol; col <= lastCol; col++) {
+            for (let row = firstRow; row <= lastRow; row++) {
+                const key = `${level}/${col}_${row}`;
+                visible.add(key);
+                let tile = this.tiles.get(key);
+                if (!tile) {
+                    tile = document.createElement('img');
+                    tile.className = 'zoom-tile';
+                    tile.draggable = false;
+                    tile.src = `${this.tilesUrl}/${key}.${this.format}`;
+                    this.layer.appendChild(tile);
+                    this.tiles.set(key, tile);
+                }
+                const tileWidth = Math.min(this.tileSize, levelWidth - col * this.tileSize);
+                const tileHeight = Math.min(this.tileSize, levelHeight - row * this.tileSize);
+                tile.style.left = `${this.x + col * tileOnScreen}px`;
+                tile.style.top = `${this.y + row * tileOnScreen}px`;
+                tile.style.width = `${tileWidth / levelScale * this.scale}px`;
+                tile.style.height = `${tileHeight / levelScale * this.scale}px`;
+            }
+        }
+
+        // Drop tiles that scrolled out of view or belong to another level
+        for (const [key, tile] of this.tiles) {
+            if (!visible.has(key)) {
+                tile.remove();
+                this.tiles.delete(key);
+            }
+        }
+    }
+
+    destroy() {
+        this.layer.remove();
+        this.tiles.clear();
+    }
+}
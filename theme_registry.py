@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Map Poster Generator - Theme Registry
+In-memory cache of parsed and validated themes, invalidated by file mtime
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+from create_map_poster import THEMES_DIR
+
+REQUIRED_COLOR_KEYS = [
+    "bg", "text", "gradient_color", "water", "parks",
+    "road_motorway", "road_primary", "road_secondary",
+    "road_tertiary", "road_residential", "road_default"
+]
+
+# Colours shown on theme cards in the gallery
+SUMMARY_COLOR_KEYS = [
+    "bg", "text", "water", "parks",
+    "road_motorway", "road_primary", "road_residential"
+]
+
+
+def parse_hex_color(value):
+    """
+    Convert '#RGB', '#RRGGBB' or '#RRGGBBAA' to an (r, g, b) tuple of floats
+    in 0-1. Raises ValueError for anything else.
+    """
+    if not isinstance(value, str) or not value.startswith('#'):
+        raise ValueError(f"Invalid colour: {value!r}")
+    digits = value[1:]
+    if len(digits) == 3:
+        digits = ''.join(c * 2 for c in digits)
+    if len(digits) not in (6, 8):
+        raise ValueError(f"Invalid colour: {value!r}")
+    try:
+        return tuple(int(digits[i:i + 2], 16) / 255.0 for i in (0, 2, 4))
+    except ValueError:
+        raise ValueError(f"Invalid colour: {value!r}")
+
+
+def validate_theme(theme):
+    """
+    Check that a theme dict has every required colour in a parseable form.
+    Returns a dict of pre-converted (r, g, b) colours.
+    """
+    if not isinstance(theme, dict):
+        raise ValueError("Theme must be a JSON object")
+    missing = [key for key in REQUIRED_COLOR_KEYS if key not in theme]
+    if missing:
+        raise ValueError(f"Missing colours: {', '.join(missing)}")
+    return {key: parse_hex_color(theme[key]) for key in REQUIRED_COLOR_KEYS}
+
+
+class ThemeEntry:
+    """One parsed theme file"""
+    def __init__(self, theme_id, mtime_ns, data, rgb):
+        self.theme_id = theme_id
+        self.mtime_ns = mtime_ns
+        self.data = data
+        self.rgb = rgb
+        self.etag = hashlib.sha1(f"{theme_id}:{mtime_ns}".encode()).hexdigest()[:16]
+
+    def summary(self):
+        return {
+            'id': self.theme_id,
+            'name': self.data.get('name', self.theme_id),
+            'description': self.data.get('description', ''),
+            'colors': {key: self.data.get(key) for key in SUMMARY_COLOR_KEYS}
+        }
+
+
+class ThemeRegistry:
+    """
+    Parses each theme file once and keeps it in memory.
+
+    The themes directory is re-scanned (one stat per file) at most every
+    `check_interval` seconds; files are only re-read when their mtime
+    changes. `invalidate()` forces the next access to re-scan, e.g. right
+    after a theme is written.
+    """
+    def __init__(self, themes_dir=THEMES_DIR, check_interval=2.0):
+        self.themes_dir = themes_dir
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._errors = {}
+        self._last_scan = None
+        self._version = None
+        self._summaries = []
+
+    def invalidate(self, theme_id=None):
+        """Force a re-scan; drop `theme_id` so it is re-read even if its mtime is unchanged."""
+        with self._lock:
+            if theme_id is not None:
+                self._entries.pop(theme_id, None)
+            self._last_scan = None
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self._last_scan is not None and now - self._last_scan < self.check_interval:
+            return
+        self._last_scan = now
+
+        if not os.path.isdir(self.themes_dir):
+            os.makedirs(self.themes_dir, exist_ok=True)
+
+        seen = {}
+        for dir_entry in os.scandir(self.themes_dir):
+            if dir_entry.name.endswith('.json') and dir_entry.is_file():
+                seen[dir_entry.name[:-5]] = dir_entry.stat().st_mtime_ns
+
+        changed = False
+        for theme_id in list(self._entries):
+            if theme_id not in seen:
+                del self._entries[theme_id]
+                changed = True
+
+        for theme_id, mtime_ns in seen.items():
+            entry = self._entries.get(theme_id)
+            if entry is not None and entry.mtime_ns == mtime_ns:
+                continue
+            if self._errors.get(theme_id) == mtime_ns:
+                continue
+            changed = True
+            path = os.path.join(self.themes_dir, f"{theme_id}.json")
+            try:
+                with open(path, 'r') as f:
+                    data = json.load(f)
+                rgb = validate_theme(data)
+            except (OSError, ValueError) as e:
+                print(f"⚠ Skipping theme '{theme_id}': {e}")
+                self._entries.pop(theme_id, None)
+                self._errors[theme_id] = mtime_ns
+                continue
+            self._errors.pop(theme_id, None)
+            self._entries[theme_id] = ThemeEntry(theme_id, mtime_ns, data, rgb)
+
+        if changed or self._version is None:
+            ordered = [self._entries[theme_id] for theme_id in sorted(self._entries)]
+            self._summaries = [entry.summary() for entry in ordered]
+            digest = hashlib.sha1()
+            for entry in ordered:
+                digest.update(f"{entry.theme_id}:{entry.mtime_ns};".encode())
+            self._version = digest.hexdigest()[:16]
+
+    def list(self):
+        """Return (version, summaries) for every valid theme, sorted by id."""
+        with self._lock:
+            self._refresh()
+            return self._version, self._summaries
+
+    def ids(self):
+        with self._lock:
+            self._refresh()
+            return sorted(self._entries)
+
+    def entry(self, theme_id):
+        """Return the ThemeEntry for `theme_id`, or None if it does not exist."""
+        with self._lock:
+            self._refresh()
+            return self._entries.get(theme_id)
+
+    def get(self, theme_id):
+        """Return a copy of the theme dict, or None if it does not exist."""
+        entry = self.entry(theme_id)
+        return dict(entry.data) if entry is not None else None